@@ -0,0 +1,538 @@
+"""
+Benchmarks for the TPA plugin, run against the fake server in fake_endstone.
+
+    python benchmarks/bench.py [--players N] [--pending N] [--only NAME ...]
+                               [--output results.json] [--baseline old.json]
+
+Results are printed, and written as JSON with ``--output``. With
+``--baseline`` every timing is compared against an earlier result file and the
+run exits with status 1 if any got slower than ``--tolerance`` allows.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from typing import Callable, Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_endstone  # noqa: E402
+
+fake_endstone.install()
+
+from endstone_tpa import TpaPlugin  # noqa: E402
+from endstone_tpa.policy import PolicyStore  # noqa: E402
+from endstone_tpa.request_store import RequestStore, RequestType  # noqa: E402
+from endstone_tpa.selectors import Selector  # noqa: E402
+from endstone_tpa.snapshot import SnapshotPolicyStore, write_config_snapshot  # noqa: E402
+from endstone_tpa.utils import handle_tpa_request  # noqa: E402
+
+BENCHMARKS: Dict[str, Callable[[argparse.Namespace], dict]] = {}
+
+
+def benchmark(name: str):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return register
+
+
+def new_server(player_count: int, **config):
+    server = fake_endstone.FakeServer()
+    defaults = {
+        "request-timeout": 60,
+        "rate-limit-per-minute": 0,
+        "max-pending-per-target": 1000,
+        "max-pending-requests": 1_000_000,
+        "teleports-per-tick": 0,
+    }
+    plugin = server.load_plugin(TpaPlugin, config={**defaults, **config})
+    players = [server.join(f"Player{i}") for i in range(player_count)]
+    return server, plugin, players
+
+
+def fill_requests(plugin, players, pending: int) -> None:
+    """Create ``pending`` requests, each player asking the next few players."""
+    count = len(players)
+    per_player = -(-pending // count)
+    sent = 0
+    for offset in range(1, per_player + 1):
+        for i, requester in enumerate(players):
+            if sent == pending:
+                return
+            handle_tpa_request(plugin, requester, players[(i + offset) % count], RequestType.TPA)
+            sent += 1
+
+
+def latency_summary(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "mean_us": statistics.fmean(samples) * 1e6,
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6,
+        "max_us": samples[-1] * 1e6,
+    }
+
+
+@benchmark("request_throughput")
+def bench_request_throughput(args):
+    _, plugin, players = new_server(args.players)
+    count = len(players)
+    start = time.perf_counter()
+    for i, requester in enumerate(players):
+        handle_tpa_request(plugin, requester, players[(i + 1) % count], RequestType.TPA)
+    elapsed = time.perf_counter() - start
+    return {"requests": count, "ops_per_sec": count / elapsed, "mean_us": elapsed / count * 1e6}
+
+
+def _respond_latency(args, command: str) -> dict:
+    server, plugin, players = new_server(args.players)
+    count = len(players)
+    for i, requester in enumerate(players):
+        handle_tpa_request(plugin, requester, players[(i + 1) % count], RequestType.TPA)
+
+    samples = []
+    for i, target in enumerate(players):
+        start = time.perf_counter()
+        server.dispatch_command(target, f'{command} "{players[i - 1].name}"')
+        samples.append(time.perf_counter() - start)
+    return latency_summary(samples)
+
+
+@benchmark("accept_latency")
+def bench_accept_latency(args):
+    return _respond_latency(args, "tpaccept")
+
+
+@benchmark("deny_latency")
+def bench_deny_latency(args):
+    return _respond_latency(args, "tpdeny")
+
+
+@benchmark("form_accept_latency")
+def bench_form_accept_latency(args):
+    """Pressing Accept on the request form."""
+    _, plugin, players = new_server(args.players)
+    count = len(players)
+    for i, requester in enumerate(players):
+        handle_tpa_request(plugin, requester, players[(i + 1) % count], RequestType.TPA)
+
+    samples = []
+    for target in players:
+        form = target.forms[-1]
+        start = time.perf_counter()
+        form.on_submit(target, 0)
+        samples.append(time.perf_counter() - start)
+    return latency_summary(samples)
+
+
+@benchmark("api_lifecycle")
+def bench_api_lifecycle(args):
+    """Requests sent through the plugin API and accepted by command, with and without a lifecycle listener."""
+    result = {}
+    for label, listening in (("plain", False), ("listener", True)):
+        server, plugin, players = new_server(args.players)
+        if listening:
+            plugin.api.add_listener(lambda request, state: None)
+        count = len(players)
+        start = time.perf_counter()
+        handles = [plugin.api.submit(requester, players[(i + 1) % count]) for i, requester in enumerate(players)]
+        submitted = time.perf_counter()
+        for i, target in enumerate(players):
+            server.dispatch_command(target, f'tpaccept "{players[i - 1].name}"')
+        resolved = time.perf_counter()
+        assert all(handle.done() for handle in handles)
+        result[f"{label}_submit_us"] = (submitted - start) / count * 1e6
+        result[f"{label}_accept_us"] = (resolved - submitted) / count * 1e6
+    return result
+
+
+@benchmark("bulk_accept")
+def bench_bulk_accept(args):
+    """/tpaccept all by one player with a request from every other player."""
+    server, plugin, players = new_server(args.players, **{"max-pending-per-target": args.players})
+    host = players[0]
+    for requester in players[1:]:
+        handle_tpa_request(plugin, requester, host, RequestType.TPA)
+    start = time.perf_counter()
+    server.dispatch_command(host, "tpaccept all")
+    elapsed = time.perf_counter() - start
+    return {"accepted": len(players) - 1, "total_ms": elapsed * 1e3, "per_request_us": elapsed / max(len(players) - 1, 1) * 1e6}
+
+
+@benchmark("teleport_queue_tick")
+def bench_teleport_queue_tick(args):
+    """Tick cost of draining a burst of accepted teleports at the default budget of 5 per tick."""
+    server, plugin, players = new_server(args.players, **{"teleports-per-tick": 5})
+    count = len(players)
+    for i, requester in enumerate(players):
+        handle_tpa_request(plugin, requester, players[(i + 1) % count], RequestType.TPA)
+    for i, target in enumerate(players):
+        server.dispatch_command(target, f'tpaccept "{players[i - 1].name}"')
+
+    samples = []
+    while len(plugin.teleports):
+        start = time.perf_counter()
+        plugin.teleports.tick()
+        samples.append(time.perf_counter() - start)
+    return {"ticks": len(samples), **latency_summary(samples)}
+
+
+@benchmark("cleanup_tick_idle")
+def bench_cleanup_tick_idle(args):
+    """Tick cost with ``--pending`` requests of which none are due."""
+    _, plugin, players = new_server(args.players, **{"max-outgoing-requests": args.pending})
+    fill_requests(plugin, players, args.pending)
+    samples = []
+    for _ in range(200):
+        start = time.perf_counter()
+        plugin.cleanup_expired_requests()
+        samples.append(time.perf_counter() - start)
+    return {"pending": len(plugin.tpa_requests), **latency_summary(samples)}
+
+
+@benchmark("cleanup_tick_expire_all")
+def bench_cleanup_tick_expire_all(args):
+    """Tick cost when all ``--pending`` requests come due at once."""
+    _, plugin, players = new_server(args.players, **{"max-outgoing-requests": args.pending})
+    plugin.plugin_config["request-timeout"] = -1
+    fill_requests(plugin, players, args.pending)
+    pending = len(plugin.tpa_requests)
+    start = time.perf_counter()
+    plugin.cleanup_expired_requests()
+    elapsed = time.perf_counter() - start
+    return {
+        "expired": pending - len(plugin.tpa_requests),
+        "tick_ms": elapsed * 1e3,
+        "per_expiration_us": elapsed / max(pending, 1) * 1e6,
+    }
+
+
+@benchmark("request_memory")
+def bench_request_memory(args):
+    """Memory held per pending request, measured on the store alone with ``--pending`` requests."""
+    players = [uuid.uuid4() for _ in range(max(args.pending // 10, 2))]
+    count = len(players)
+    store = RequestStore(max_outgoing=args.pending, max_incoming=args.pending)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(args.pending):
+        store.add(players[(i + 1 + i // count) % count], players[i % count], RequestType.TPA, 60)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return {"pending": len(store), "bytes_per_request": used / max(len(store), 1)}
+
+
+@benchmark("shared_poll")
+def bench_shared_poll(args):
+    """Two servers on one shared database: poll cost when idle and after the other server changed settings."""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="tpa-bench-"), "shared.db")
+
+    def load(name: str, port: int, first_uuid: int):
+        server = fake_endstone.FakeServer(port, first_uuid)
+        config = {"storage": "shared", "shared-db-path": db_path, "server-name": name, "rate-limit-per-minute": 0}
+        return server, server.load_plugin(TpaPlugin, config=config)
+
+    _, plugin_a = load("a", 19132, 1)
+    server_b, plugin_b = load("b", 19133, 1_000_000)
+    players = [server_b.join(f"Player{i}") for i in range(min(args.players, 500))]
+    plugin_a.shared.poll()
+
+    idle = []
+    for _ in range(1000):
+        start = time.perf_counter()
+        plugin_a.shared.poll()
+        idle.append(time.perf_counter() - start)
+
+    for i, player in enumerate(players):
+        plugin_b.tpa_policy.toggle_block(player.unique_id, players[i - 1].unique_id)
+    plugin_b.on_disable()  # Waits for the background writes
+    start = time.perf_counter()
+    plugin_a.shared.poll()
+    changed = time.perf_counter() - start
+    plugin_a.on_disable()
+    return {
+        "idle_mean_us": statistics.fmean(idle) * 1e6,
+        "policy_changes": len(players),
+        "apply_changes_ms": changed * 1e3,
+    }
+
+
+@benchmark("config_save")
+def bench_config_save(args):
+    """Snapshot and write cost of config.json with every player blocking five others."""
+    _, plugin, players = new_server(args.players)
+    count = len(players)
+    for i, player in enumerate(players):
+        for offset in range(1, 6):
+            plugin.tpa_policy.toggle_block(player.unique_id, players[(i + offset) % count].unique_id)
+        if i % 10 == 0:
+            plugin.tpa_policy.toggle_auto_accept(player.unique_id)
+
+    writer = plugin.config_writer
+    start = time.perf_counter()
+    data = plugin._config_snapshot()
+    snapshot_elapsed = time.perf_counter() - start
+    writer._write(data)
+    result = {
+        "players": count,
+        "snapshot_ms": snapshot_elapsed * 1e3,
+        "write_ms": writer.last_flush_ms,
+        "file_bytes": os.path.getsize(writer.path),
+    }
+    start = time.perf_counter()
+    for _ in range(1000):
+        plugin.save_policy()
+    result["mark_dirty_us"] = (time.perf_counter() - start) / 1000 * 1e6
+    return result
+
+
+@benchmark("snapshot_storage")
+def bench_snapshot_storage(args):
+    """
+    Startup load and save of the settings of ``--pending`` players who each
+    block five others, from config.json and from a binary snapshot.
+    """
+    folder = tempfile.mkdtemp(prefix="tpa-bench-")
+    players = [str(uuid.UUID(int=i + 1)) for i in range(args.pending)]
+    count = len(players)
+    config = {
+        "blocks": {player: [players[(i + offset) % count] for offset in range(1, 6)] for i, player in enumerate(players)},
+        "all_blocks": players[::20],
+        "auto_accept": players[::10],
+    }
+    json_path = os.path.join(folder, "config.json")
+    with open(json_path, "w") as f:
+        json.dump(config, f, indent=4)
+    snapshot_path = os.path.join(folder, "tpa-policy.bin")
+    write_config_snapshot(snapshot_path, config)
+    result = {"players": count, "json_bytes": os.path.getsize(json_path), "snapshot_bytes": os.path.getsize(snapshot_path)}
+
+    def load_json():
+        with open(json_path) as f:
+            return PolicyStore.from_config(json.load(f))
+
+    def load_snapshot():
+        return SnapshotPolicyStore(snapshot_path, logging.getLogger("bench"))
+
+    stores = {}
+    # The snapshot goes first: freeing what tracing the JSON load allocated
+    # would otherwise be paid for by the next allocations.
+    for name, load in (("snapshot", load_snapshot), ("json", load_json)):
+        start = time.perf_counter()
+        stores[name] = load()
+        result[f"{name}_load_ms"] = (time.perf_counter() - start) * 1e3
+        stores.pop(name).close()
+        tracemalloc.start()
+        stores[name] = load()
+        result[f"{name}_load_peak_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    store = stores["snapshot"]
+
+    # First lookup of 1000 players joining, then saving after one of them changed a setting.
+    joining = [uuid.UUID(player) for player in players[:: max(count // 1000, 1)]]
+    start = time.perf_counter()
+    for player in joining:
+        store.load_player(player)
+    result["snapshot_join_us"] = (time.perf_counter() - start) / len(joining) * 1e6
+    store.toggle_block(joining[0], joining[-1])
+    start = time.perf_counter()
+    store.close()
+    result["snapshot_save_ms"] = (time.perf_counter() - start) * 1e3
+
+    json_store = stores["json"]
+    json_store.toggle_block(joining[0], joining[-1])
+    start = time.perf_counter()
+    data = json_store.to_config()
+    with open(json_path, "w") as f:
+        json.dump(data, f, indent=4)
+    result["json_save_ms"] = (time.perf_counter() - start) * 1e3
+    return result
+
+
+@benchmark("hot_reload")
+def bench_hot_reload(args):
+    """Watcher check with nothing changed, and a config.json reload with every player blocking five others."""
+    _, plugin, players = new_server(args.players)
+    count = len(players)
+    for i, player in enumerate(players):
+        for offset in range(1, 6):
+            plugin.tpa_policy.toggle_block(player.unique_id, players[(i + offset) % count].unique_id)
+    plugin.save_policy()
+    plugin.config_writer.flush()
+    plugin.check_for_changes()
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        plugin.check_for_changes()
+    idle = (time.perf_counter() - start) / 1000
+
+    with open(plugin.config_writer.path) as f:
+        config = json.load(f)
+    config["request-timeout"] = 30
+    config["blocks"][str(players[0].unique_id)].append(str(players[-1].unique_id))
+    with open(plugin.config_writer.path, "w") as f:
+        json.dump(config, f)
+    start = time.perf_counter()
+    reloaded = plugin.check_for_changes()
+    elapsed = time.perf_counter() - start
+    assert reloaded == ["config.json"], reloaded
+    return {"idle_check_us": idle * 1e6, "config_reload_ms": elapsed * 1e3}
+
+
+@benchmark("selectors")
+def bench_selectors(args):
+    """Players spread over a 4000x4000 block area: move events, @a[r=50] and @p."""
+    server, plugin, players = new_server(args.players)
+    rng = random.Random(1)
+    for player in players:
+        player.move(rng.uniform(-2000, 2000), 64, rng.uniform(-2000, 2000))
+
+    start = time.perf_counter()
+    for player in players:
+        location = player.location
+        player.move(location.x + 0.3, location.y, location.z + 0.3)
+    move = (time.perf_counter() - start) / len(players)
+
+    result = {"move_event_us": move * 1e6}
+    for name, text in (("radius_50", "@a[r=50]"), ("nearest", "@p")):
+        selector = Selector.parse(text)
+        samples = []
+        for player in players:
+            start = time.perf_counter()
+            selector.select(plugin, player)
+            samples.append(time.perf_counter() - start)
+        result[f"{name}_us"] = statistics.fmean(samples) * 1e6
+    return result
+
+
+@benchmark("profiling")
+def bench_profiling(args):
+    """Mean /tpa plus /tpdeny latency with profiling off and in each /tpaprofile mode."""
+    server, plugin, players = new_server(args.players)
+    count = len(players)
+    result = {}
+    for mode in ("off", "cpu", "sample", "memory"):
+        if mode != "off":
+            plugin.start_profiling(mode, 600)
+        start = time.perf_counter()
+        for i, requester in enumerate(players):
+            target = players[(i + 1) % count]
+            server.dispatch_command(requester, f'tpa "{target.name}"')
+            server.dispatch_command(target, f'tpdeny "{requester.name}"')
+        result[f"{mode}_us"] = (time.perf_counter() - start) / count * 1e6
+        if mode != "off":
+            plugin.stop_profiling()
+    return result
+
+
+@benchmark("tracing")
+def bench_tracing(args):
+    """Mean /tpa plus /tpdeny latency with and without /tpatrace recording, and the trace size."""
+    server, plugin, players = new_server(args.players)
+    count = len(players)
+    result = {}
+    for mode in ("off", "on"):
+        if mode == "on":
+            path = plugin.start_tracing()
+        start = time.perf_counter()
+        for i, requester in enumerate(players):
+            target = players[(i + 1) % count]
+            server.dispatch_command(requester, f'tpa "{target.name}"')
+            server.dispatch_command(target, f'tpdeny "{requester.name}"')
+        result[f"{mode}_us"] = (time.perf_counter() - start) / count * 1e6
+    plugin.stop_tracing()
+    result["bytes_per_command"] = os.path.getsize(path) / (2 * count)
+    return result
+
+
+@benchmark("translation")
+def bench_translation(args):
+    server, plugin, _ = new_server(2)
+    players = [server.join("English"), server.join("Korean", "ko_KR"), server.join("French", "fr_FR")]
+    keys = [("tpa.request_sent", ("Target",)), ("tpa.request_helper", ("Target", 60)), ("tpa.form.title", ())]
+    iterations = 20000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for player in players:
+            for key, key_args in keys:
+                plugin._(player, key, *key_args, return_string=True)
+    elapsed = time.perf_counter() - start
+    calls = iterations * len(players) * len(keys)
+    return {"calls": calls, "mean_us": elapsed / calls * 1e6}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """List every timing in ``results`` that regressed against ``baseline`` by more than ``tolerance``."""
+    regressions = []
+    for name, metrics in results.items():
+        old = baseline.get(name, {})
+        for metric, value in metrics.items():
+            if metric not in old or not old[metric]:
+                continue
+            if metric.startswith("max_"):
+                # Single worst samples are too noisy to compare.
+                continue
+            if metric.endswith(("_us", "_ms")):
+                change = value / old[metric] - 1
+            elif metric == "ops_per_sec":
+                change = old[metric] / value - 1
+            else:
+                continue
+            if change > tolerance:
+                regressions.append(f"{name}.{metric}: {old[metric]:.3f} -> {value:.3f} (+{change:.0%})")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=2000, help="simulated online players")
+    parser.add_argument("--pending", type=int, default=10000, help="pending requests for the cleanup benchmarks")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against an earlier JSON result file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        results[name] = BENCHMARKS[name](args)
+        print(f"{name}: " + ", ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in results[name].items()))
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "players": args.players,
+            "pending": args.pending,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+"""
+In-process stand-in for the parts of the ``endstone`` API that the plugin uses.
+
+Call ``install()`` before importing ``endstone_tpa``; it registers fake
+``endstone`` modules in ``sys.modules`` so the plugin can be loaded, enabled
+and driven without a Bedrock server. ``FakeServer`` can hold thousands of
+players and advances the scheduler one tick at a time.
+"""
+
+import itertools
+import logging
+import os
+import shlex
+import sys
+import tempfile
+import types
+from collections import deque
+from pathlib import Path
+from uuid import UUID
+
+
+class Location:
+    __slots__ = ("x", "y", "z", "dimension")
+
+    def __init__(self, x: float = 0.0, y: float = 64.0, z: float = 0.0, dimension: "Dimension | None" = None):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.dimension = dimension
+
+
+class Dimension:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class CommandSender:
+    def __init__(self, server: "FakeServer", name: str = "Server"):
+        self.server = server
+        self.name = name
+        self.messages = deque(maxlen=32)
+
+    def send_message(self, message: str) -> None:
+        self.messages.append(message)
+
+    def has_permission(self, name: str) -> bool:
+        return True
+
+    @property
+    def is_op(self) -> bool:
+        return True
+
+
+class Player(CommandSender):
+    def __init__(self, server: "FakeServer", name: str, unique_id: UUID, locale: str = "en_US"):
+        super().__init__(server, name)
+        self.unique_id = unique_id
+        self.locale = locale
+        self.location = Location(dimension=server.overworld)
+        self.forms = deque(maxlen=8)
+        self.teleports = 0
+        self.transfers: list[tuple[str, int]] = []
+        self.op = False
+        self.is_valid = True
+
+    @property
+    def dimension(self) -> Dimension:
+        return self.location.dimension
+
+    @property
+    def is_op(self) -> bool:
+        return self.op
+
+    def has_permission(self, name: str) -> bool:
+        return self.op or not name.startswith("tpa.command.admin")
+
+    def send_form(self, form: "MessageForm") -> None:
+        self.forms.append(form)
+
+    def teleport(self, target) -> None:
+        location = target if isinstance(target, Location) else target.location
+        old, self.location = self.location, Location(location.x, location.y, location.z, location.dimension)
+        self.teleports += 1
+        if self.server.plugin is not None:
+            self.server.plugin.on_player_teleport(PlayerTeleportEvent(self, old, self.location))
+
+    def move(self, x: float, y: float, z: float, dimension: "Dimension | None" = None) -> None:
+        """Walk to a position, firing a move event like the server does every tick a player moves."""
+        old, self.location = self.location, Location(x, y, z, dimension or self.location.dimension)
+        if self.server.plugin is not None:
+            self.server.plugin.on_player_move(PlayerMoveEvent(self, old, self.location))
+
+    def transfer(self, host: str, port: int = 19132) -> None:
+        self.transfers.append((host, port))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Player) and other.unique_id == self.unique_id
+
+    def __hash__(self) -> int:
+        return hash(self.unique_id)
+
+    def __repr__(self) -> str:
+        return f"Player({self.name})"
+
+
+class Command:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class MessageForm:
+    def __init__(self, title: str = "", content: str = "", button1: str = "", button2: str = ""):
+        self.title = title
+        self.content = content
+        self.button1 = button1
+        self.button2 = button2
+        self.on_submit = None
+        self.on_close = None
+
+
+class Task:
+    _ids = itertools.count(1)
+
+    def __init__(self, task, delay: int, period: int, due: int):
+        self.task_id = next(self._ids)
+        self.task = task
+        self.period = period
+        self.due = due
+        self.is_cancelled = False
+
+    def cancel(self) -> None:
+        self.is_cancelled = True
+
+
+class Scheduler:
+    def __init__(self):
+        self.current_tick = 0
+        self.tasks: list[Task] = []
+
+    def run_task(self, plugin, task, delay: int = 0, period: int = 0) -> Task:
+        scheduled = Task(task, delay, period, self.current_tick + max(delay, 1))
+        self.tasks.append(scheduled)
+        return scheduled
+
+    def cancel_task(self, task_id: int) -> None:
+        for task in self.tasks:
+            if task.task_id == task_id:
+                task.cancel()
+
+    def tick(self, count: int = 1) -> None:
+        for _ in range(count):
+            self.current_tick += 1
+            for task in list(self.tasks):
+                if task.is_cancelled or task.due > self.current_tick:
+                    continue
+                task.task()
+                if task.period > 0:
+                    task.due = self.current_tick + task.period
+                else:
+                    task.cancel()
+            self.tasks = [task for task in self.tasks if not task.is_cancelled]
+
+
+class Language:
+    locale = "en_US"
+
+
+class Event:
+    pass
+
+
+class PlayerEvent(Event):
+    def __init__(self, player: Player):
+        self.player = player
+
+
+class PlayerJoinEvent(PlayerEvent):
+    pass
+
+
+class PlayerQuitEvent(PlayerEvent):
+    pass
+
+
+class PlayerMoveEvent(PlayerEvent):
+    def __init__(self, player: Player, from_location: Location, to_location: Location):
+        super().__init__(player)
+        self.from_location = from_location
+        self.to_location = to_location
+
+
+class PlayerTeleportEvent(PlayerMoveEvent):
+    pass
+
+
+class EventPriority:
+    LOWEST, LOW, NORMAL, HIGH, HIGHEST, MONITOR = range(6)
+
+
+def event_handler(func=None, **kwargs):
+    if func is None:
+        return lambda f: f
+    return func
+
+
+class Plugin:
+    def __init__(self):
+        self.server: "FakeServer | None" = None
+        self.logger = logging.getLogger("TpaPlugin")
+        self.data_folder = Path(tempfile.mkdtemp(prefix="tpa-bench-"))
+
+    def register_events(self, listener) -> None:
+        pass
+
+
+class FakeServer:
+    """
+    A server with a scheduler, a player list and one plugin. Servers that
+    share state need distinct ``port``s and ``first_uuid``s.
+    """
+
+    def __init__(self, port: int = 19132, first_uuid: int = 1):
+        self.port = port
+        self.scheduler = Scheduler()
+        self.language = Language()
+        self.logger = logging.getLogger("Server")
+        self.overworld = Dimension("Overworld")
+        self.nether = Dimension("Nether")
+        self.the_end = Dimension("TheEnd")
+        self.online_players: list[Player] = []
+        self._players_by_id: dict[UUID, Player] = {}
+        self._players_by_name: dict[str, Player] = {}
+        self._uuid_counter = itertools.count(first_uuid)
+        self.command_sender = CommandSender(self)
+        self.plugin = None
+
+    def load_plugin(self, plugin_class, data_folder: str | None = None, config: dict | None = None):
+        """Construct, load and enable a plugin. ``config`` is written as config.json first."""
+        plugin = plugin_class()
+        plugin.server = self
+        if data_folder is not None:
+            plugin.data_folder = Path(data_folder)
+        if config is not None:
+            import json
+
+            os.makedirs(plugin.data_folder, exist_ok=True)
+            with open(plugin.data_folder / "config.json", "w") as f:
+                json.dump(config, f)
+        self.plugin = plugin
+        plugin.on_load()
+        plugin.on_enable()
+        return plugin
+
+    def join(self, name: str, locale: str = "en_US", unique_id: UUID | None = None) -> Player:
+        player = Player(self, name, unique_id or UUID(int=next(self._uuid_counter)), locale)
+        self.online_players.append(player)
+        self._players_by_id[player.unique_id] = player
+        self._players_by_name[name.lower()] = player
+        if self.plugin is not None:
+            self.plugin.on_player_join(PlayerJoinEvent(player))
+        return player
+
+    def quit(self, player: Player) -> None:
+        if self.plugin is not None:
+            self.plugin.on_player_quit(PlayerQuitEvent(player))
+        self.online_players.remove(player)
+        self._players_by_id.pop(player.unique_id, None)
+        self._players_by_name.pop(player.name.lower(), None)
+        player.is_valid = False
+
+    def get_player(self, name_or_uuid):
+        if isinstance(name_or_uuid, UUID):
+            return self._players_by_id.get(name_or_uuid)
+        return self._players_by_name.get(name_or_uuid.lower())
+
+    def dispatch_command(self, sender: CommandSender, command_line: str) -> bool:
+        name, *args = shlex.split(command_line)
+        return self.plugin.on_command(sender, Command(name), args)
+
+
+def install() -> None:
+    """Register the fake ``endstone`` modules in ``sys.modules``."""
+    modules = {
+        "endstone": {"Player": Player, "Server": FakeServer},
+        "endstone.command": {"Command": Command, "CommandSender": CommandSender},
+        "endstone.event": {
+            "event_handler": event_handler,
+            "EventPriority": EventPriority,
+            "Event": Event,
+            "PlayerEvent": PlayerEvent,
+            "PlayerJoinEvent": PlayerJoinEvent,
+            "PlayerQuitEvent": PlayerQuitEvent,
+            "PlayerMoveEvent": PlayerMoveEvent,
+            "PlayerTeleportEvent": PlayerTeleportEvent,
+        },
+        "endstone.form": {"MessageForm": MessageForm},
+        "endstone.level": {"Location": Location, "Dimension": Dimension},
+        "endstone.plugin": {"Plugin": Plugin},
+        "endstone.scheduler": {"Scheduler": Scheduler, "Task": Task},
+    }
+    for name, attributes in modules.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attributes)
+        sys.modules[name] = module
+    for name in modules:
+        if "." in name:
+            parent, child = name.rsplit(".", 1)
+            setattr(sys.modules[parent], child, sys.modules[name])
@@ -0,0 +1,279 @@
+"""
+Replay a trace recorded with /tpatrace against the plugin on the fake server.
+
+    python benchmarks/replay.py TRACE [--config JSON] [--interval SECONDS]
+                                      [--top N] [--output report.json]
+
+The trace runs as fast as the plugin handles it. Simulated players join,
+quit, move and send commands as recorded, and the request and rate limiter
+clocks follow the trace's timestamps, so requests expire and rate limits
+refill as they did on the server. The report gives the throughput, the
+state sizes every ``--interval`` simulated seconds, per-handler latencies
+and the slowest calls.
+
+The trace's settings are used, except that ``storage`` is always ``json``;
+``--config`` overrides any of them, for example to replay with a different
+``teleports-per-tick``. Block and auto-accept settings start out as the
+traced players had them when they first joined. Settings of players who
+never joined during the trace are not known, which only matters for
+requests from players on other servers.
+
+Each simulated player's UUID is their number in the trace.
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import os
+import sys
+import time
+import traceback
+from typing import Dict, List, Tuple
+from uuid import UUID
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench import latency_summary  # noqa: E402  (also installs the fake endstone modules)
+from fake_endstone import Command, FakeServer, Location  # noqa: E402
+
+from endstone_tpa import TpaPlugin  # noqa: E402
+from endstone_tpa.spatial import dimension_key  # noqa: E402
+from endstone_tpa.tracing import CONSOLE, VERSION, TraceEvent, read_trace  # noqa: E402
+
+
+class SimulatedClock:
+    """Seconds since the start of the trace, as of the event being replayed."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Replay:
+    def __init__(self, server, plugin, top: int, interval: float):
+        self.server = server
+        self.plugin = plugin
+        self.clock = SimulatedClock()
+        plugin.tpa_requests.clock = self.clock
+        plugin.rate_limiter.clock = self.clock
+        self.dimensions = {dimension_key(d.name): d for d in (server.overworld, server.nether, server.the_end)}
+        # Trace player id -> simulated player
+        self.players = {}
+        self.top = top
+        self.interval = interval
+        self.next_sample = 0.0
+        self.samples: List[dict] = []
+        # label -> call durations in seconds
+        self.timings: Dict[str, List[float]] = {}
+        # Min-heap of the ``top`` slowest calls: (seconds, line, simulated time, description)
+        self.slowest: List[Tuple[float, int, float, str]] = []
+        self.events = 0
+        self.skipped = 0
+        self.errors: List[str] = []
+
+    def run(self, events) -> float:
+        """Replay ``events``. Returns the wall-clock seconds it took."""
+        start = time.perf_counter()
+        for event in events:
+            self.events += 1
+            if event.kind == "T":
+                self._ticks(event)
+            else:
+                self.clock.now = max(self.clock.now, event.ms / 1000)
+                handler = getattr(self, "_" + event.kind, None)
+                if handler is None:
+                    self.skipped += 1
+                else:
+                    handler(event)
+            if self.clock.now >= self.next_sample:
+                self._sample()
+        elapsed = time.perf_counter() - start
+        self._sample()
+        return elapsed
+
+    def _ticks(self, event: TraceEvent) -> None:
+        count = int(event.fields[0])
+        step = max(event.ms / 1000 - self.clock.now, 0.0) / count
+        for _ in range(count):
+            self.clock.now += step
+            self._call(event, "tick", f"tick {self.server.scheduler.current_tick + 1}", self.server.scheduler.tick)
+
+    def _J(self, event: TraceEvent) -> None:
+        player_id, locale, dimension, x, y, z, name = event.fields
+        player = self._call(event, "join", f"{name} joined", self.server.join, name, locale, _uuid(player_id))
+        if player is not None:
+            self.players[player_id] = player
+            self._move(player, dimension, x, y, z)
+
+    def _P(self, event: TraceEvent) -> None:
+        player_id, all_block, auto_accept, blocked = event.fields
+        player = str(_uuid(player_id))
+        policy = {
+            "blocks": {player: [str(_uuid(blocked_id)) for blocked_id in blocked.split(",") if blocked_id]},
+            "all_blocks": [player] if all_block == "1" else [],
+            "auto_accept": [player] if auto_accept == "1" else [],
+        }
+        self.plugin.tpa_policy.apply_config_diff({}, policy)
+
+    def _Q(self, event: TraceEvent) -> None:
+        player = self.players.pop(event.fields[0], None)
+        if player is None:
+            self.skipped += 1
+            return
+        self._call(event, "quit", f"{player.name} left", self.server.quit, player)
+
+    def _C(self, event: TraceEvent) -> None:
+        player_id, name, args = event.fields[:3]
+        if player_id == CONSOLE:
+            sender = self.server.command_sender
+        else:
+            sender = self.players.get(player_id)
+            if sender is None:
+                self.skipped += 1
+                return
+            self._move(sender, *event.fields[3:7])
+        args = json.loads(args)
+        description = f"{sender.name}: /{' '.join([name, *args])}"
+        self._call(event, "/" + name, description, self.plugin.on_command, sender, Command(name), args)
+
+    def _F(self, event: TraceEvent) -> None:
+        player_id, requester_id, button, requester_name = event.fields
+        player = self.players.get(player_id)
+        if player is None:
+            self.skipped += 1
+            return
+        requester_uuid = _uuid(requester_id)
+        description = f"{player.name}: form from {requester_name}, button {button}"
+        self._call(
+            event, "form", description, self.plugin.forms._on_submit, requester_uuid, requester_name, player, int(button)
+        )
+
+    def _move(self, player, dimension: str, x: str, y: str, z: str) -> None:
+        location = Location(float(x), float(y), float(z), self.dimensions.get(dimension_key(dimension)))
+        current = player.location
+        if (location.x, location.y, location.z) != (current.x, current.y, current.z) or (
+            location.dimension is not None and location.dimension is not current.dimension
+        ):
+            player.move(location.x, location.y, location.z, location.dimension)
+
+    def _call(self, event: TraceEvent, label: str, description: str, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        except Exception:
+            self.errors.append(f"line {event.line}: {description}\n{traceback.format_exc()}")
+            return None
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings.setdefault(label, []).append(elapsed)
+            entry = (elapsed, event.line, self.clock.now, description)
+            if len(self.slowest) < self.top:
+                heapq.heappush(self.slowest, entry)
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+    def _sample(self) -> None:
+        gauges = self.plugin.metrics_gauges()
+        self.samples.append(
+            {
+                "t": round(self.clock.now, 3),
+                "pending_requests": gauges["pending_requests"],
+                "queued_teleports": gauges["queued_teleports"],
+                "online_players": gauges["online_players"],
+                "cached_policies": gauges["cached_policies"],
+            }
+        )
+        self.next_sample = (self.clock.now // self.interval + 1) * self.interval
+
+
+def _uuid(player_id: str) -> UUID:
+    return UUID(int=int(player_id))
+
+
+def report(replay: Replay, elapsed: float) -> dict:
+    commands = sum(len(samples) for label, samples in replay.timings.items() if label.startswith("/"))
+    simulated = replay.clock.now
+    return {
+        "events": replay.events,
+        "skipped": replay.skipped,
+        "errors": len(replay.errors),
+        "simulated_seconds": simulated,
+        "wall_seconds": elapsed,
+        "speedup": simulated / elapsed if elapsed else 0.0,
+        "events_per_sec": replay.events / elapsed if elapsed else 0.0,
+        "commands_per_sec": commands / elapsed if elapsed else 0.0,
+        "handlers": {label: latency_summary(samples) for label, samples in sorted(replay.timings.items())},
+        "state": replay.samples,
+        "slowest": [
+            {"ms": seconds * 1e3, "line": line, "t": round(at, 3), "call": description}
+            for seconds, line, at, description in sorted(replay.slowest, reverse=True)
+        ],
+    }
+
+
+def print_report(result: dict) -> None:
+    print(
+        f"Replayed {result['events']} events ({result['skipped']} skipped, {result['errors']} failed) covering "
+        f"{result['simulated_seconds']:.1f} s in {result['wall_seconds']:.2f} s ({result['speedup']:.0f}x)."
+    )
+    print(f"Throughput: {result['events_per_sec']:.0f} events/s, {result['commands_per_sec']:.0f} commands/s")
+
+    print("\nhandler: count, mean us, p50 us, p99 us, max us")
+    for label, summary in result["handlers"].items():
+        print(
+            f"{label}: {summary['count']}, {summary['mean_us']:.1f}, {summary['p50_us']:.1f}, "
+            f"{summary['p99_us']:.1f}, {summary['max_us']:.1f}"
+        )
+
+    print("\nt (s): pending requests, queued teleports, online players, cached policies")
+    for sample in result["state"]:
+        print(
+            f"{sample['t']:.1f}: {sample['pending_requests']}, {sample['queued_teleports']}, "
+            f"{sample['online_players']}, {sample['cached_policies']}"
+        )
+
+    print("\nSlowest calls:")
+    for call in result["slowest"]:
+        print(f"{call['ms']:.3f} ms at {call['t']:.1f} s (line {call['line']}): {call['call']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", help="trace file written by /tpatrace")
+    parser.add_argument("--config", default="{}", help="JSON object of settings to override")
+    parser.add_argument("--interval", type=float, default=10.0, help="simulated seconds between state samples")
+    parser.add_argument("--top", type=int, default=10, help="how many of the slowest calls to list")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    header = {}
+    events = read_trace(args.trace, header)
+    # Reading the first event reads the header lines before it.
+    first = next(events, None)
+    if header.get("version") != VERSION:
+        print(f"{args.trace} is not a version {VERSION} trace.", file=sys.stderr)
+        return 1
+
+    config = {**header.get("config", {}), "storage": "json", **json.loads(args.config)}
+    # Unlike bench.py, no benchmark defaults: settings missing from the trace were the plugin's defaults.
+    server = FakeServer()
+    plugin = server.load_plugin(TpaPlugin, config=config)
+    replay = Replay(server, plugin, args.top, args.interval)
+    elapsed = replay.run([] if first is None else itertools.chain([first], events))
+    plugin.on_disable()
+
+    result = report(replay, elapsed)
+    print_report(result)
+    for error in replay.errors[:5]:
+        print(f"\nFailed at {error}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+import threading
+import traceback
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from endstone import Player
+
+from .request_store import Request, RequestState, RequestType
+from .utils import SendResult, send_request
+
+
+RequestListener = Callable[[Request, RequestState], None]
+
+# Guards the callbacks of every handle, so awaiting a handle from another
+# thread cannot miss it resolving. Held only to check and swap the list.
+_callback_lock = threading.Lock()
+
+
+class RequestHandle:
+    """
+    A request submitted through ``TpaApi``. Its ``state`` is PENDING until the
+    request is answered, expires or is cancelled, and never changes after.
+
+    ACCEPTED means the target accepted and the teleport was handed to the
+    teleport queue; with ``teleports-per-tick`` it may run a few ticks
+    later, and it is dropped if either player leaves or the target blocks
+    the requester in the meantime.
+
+    Nothing here blocks: callbacks added with ``add_done_callback`` run on
+    the server thread as soon as the request resolves, and coroutines on an
+    asyncio loop can ``await`` the handle to get the final state.
+    """
+
+    __slots__ = ("requester", "target", "type", "state", "send_result", "_callbacks")
+
+    def __init__(self, requester: Player, target: Player, request_type: RequestType):
+        self.requester = requester
+        self.target = target
+        self.type = request_type
+        self.state = RequestState.PENDING
+        self.send_result: Optional[SendResult] = None
+        self._callbacks: Optional[List[Callable[["RequestHandle"], None]]] = None
+
+    def done(self) -> bool:
+        return self.state is not RequestState.PENDING
+
+    def add_done_callback(self, callback: Callable[["RequestHandle"], None]) -> None:
+        """
+        Call ``callback(handle)`` once the request resolves, or right away if
+        it already has. This may be called from any thread; a callback added
+        before the request resolves runs on the server thread.
+        """
+        with _callback_lock:
+            if not self.done():
+                if self._callbacks is None:
+                    self._callbacks = [callback]
+                else:
+                    self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def __await__(self):
+        if not self.done():
+            import asyncio
+
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            # Requests resolve on the server thread, which need not be the loop's.
+            self.add_done_callback(lambda handle: loop.call_soon_threadsafe(_set_result, future, handle.state))
+            yield from future.__await__()
+        return self.state
+
+    def _resolve(self, state: RequestState, logger) -> None:
+        with _callback_lock:
+            self.state = state
+            callbacks, self._callbacks = self._callbacks, None
+        for callback in callbacks or ():
+            try:
+                callback(self)
+            except Exception:
+                logger.error(f"Error in a TPA request callback:\n{traceback.format_exc()}")
+
+
+def _set_result(future, state: RequestState) -> None:
+    if not future.done():
+        future.set_result(state)
+
+
+class TpaApi:
+    """
+    Lets other plugins send TPA requests and follow every request's
+    lifecycle. Reach it as ``server.plugin_manager.get_plugin("tpa").api``.
+
+    Requests sent here go through the same checks as /tpa and /tpthere,
+    except for the command rate limit, and the target gets the usual prompt;
+    the requester is not sent any message, so the calling plugin can word
+    its own. Handles are tracked only while pending, by their request, and
+    resolving one is a dictionary pop.
+
+    Every call must be made from the server thread.
+    """
+
+    def __init__(self, plugin):
+        self.plugin = plugin
+        # Pending request -> its handle, for requests submitted here
+        self._handles: Dict[Request, RequestHandle] = {}
+        self._listeners: List[RequestListener] = []
+
+    def submit(
+        self,
+        requester: Player,
+        target: Player,
+        request_type: RequestType = RequestType.TPA,
+        timeout: Optional[float] = None,
+    ) -> RequestHandle:
+        """
+        Send a request from ``requester`` to ``target``. With TPA the
+        requester teleports to the target once accepted; with TPTHERE the
+        target teleports to the requester. ``timeout`` defaults to
+        ``request-timeout``.
+        """
+        plugin = self.plugin
+        if timeout is None:
+            timeout = plugin.plugin_config.get("request-timeout", 60)
+        handle = RequestHandle(requester, target, request_type)
+        result = handle.send_result = send_request(plugin, requester, target, request_type, timeout)
+        if result is SendResult.SENT:
+            self._handles[plugin.tpa_requests.get(target.unique_id, requester.unique_id)] = handle
+        elif result is SendResult.AUTO_ACCEPTED:
+            handle._resolve(RequestState.ACCEPTED, plugin.logger)
+        else:
+            handle._resolve(RequestState.REJECTED, plugin.logger)
+        return handle
+
+    def submit_many(
+        self,
+        pairs: Iterable[Tuple[Player, Player]],
+        request_type: RequestType = RequestType.TPA,
+        timeout: Optional[float] = None,
+    ) -> List[RequestHandle]:
+        """Send one request per (requester, target) pair. Returns the handles in the same order."""
+        if timeout is None:
+            timeout = self.plugin.plugin_config.get("request-timeout", 60)
+        return [self.submit(requester, target, request_type, timeout) for requester, target in pairs]
+
+    def cancel(self, handle: RequestHandle) -> bool:
+        """Withdraw a pending request. The target is told. Returns False if it had already resolved."""
+        plugin = self.plugin
+        request = plugin.tpa_requests.get(handle.target.unique_id, handle.requester.unique_id)
+        if request is None or self._handles.get(request) is not handle:
+            return False
+        plugin.tpa_requests.remove(request)
+        plugin.metrics.incr("cancelled")
+        if plugin.players.get(handle.target.unique_id):
+            plugin._(handle.target, "tpa.sender_cancelled", handle.requester.name)
+        self.emit(request, RequestState.CANCELLED)
+        return True
+
+    def add_listener(self, listener: RequestListener) -> None:
+        """
+        Call ``listener(request, state)`` whenever any request, including
+        those sent by command, becomes pending (PENDING) or resolves.
+        Requests auto-accepted by their target go straight to ACCEPTED. As
+        with handles, ACCEPTED is reported when the teleport is queued.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: RequestListener) -> None:
+        self._listeners.remove(listener)
+
+    def emit(self, request: Request, state: RequestState) -> None:
+        """Report a lifecycle change of ``request``. Called wherever the plugin adds or removes requests."""
+        if self._handles and state is not RequestState.PENDING:
+            handle = self._handles.pop(request, None)
+            if handle is not None:
+                handle._resolve(state, self.plugin.logger)
+        for listener in self._listeners:
+            try:
+                listener(request, state)
+            except Exception:
+                self.plugin.logger.error(f"Error in a TPA request listener:\n{traceback.format_exc()}")
+
+    def emit_all(self, requests: Iterable[Request], state: RequestState) -> None:
+        if self._handles or self._listeners:
+            for request in requests:
+                self.emit(request, state)
+
+    def close(self) -> None:
+        """Cancel the handles still pending, as the plugin is being disabled."""
+        handles, self._handles = self._handles, {}
+        for handle in handles.values():
+            handle._resolve(RequestState.CANCELLED, self.plugin.logger)
@@ -1,29 +1,82 @@
 import importlib
-import pkgutil
-import os
+from typing import Callable, Dict
 
-preloaded_commands = {}
-preloaded_handlers = {}
+# Command metadata handed to Endstone. Each command is handled by the
+# ``handler`` function of the module with the same name in this package;
+# that module is only imported the first time the command is used.
+COMMANDS = {
+    "tpa": {
+        "description": "Request to teleport to another player.",
+        "usages": ["/tpa <player: player>"],
+        "permissions": ["tpa.command.tpa"],
+    },
+    "tpthere": {
+        "description": "Request one or more players to teleport to you.",
+        "usages": ["/tpthere <player: player>", "/tpthere <players: message>"],
+        "permissions": ["tpa.command.tpthere"],
+    },
+    "tpaccept": {
+        "description": "Accept a teleport request, or all of them.",
+        "usages": ["/tpaccept [player: player]", "/tpaccept (all)<all: TpaAll>"],
+        "permissions": ["tpa.command.tpaccept"],
+    },
+    "tpdeny": {
+        "description": "Deny a teleport request, or all of them.",
+        "usages": ["/tpdeny [player: player]", "/tpdeny (all)<all: TpaAll>"],
+        "permissions": ["tpa.command.tpdeny"],
+    },
+    "tpacancel": {
+        "description": "Cancel a teleport request.",
+        "usages": ["/tpacancel [player: player]"],
+        "permissions": ["tpa.command.tpacancel"],
+    },
+    "tpablock": {
+        "description": "Block TPA requests from a specific player.",
+        "usages": ["/tpablock <player: player>"],
+        "permissions": ["tpa.command.tpablock"],
+    },
+    "tpaallblock": {
+        "description": "Toggle blocking all TPA requests.",
+        "usages": ["/tpaallblock"],
+        "permissions": ["tpa.command.tpaallblock"],
+    },
+    "tpaautoaccept": {
+        "description": "Toggle automatically accepting all TPA requests.",
+        "usages": ["/tpaautoaccept"],
+        "permissions": ["tpa.command.tpaautoaccept"],
+    },
+    "tpastats": {
+        "description": "Show TPA plugin statistics.",
+        "usages": ["/tpastats"],
+        "permissions": ["tpa.command.tpastats"],
+    },
+    "tpareload": {
+        "description": "Reload the TPA config and language files.",
+        "usages": ["/tpareload"],
+        "permissions": ["tpa.command.tpareload"],
+    },
+    "tpaprofile": {
+        "description": "Profile the TPA command handlers and tasks for a number of seconds.",
+        "usages": [
+            "/tpaprofile (cpu|sample|memory)<mode: TpaProfileMode> [seconds: int]",
+            "/tpaprofile (stop)<stop: TpaProfileStop>",
+        ],
+        "permissions": ["tpa.command.tpaprofile"],
+    },
+    "tpatrace": {
+        "description": "Record the TPA commands, forms and ticks to a trace file for replay.",
+        "usages": ["/tpatrace (start|stop)<action: TpaTraceAction>"],
+        "permissions": ["tpa.command.tpatrace"],
+    },
+}
 
-def preload_commands():
-    """Preload all command modules."""
-    global preloaded_commands, preloaded_handlers
-    
-    print("[TpaPlugin] Registering commands...")
-    commands_base_path = os.path.dirname(__file__)
-    
-    for _, module_name, _ in pkgutil.iter_modules([commands_base_path]):
-        if module_name == "__init__":
-            continue
-        module_import_path = f"endstone_tpa.commands.{module_name}"
-        module = importlib.import_module(module_import_path)
+_handlers: Dict[str, Callable] = {}
 
-        if hasattr(module, 'command') and hasattr(module, 'handler'):
-            for cmd, details in module.command.items():
-                print(f"+ {cmd} - {details.get('description', 'No description')}")
-                preloaded_commands[cmd] = details
-                preloaded_handlers[cmd] = module.handler
-    print("\n")
 
-# Run preload automatically when this file is imported
-preload_commands()
+def get_handler(name: str) -> Callable | None:
+    """Return the handler for a command, importing its module on first use."""
+    handler = _handlers.get(name)
+    if handler is None and name in COMMANDS:
+        module = importlib.import_module(f"{__name__}.{name}")
+        handler = _handlers[name] = module.handler
+    return handler
@@ -1,13 +1,7 @@
 from endstone import Player
-from ..utils import get_target_player, handle_tpa_request
+from ..request_store import RequestType
+from ..utils import get_target_player, handle_remote_request, handle_tpa_request
 
-command = {
-    "tpa": {
-        "description": "Request to teleport to another player.",
-        "usages": ["/tpa <player: player>"],
-        "permissions": ["tpa.command.tpa"],
-    }
-}
 
 def handler(plugin, sender, args):
     if not isinstance(sender, Player):
@@ -21,11 +15,15 @@ def handler(plugin, sender, args):
         return False
 
     target_name = args[0]
-    target = get_target_player(player, target_name)
+    target = get_target_player(plugin, player, target_name)
 
     if target is None:
+        remote = plugin.shared.find(target_name)
+        if remote is not None:
+            handle_remote_request(plugin, player, remote, RequestType.TPA)
+            return True
         plugin._(sender, "tpa.player_not_found", target_name)
         return True
 
-    handle_tpa_request(plugin, player, target, "tpa")
+    handle_tpa_request(plugin, player, target, RequestType.TPA)
     return True
@@ -1,30 +1,16 @@
 from endstone import Player
 
-command = {
-    "tpaautoaccept": {
-        "description": "Toggle automatically accepting all TPA requests.",
-        "usages": ["/tpaautoaccept"],
-        "permissions": ["tpa.command.tpaautoaccept"],
-    }
-}
 
 def handler(plugin, sender, args):
     if not isinstance(sender, Player):
         plugin._(sender, "tpa.not_a_player")
         return True
 
-    player_uuid = sender.unique_id
-    if player_uuid in plugin.tpa_auto_accept:
-        plugin.tpa_auto_accept.remove(player_uuid)
-        plugin._(sender, "tpa.auto_accept_disabled")
-    else:
-        plugin.tpa_auto_accept.append(player_uuid)
+    if plugin.tpa_policy.toggle_auto_accept(sender.unique_id):
         plugin._(sender, "tpa.auto_accept_enabled")
+    else:
+        plugin._(sender, "tpa.auto_accept_disabled")
 
-    # Save to config
-    plugin.plugin_config["auto_accept"] = [str(uuid) for uuid in plugin.tpa_auto_accept]
-    with open(plugin.data_folder / "config.json", "w") as f:
-        import json
-        json.dump(plugin.plugin_config, f, indent=4)
+    plugin.save_policy()
 
     return True
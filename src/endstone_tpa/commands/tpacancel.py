@@ -1,12 +1,7 @@
 from endstone import Player
+from ..request_store import RequestState
+from ..utils import get_target_player
 
-command = {
-    "tpacancel": {
-        "description": "Cancel a teleport request.",
-        "usages": ["/tpacancel"],
-        "permissions": ["tpa.command.tpacancel"],
-    }
-}
 
 def handler(plugin, sender, args):
     if not isinstance(sender, Player):
@@ -15,25 +10,30 @@ def handler(plugin, sender, args):
     
     player = sender
 
-    request_found = False
-    target_to_notify = None
-    for target_uuid, requests in plugin.tpa_requests.items():
-        if player.unique_id in requests:
-            requests.pop(player.unique_id)
-            request_found = True
-            target_to_notify = plugin.server.get_player(target_uuid)
-            if not requests:
-                # Clean up the entry if no more requests for this target
-                plugin.tpa_requests.pop(target_uuid)
-            break  # Assuming a player can only send one request at a time
+    if args:
+        target_name = args[0]
+        target = get_target_player(plugin, player, target_name)
+        request = None if target is None else plugin.tpa_requests.pop(target.unique_id, player.unique_id)
+        if request is None:
+            plugin._(player, "tpa.no_request_to_cancel", target_name)
+            return True
+        cancelled = [request]
+    else:
+        # Without a name, every outgoing request is cancelled.
+        cancelled = list(plugin.tpa_requests.outgoing(player.unique_id))
+        if not cancelled:
+            plugin._(player, "tpa.no_pending_request")
+            return True
+        for request in cancelled:
+            plugin.tpa_requests.remove(request)
 
-    if not request_found:
-        plugin._(player, "tpa.no_pending_request")
-        return True
-
-    target = target_to_notify
-
-    plugin._(player, "tpa.request_cancelled")
-    if target:
-        plugin._(target, "tpa.cancelled_by_requester", player.name)
+    plugin.metrics.incr("cancelled", len(cancelled))
+    plugin.api.emit_all(cancelled, RequestState.CANCELLED)
+    for request in cancelled:
+        target = plugin.players.get(request.target_uuid)
+        if target:
+            plugin._(player, "tpa.request_cancelled", target.name)
+            plugin._(target, "tpa.sender_cancelled", player.name)
+        else:
+            plugin._(player, "tpa.request_cancelled", "Someone")  # Fallback
     return True
@@ -1,14 +1,6 @@
-import time
 from endstone import Player
-from ..utils import get_target_player
+from ..utils import accept_all_requests, accept_request, get_target_player
 
-command = {
-    "tpaccept": {
-        "description": "Accept a teleport request.",
-        "usages": ["/tpaccept [player: player]"],
-        "permissions": ["tpa.command.tpaccept"],
-    }
-}
 
 def handler(plugin, sender, args):
     if not isinstance(sender, Player):
@@ -16,46 +8,30 @@ def handler(plugin, sender, args):
         return True
     
     player = sender
-    requests = plugin.tpa_requests.get(player.unique_id, {})
+    requests = plugin.tpa_requests.incoming(player.unique_id)
 
     if not requests:
         plugin._(player, "tpa.no_pending_request")
         return True
 
-    requester_uuid = None
+    if args and args[0].lower() == "all":
+        accept_all_requests(plugin, player)
+        return True
+
+    request = None
     if args:
         requester_name = args[0]
-        requester = get_target_player(player, requester_name)
-        if requester is None or requester.unique_id not in requests:
+        requester = get_target_player(plugin, player, requester_name) or plugin.shared.find(requester_name)
+        if requester is not None:
+            request = plugin.tpa_requests.get(player.unique_id, requester.unique_id)
+        if request is None:
             plugin._(player, "tpa.no_request_from_player", requester_name)
             return True
-        requester_uuid = requester.unique_id
     elif len(requests) == 1:
-        requester_uuid = list(requests.keys())[0]
+        request = next(iter(requests))
     else:
         plugin._(player, "tpa.multiple_requests")
         return True
 
-    timestamp, tpa_type = requests.pop(requester_uuid)
-    requester = plugin.server.get_player(requester_uuid)
-
-    timeout = plugin.plugin_config.get("request-timeout", 60)
-    if time.time() - timestamp > timeout:
-        plugin._(player, "tpa.request_expired")
-        if requester:
-            plugin._(requester, "tpa.requester_expired", player.name)
-        return True
-
-    if not requester:
-        plugin._(player, "tpa.requester_not_online")
-        return True
-
-    if tpa_type == "tpa":
-        requester.teleport(player.location)
-        plugin._(requester, "tpa.sender_accepted", player.name)
-        plugin._(player, "tpa.request_accepted", requester.name)
-    elif tpa_type == "tpthere":
-        player.teleport(requester.location)
-        plugin._(player, "tpthere.sender_accepted", requester.name)
-        plugin._(requester, "tpthere.request_accepted", player.name)
+    accept_request(plugin, player, request)
     return True
@@ -0,0 +1,28 @@
+from ..profiling import MODES
+
+DEFAULT_SECONDS = 30
+MAX_SECONDS = 600
+
+
+def handler(plugin, sender, args):
+    mode = args[0].lower() if args else "cpu"
+    profiler = plugin.profiler
+
+    if mode == "stop":
+        if profiler is None:
+            plugin._(sender, "tpa.profile.not_running")
+            return True
+        plugin._(sender, "tpa.profile.written", plugin.stop_profiling())
+        return True
+
+    if mode not in MODES:
+        return False
+    if profiler is not None:
+        plugin._(sender, "tpa.profile.running", profiler.mode)
+        return True
+
+    seconds = int(args[1]) if len(args) > 1 else DEFAULT_SECONDS
+    seconds = max(1, min(seconds, MAX_SECONDS))
+    plugin.start_profiling(mode, seconds)
+    plugin._(sender, "tpa.profile.started", mode, seconds)
+    return True
@@ -0,0 +1,7 @@
+def handler(plugin, sender, args):
+    reloaded = plugin.check_for_changes()
+    if reloaded:
+        plugin._(sender, "tpa.reload.done", ", ".join(reloaded))
+    else:
+        plugin._(sender, "tpa.reload.nothing")
+    return True
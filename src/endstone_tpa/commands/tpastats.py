@@ -0,0 +1,28 @@
+def _format_value(value) -> str:
+    return f"{value:.3f}" if isinstance(value, float) else str(value)
+
+
+def handler(plugin, sender, args):
+    metrics = plugin.metrics
+    plugin._(sender, "tpa.stats.header")
+    for name, value in plugin.metrics_gauges().items():
+        plugin._(sender, "tpa.stats.value", name, _format_value(value))
+
+    if not metrics.enabled:
+        plugin._(sender, "tpa.stats.disabled")
+        return True
+
+    for name, value in sorted(metrics.counters.items()):
+        plugin._(sender, "tpa.stats.value", name, value)
+    for message, histograms in (("tpa.stats.command", metrics.commands), ("tpa.stats.task", metrics.tasks)):
+        for name, histogram in sorted(histograms.items()):
+            plugin._(
+                sender,
+                message,
+                name,
+                histogram.count,
+                _format_value(histogram.mean),
+                _format_value(histogram.quantile(0.99)),
+                _format_value(histogram.max),
+            )
+    return True
@@ -0,0 +1,20 @@
+def handler(plugin, sender, args):
+    action = args[0].lower() if args else "start"
+    tracer = plugin.tracer
+
+    if action == "stop":
+        if tracer is None:
+            plugin._(sender, "tpa.trace.not_running")
+            return True
+        lines = tracer.lines
+        plugin._(sender, "tpa.trace.written", lines, plugin.stop_tracing())
+        return True
+
+    if action != "start":
+        return False
+    if tracer is not None:
+        plugin._(sender, "tpa.trace.running", tracer.path)
+        return True
+
+    plugin._(sender, "tpa.trace.started", plugin.start_tracing())
+    return True
@@ -1,13 +1,8 @@
 from endstone import Player
-from ..utils import get_target_player, handle_tpa_request
+from ..request_store import RequestType
+from ..selectors import Selector, split_targets
+from ..utils import get_target_player, get_target_players, handle_remote_request, handle_tpa_request, handle_tpa_requests
 
-command = {
-    "tpthere": {
-        "description": "Request a player to teleport to you.",
-        "usages": ["/tpthere <player: player>"],
-        "permissions": ["tpa.command.tpthere"],
-    }
-}
 
 def handler(plugin, sender, args):
     if not isinstance(sender, Player):
@@ -21,11 +16,28 @@ def handler(plugin, sender, args):
         return False
 
     target_name = args[0]
-    target = get_target_player(player, target_name)
+    names = split_targets(target_name)
+    selector = Selector.parse(names[0]) if len(names) == 1 else None
+    if len(names) > 1 or (selector is not None and not selector.single):
+        # Several players at once
+        targets, missing = get_target_players(plugin, player, target_name)
+        for name in missing:
+            plugin._(sender, "tpa.player_not_found", name)
+        if targets:
+            handle_tpa_requests(plugin, player, targets, RequestType.TPTHERE)
+        elif not missing:
+            plugin._(sender, "tpa.no_players_selected", target_name)
+        return True
+
+    target = get_target_player(plugin, player, target_name)
 
     if target is None:
+        remote = plugin.shared.find(target_name)
+        if remote is not None:
+            handle_remote_request(plugin, player, remote, RequestType.TPTHERE)
+            return True
         plugin._(sender, "tpa.player_not_found", target_name)
         return True
 
-    handle_tpa_request(plugin, player, target, "tpthere")
+    handle_tpa_request(plugin, player, target, RequestType.TPTHERE)
     return True
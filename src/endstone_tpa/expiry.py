@@ -0,0 +1,53 @@
+import heapq
+from typing import Any, Callable, List
+
+
+class ExpiryQueue:
+    """
+    Min-heap of pending requests ordered by deadline.
+
+    Items are kept in the heap directly, so they need a ``deadline``
+    attribute and must order by it. Requests removed early (accepted,
+    denied, cancelled or replaced) are not searched for in the heap.
+    Callers report them with ``discard`` and the stale entry is skipped when
+    it reaches the top, so each tick only pays for the entries that are
+    actually due.
+    """
+
+    # Rebuild the heap once stale entries outnumber live ones by this much.
+    COMPACT_MIN_STALE = 64
+
+    def __init__(self):
+        self._heap: List[Any] = []
+        self._stale = 0
+
+    def __len__(self) -> int:
+        return len(self._heap) - self._stale
+
+    def push(self, item: Any) -> None:
+        heapq.heappush(self._heap, item)
+
+    def discard(self) -> None:
+        """Record that one scheduled item was removed before its deadline."""
+        self._stale += 1
+
+    def pop_expired(self, now: float, is_live: Callable[[Any], bool]) -> List[Any]:
+        """Pop every item whose deadline has passed and return the ones that were still live."""
+        heap = self._heap
+        expired = []
+        while heap and heap[0].deadline < now:
+            item = heapq.heappop(heap)
+            if is_live(item):
+                expired.append(item)
+            elif self._stale:
+                self._stale -= 1
+
+        if self._stale > self.COMPACT_MIN_STALE and self._stale * 2 > len(heap):
+            self.compact(is_live)
+        return expired
+
+    def compact(self, is_live: Callable[[Any], bool]) -> None:
+        """Drop stale items so the heap stays proportional to the pending requests."""
+        self._heap = [item for item in self._heap if is_live(item)]
+        heapq.heapify(self._heap)
+        self._stale = 0
@@ -0,0 +1,82 @@
+from functools import partial
+from typing import Dict, Tuple
+from uuid import UUID
+
+from endstone import Player
+from endstone.form import MessageForm
+
+from .i18n import Template, format_template
+from .request_store import RequestType
+from .utils import accept_request, deny_request
+
+
+class RequestPrompt:
+    """The translated parts of an incoming request prompt for one locale and request type."""
+
+    __slots__ = ("title", "content", "accept", "deny", "received", "helper")
+
+    def __init__(self, catalog, locale: str, request_type: RequestType):
+        self.title = format_template(catalog.lookup(locale, "tpa.form.title"))
+        self.content: Template = catalog.lookup(locale, f"tpa.form.content.{request_type.value}")
+        self.accept = format_template(catalog.lookup(locale, "tpa.form.accept"))
+        self.deny = format_template(catalog.lookup(locale, "tpa.form.deny"))
+        self.received: Template = catalog.lookup(locale, f"{request_type.value}.request_received")
+        self.helper: Template = catalog.lookup(locale, "tpa.request_helper")
+
+
+class RequestForms:
+    """
+    Sends the chat notice and accept/deny form for an incoming request.
+
+    Prompts are built once per (locale, request type) and only the requester
+    name and timeout are filled in per request. Every form shares the same
+    submit handler, which resolves the request from the store directly.
+    """
+
+    def __init__(self, plugin):
+        self.plugin = plugin
+        self._catalog = plugin.catalog
+        self._version = plugin.catalog.version
+        self._prompts: Dict[Tuple[str, RequestType], RequestPrompt] = {}
+
+    def prompt(self, locale: str, request_type: RequestType) -> RequestPrompt:
+        catalog = self.plugin.catalog
+        if catalog is not self._catalog or catalog.version != self._version:
+            # Translations were reloaded.
+            self._catalog = catalog
+            self._version = catalog.version
+            self._prompts.clear()
+        prompt = self._prompts.get((locale, request_type))
+        if prompt is None:
+            prompt = self._prompts[(locale, request_type)] = RequestPrompt(catalog, locale, request_type)
+        return prompt
+
+    def send(self, target: Player, requester: Player, request_type: RequestType, timeout: float) -> None:
+        prompt = self.prompt(target.locale, request_type)
+        name = requester.name
+        target.send_message(format_template(prompt.received, name))
+        target.send_message(format_template(prompt.helper, name, timeout))
+
+        form = MessageForm(
+            title=prompt.title,
+            content=format_template(prompt.content, name),
+            button1=prompt.accept,
+            button2=prompt.deny,
+        )
+        form.on_submit = partial(self._on_submit, requester.unique_id, name)
+        target.send_form(form)
+
+    def _on_submit(self, requester_uuid: UUID, requester_name: str, player: Player, data: int) -> None:
+        plugin = self.plugin
+        if plugin.tracer is not None:
+            plugin.tracer.form(player, requester_uuid, requester_name, data)
+        request = plugin.tpa_requests.get(player.unique_id, requester_uuid)
+        if request is None:
+            # Already answered, cancelled or expired since the form was sent.
+            plugin._(player, "tpa.no_request_from_player", requester_name)
+            return
+
+        if data == 0:  # Accept
+            accept_request(plugin, player, request)
+        else:  # Deny
+            deny_request(plugin, player, request, requester_name)
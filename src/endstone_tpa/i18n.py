@@ -0,0 +1,158 @@
+import json
+import os
+from typing import Callable, Dict, Optional, Tuple
+
+FALLBACK_LOCALE = "en_US"
+# How many unknown message keys to keep templates for
+MAX_UNKNOWN = 256
+
+# (text, text.format or None when the text has no braces). Texts with
+# braces are still parsed by str.format on every call; checking once only
+# lets the others skip formatting.
+Template = Tuple[str, Optional[Callable[..., str]]]
+
+
+def compile_template(text: str) -> Template:
+    # Escaped braces need formatting too, so look for any brace, not just fields.
+    return text, text.format if "{" in text or "}" in text else None
+
+
+def format_template(template: Template, *args) -> str:
+    text, formatter = template
+    return formatter(*args) if args and formatter is not None else text
+
+
+class TranslationCatalog:
+    """
+    Flat per-locale tables of message templates.
+
+    Every table already contains the ``en_US`` fallback, so a lookup is a
+    single dictionary access. Locales other than the fallback are read from
+    disk the first time a player with that locale needs a message.
+
+    The parsed entries of each file are kept apart from the merged tables,
+    so reloading one file re-parses only that file. ``version`` goes up on
+    every reload, for callers that cache rendered text.
+    """
+
+    def __init__(self, lang_dir: str):
+        self.lang_dir = lang_dir
+        self.version = 0
+        self._files = self._list_files()
+        # locale -> templates read from that locale's file
+        self._parsed: Dict[str, Dict[str, Template]] = {}
+        self._fallback = self._build(FALLBACK_LOCALE)
+        self._tables: Dict[str, Dict[str, Template]] = {FALLBACK_LOCALE: self._fallback}
+        # Templates of keys no language file has, shared by all locales
+        self._unknown: Dict[str, Template] = {}
+
+    @property
+    def locales(self) -> list[str]:
+        return list(self._files)
+
+    def path(self, locale: str) -> Optional[str]:
+        return self._files.get(locale)
+
+    def rescan(self) -> Dict[str, Exception]:
+        """
+        Pick up locale files added to or removed from the language directory.
+        Added files are read right away, and those that cannot be read are
+        left out. Returns the errors of the skipped files by path.
+        """
+        files = self._list_files()
+        errors = {}
+        added = []
+        for locale in files.keys() - self._files.keys():
+            try:
+                self._parsed[locale] = self._read(files[locale])
+            except (OSError, ValueError) as e:
+                errors[files.pop(locale)] = e
+            else:
+                added.append(locale)
+        removed = self._files.keys() - files.keys()
+        self._files = files
+        for locale in removed:
+            self._parsed.pop(locale, None)
+        if added or removed:
+            self.version += 1
+            for locale in [*added, *removed]:
+                self._rebuild(locale)
+        return errors
+
+    def reload(self, locale: str) -> None:
+        """
+        Re-read the file of ``locale`` and rebuild the tables that include it.
+        If the file cannot be read, the error is raised and the old entries
+        stay in use.
+        """
+        path = self._files.get(locale)
+        if path is None:
+            self._parsed.pop(locale, None)
+        else:
+            self._parsed[locale] = self._read(path)
+        self.version += 1
+        self._rebuild(locale)
+
+    def _rebuild(self, locale: str) -> None:
+        if locale != FALLBACK_LOCALE:
+            if locale in self._tables:
+                self._tables[locale] = self._build(locale)
+            return
+
+        # Every table contains the fallback. The other locales are merged
+        # onto it again from their already parsed entries.
+        self._fallback = self._build(FALLBACK_LOCALE)
+        for other in self._tables:
+            self._tables[other] = self._fallback if other == FALLBACK_LOCALE else self._build(other)
+
+    def table(self, locale: str) -> Dict[str, Template]:
+        table = self._tables.get(locale)
+        if table is None:
+            table = self._tables[locale] = self._build(locale)
+        return table
+
+    def lookup(self, locale: str, message: str) -> Template:
+        table = self.table(locale)
+        template = table.get(message)
+        if template is None:
+            # Unknown keys are shown as-is, like untranslated messages always
+            # were. They are kept out of the tables, which may be shared, and
+            # only the first few are cached since callers can pass any text.
+            template = self._unknown.get(message)
+            if template is None:
+                template = compile_template(message)
+                if len(self._unknown) < MAX_UNKNOWN:
+                    self._unknown[message] = template
+        return template
+
+    def render(self, locale: str, message: str, args: tuple) -> str:
+        return format_template(self.lookup(locale, message), *args)
+
+    def _build(self, locale: str) -> Dict[str, Template]:
+        if locale == FALLBACK_LOCALE:
+            return dict(self._parse(locale))
+        if locale not in self._files:
+            return self._fallback
+        table = dict(self._fallback)
+        table.update(self._parse(locale))
+        return table
+
+    def _parse(self, locale: str) -> Dict[str, Template]:
+        parsed = self._parsed.get(locale)
+        if parsed is None:
+            path = self._files.get(locale)
+            parsed = self._parsed[locale] = {} if path is None else self._read(path)
+        return parsed
+
+    def _list_files(self) -> Dict[str, str]:
+        files = {}
+        if os.path.isdir(self.lang_dir):
+            for file_name in os.listdir(self.lang_dir):
+                if file_name.endswith(".json"):
+                    files[file_name[:-5]] = os.path.join(self.lang_dir, file_name)
+        return files
+
+    @staticmethod
+    def _read(path: str) -> Dict[str, Template]:
+        with open(path, "r", encoding="utf-8") as f:
+            return {key: compile_template(value) for key, value in json.load(f).items()}
@@ -0,0 +1,123 @@
+import bisect
+import json
+import os
+from typing import Dict, List
+
+# Upper bounds of the latency buckets, in milliseconds. One tick is 50 ms.
+BUCKETS_MS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        # One slot per bucket plus one for everything above the last bound
+        self.counts: List[int] = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile, capped at the recorded max."""
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+        return 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": self.mean,
+            "p50_ms": self.quantile(0.5),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": self.max,
+            "buckets": dict(zip([str(b) for b in BUCKETS_MS] + ["+Inf"], self.counts)),
+        }
+
+
+class Metrics:
+    """
+    Counters and latency histograms for commands and scheduled tasks.
+
+    When disabled, ``incr`` returns immediately and callers skip timing
+    altogether by checking ``enabled`` first.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.counters: Dict[str, int] = {}
+        self.commands: Dict[str, Histogram] = {}
+        self.tasks: Dict[str, Histogram] = {}
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe_command(self, name: str, value_ms: float) -> None:
+        histogram = self.commands.get(name)
+        if histogram is None:
+            histogram = self.commands[name] = Histogram()
+        histogram.observe(value_ms)
+
+    def observe_task(self, name: str, value_ms: float) -> None:
+        histogram = self.tasks.get(name)
+        if histogram is None:
+            histogram = self.tasks[name] = Histogram()
+        histogram.observe(value_ms)
+
+    def snapshot(self, gauges: Dict[str, float]) -> dict:
+        return {
+            "enabled": self.enabled,
+            "gauges": gauges,
+            "counters": dict(self.counters),
+            "commands": {name: h.to_dict() for name, h in self.commands.items()},
+            "tasks": {name: h.to_dict() for name, h in self.tasks.items()},
+        }
+
+    def to_prometheus(self, gauges: Dict[str, float]) -> str:
+        lines = []
+        for metric, label, histograms in (
+            ("tpa_command_latency_ms", "command", self.commands),
+            ("tpa_task_latency_ms", "task", self.tasks),
+        ):
+            lines.append(f"# TYPE {metric} histogram")
+            for name, histogram in histograms.items():
+                cumulative = 0
+                for bound, bucket_count in zip([str(b) for b in BUCKETS_MS] + ["+Inf"], histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{metric}_bucket{{{label}="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{{label}="{name}"}} {histogram.total}')
+                lines.append(f'{metric}_count{{{label}="{name}"}} {histogram.count}')
+
+        lines.append("# TYPE tpa_events_total counter")
+        for name, value in self.counters.items():
+            lines.append(f'tpa_events_total{{event="{name}"}} {value}')
+        for name, value in gauges.items():
+            metric = "tpa_" + name.replace(".", "_")
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str, gauges: Dict[str, float], fmt: str = "json") -> None:
+        """Write the current metrics to ``path`` as JSON or Prometheus text."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            if fmt == "prometheus":
+                f.write(self.to_prometheus(gauges))
+            else:
+                json.dump(self.snapshot(gauges), f, indent=4)
+        os.replace(tmp_path, path)
@@ -0,0 +1,115 @@
+import json
+import os
+import time
+from typing import Callable
+
+from .watcher import Stamp, file_stamp
+
+
+class ConfigWriter:
+    """
+    Write-behind saver for config.json.
+
+    Changes only mark the writer dirty. ``tick`` is run from the scheduler and
+    turns any number of changes since the last tick into a single write, which
+    happens on a background thread. Files are written to a temporary path and
+    moved into place with ``os.replace`` so a crash never leaves a truncated
+    config behind.
+    """
+
+    def __init__(self, path: str, snapshot: Callable[[], dict], logger):
+        self.path = path
+        self._snapshot = snapshot
+        self._logger = logger
+        self._executor = None
+        self._pending = None
+        self.dirty = False
+        # Stamp of the file as last written here, to tell it from outside
+        # edits. Only set on the server thread, when a write is collected.
+        self.written_stamp: Stamp = None
+
+        self.flush_count = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def mark_dirty(self) -> None:
+        self.dirty = True
+
+    def settle(self) -> bool:
+        """Collect a finished background write. Returns False while one is still running."""
+        if self._pending is not None:
+            if not self._pending.done():
+                return False
+            self._collect()
+        return True
+
+    def tick(self) -> None:
+        """Start a background write if anything changed and no write is in progress."""
+        if not self.settle():
+            return
+        if not self.dirty:
+            return
+
+        # The snapshot is taken here, on the server thread, so the worker never
+        # sees the state while a command is changing it.
+        data = self._snapshot()
+        self.dirty = False
+        if self._executor is None:
+            # Imported here so loading the plugin does not pay for it.
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tpa-config")
+        self._pending = self._executor.submit(self._write, data)
+
+    def flush(self) -> None:
+        """Wait for a running write and save any remaining changes synchronously."""
+        if self._pending is not None:
+            self._pending.exception()  # Blocks until the running write finishes
+            self._collect()
+        if self.dirty:
+            self.dirty = False
+            self.written_stamp = self._write(self._snapshot())
+
+    def close(self) -> None:
+        self.flush()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "flush_count": self.flush_count,
+            "last_flush_ms": self.last_flush_ms,
+            "max_flush_ms": self.max_flush_ms,
+            "avg_flush_ms": self.total_flush_ms / self.flush_count if self.flush_count else 0.0,
+            "dirty": self.dirty,
+        }
+
+    def _collect(self) -> None:
+        pending = self._pending
+        self._pending = None
+        error = pending.exception()
+        if error is not None:
+            self._logger.error(f"Failed to save {self.path}: {error}")
+            # Keep the changes so the next tick retries the write.
+            self.dirty = True
+        else:
+            self.written_stamp = pending.result()
+
+    def _write(self, data: dict) -> Stamp:
+        start = time.perf_counter()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        stamp = file_stamp(self.path)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.flush_count += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.total_flush_ms += elapsed_ms
+        return stamp
@@ -0,0 +1,91 @@
+import bisect
+import random
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from endstone import Player
+
+
+class PlayerIndex:
+    """
+    Online players indexed by lowercase name and by UUID.
+
+    Kept up to date from join and quit events. Names are also kept sorted for
+    prefix lookups, and players sit in a flat list so a random pick is a
+    single index operation.
+    """
+
+    def __init__(self):
+        self._by_name: Dict[str, Player] = {}
+        self._by_uuid: Dict[UUID, Player] = {}
+        # Sorted lowercase names
+        self._names: List[str] = []
+        # Players in no particular order, and each player's position in it
+        self._players: List[Player] = []
+        self._slots: Dict[UUID, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def __iter__(self):
+        return iter(self._players)
+
+    def add(self, player: Player) -> None:
+        if player.unique_id in self._by_uuid:
+            self.remove(player)
+        name = player.name.lower()
+        self._by_name[name] = player
+        self._by_uuid[player.unique_id] = player
+        bisect.insort(self._names, name)
+        self._slots[player.unique_id] = len(self._players)
+        self._players.append(player)
+
+    def remove(self, player: Player) -> None:
+        player = self._by_uuid.pop(player.unique_id, None)
+        if player is None:
+            return
+        name = player.name.lower()
+        self._by_name.pop(name, None)
+        i = bisect.bisect_left(self._names, name)
+        if i < len(self._names) and self._names[i] == name:
+            del self._names[i]
+
+        # Move the last player into the freed slot so removal stays O(1).
+        slot = self._slots.pop(player.unique_id)
+        last = self._players.pop()
+        if slot < len(self._players):
+            self._players[slot] = last
+            self._slots[last.unique_id] = slot
+
+    def get(self, unique_id: UUID) -> Optional[Player]:
+        return self._by_uuid.get(unique_id)
+
+    def find(self, name: str) -> Optional[Player]:
+        """Find a player by exact name or, failing that, by an unambiguous name prefix. Case-insensitive."""
+        name = name.lower()
+        player = self._by_name.get(name)
+        if player is not None or not name:
+            return player
+
+        names = self._names
+        i = bisect.bisect_left(names, name)
+        if i == len(names) or not names[i].startswith(name):
+            return None
+        if i + 1 < len(names) and names[i + 1].startswith(name):
+            # More than one player matches the prefix.
+            return None
+        return self._by_name[names[i]]
+
+    def random(self, exclude: Optional[UUID] = None) -> Optional[Player]:
+        """Pick a random online player other than ``exclude``."""
+        count = len(self._players)
+        slot = self._slots.get(exclude) if exclude is not None else None
+        if slot is None:
+            return self._players[random.randrange(count)] if count else None
+        if count < 2:
+            return None
+        # Draw from the other count - 1 slots by skipping over the excluded one.
+        i = random.randrange(count - 1)
+        if i >= slot:
+            i += 1
+        return self._players[i]
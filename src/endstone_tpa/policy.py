@@ -0,0 +1,172 @@
+from enum import Enum
+from typing import Dict, Optional, Set
+from uuid import UUID
+
+
+class PolicyDecision(Enum):
+    ALLOW = "allow"
+    BLOCKED = "blocked"
+    ALL_BLOCKED = "all_blocked"
+    AUTO_ACCEPT = "auto_accept"
+
+
+class PlayerPolicy:
+    """One player's TPA settings. UUIDs are kept as their 128-bit integers."""
+
+    __slots__ = ("blocked", "all_block", "auto_accept")
+
+    def __init__(self, blocked: Optional[Set[int]] = None, all_block: bool = False, auto_accept: bool = False):
+        self.blocked: Set[int] = blocked if blocked is not None else set()
+        self.all_block = all_block
+        self.auto_accept = auto_accept
+
+    def is_default(self) -> bool:
+        return not self.blocked and not self.all_block and not self.auto_accept
+
+
+class PolicyStore:
+    """
+    Block, all-block and auto-accept settings for every player.
+
+    All settings of a player sit in a single ``PlayerPolicy`` so a request
+    is decided with one dictionary lookup on the target and, at most, one
+    set lookup for the requester.
+    """
+
+    def __init__(self):
+        # player_uuid.int -> PlayerPolicy
+        self._players: Dict[int, PlayerPolicy] = {}
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    @classmethod
+    def from_config(cls, config: dict) -> "PolicyStore":
+        store = cls()
+        for owner, blocked in config.get("blocks", {}).items():
+            if blocked:
+                store._get_or_create(UUID(owner).int).blocked.update(UUID(v).int for v in blocked)
+        for player in config.get("all_blocks", []):
+            store._get_or_create(UUID(player).int).all_block = True
+        for player in config.get("auto_accept", []):
+            store._get_or_create(UUID(player).int).auto_accept = True
+        return store
+
+    def to_config(self) -> dict:
+        """Serialize to the ``blocks``/``all_blocks``/``auto_accept`` sections of config.json."""
+        blocks = {}
+        all_blocks = []
+        auto_accept = []
+        for player, policy in self._players.items():
+            player_str = str(UUID(int=player))
+            if policy.blocked:
+                blocks[player_str] = [str(UUID(int=v)) for v in policy.blocked]
+            if policy.all_block:
+                all_blocks.append(player_str)
+            if policy.auto_accept:
+                auto_accept.append(player_str)
+        return {"blocks": blocks, "all_blocks": all_blocks, "auto_accept": auto_accept}
+
+    def apply_config_diff(self, old: dict, new: dict) -> int:
+        """
+        Apply what changed between two versions of the policy sections of
+        config.json. Everything else in memory, including changes not saved
+        yet, is kept. Returns the number of settings changed.
+        """
+        changes = 0
+        old_blocks = old.get("blocks", {})
+        new_blocks = new.get("blocks", {})
+        for owner in old_blocks.keys() | new_blocks.keys():
+            if old_blocks.get(owner) == new_blocks.get(owner):
+                # Unchanged lists are the common case; skip parsing them.
+                continue
+            before = {UUID(v).int for v in old_blocks.get(owner, ())}
+            after = {UUID(v).int for v in new_blocks.get(owner, ())}
+            if before == after:
+                continue
+            owner_id = UUID(owner).int
+            policy = self._get_or_create(owner_id)
+            policy.blocked.difference_update(before - after)
+            policy.blocked.update(after - before)
+            self._prune(owner_id, policy)
+            changes += len(before ^ after)
+
+        for key, attribute in (("all_blocks", "all_block"), ("auto_accept", "auto_accept")):
+            after = set(new.get(key, []))
+            for player in set(old.get(key, [])) ^ after:
+                player_id = UUID(player).int
+                policy = self._get_or_create(player_id)
+                setattr(policy, attribute, player in after)
+                self._prune(player_id, policy)
+                changes += 1
+        return changes
+
+    def load_player(self, player: UUID) -> None:
+        """Called when ``player`` joins. Stores that keep everything in memory ignore it."""
+
+    def unload_player(self, player: UUID) -> None:
+        """Called when ``player`` quits. Stores that keep everything in memory ignore it."""
+
+    def save(self) -> None:
+        """Called every ``save-interval`` ticks. Stores that save as they go, or through config.json, ignore it."""
+
+    def close(self) -> None:
+        pass
+
+    def check(self, requester: UUID, target: UUID) -> PolicyDecision:
+        """Decide what happens to a request from ``requester`` to ``target``."""
+        policy = self._lookup(target.int)
+        if policy is None:
+            return PolicyDecision.ALLOW
+        if policy.blocked and requester.int in policy.blocked:
+            return PolicyDecision.BLOCKED
+        if policy.all_block:
+            return PolicyDecision.ALL_BLOCKED
+        if policy.auto_accept:
+            return PolicyDecision.AUTO_ACCEPT
+        return PolicyDecision.ALLOW
+
+    def get(self, player: UUID) -> Optional[PlayerPolicy]:
+        """The settings of ``player``, or None if they have none. Do not change the result."""
+        return self._lookup(player.int)
+
+    def is_blocked(self, owner: UUID, player: UUID) -> bool:
+        policy = self._lookup(owner.int)
+        return policy is not None and player.int in policy.blocked
+
+    def toggle_block(self, owner: UUID, player: UUID) -> bool:
+        """Block or unblock ``player`` for ``owner``. Returns True if ``player`` is now blocked."""
+        policy = self._get_or_create(owner.int)
+        if player.int in policy.blocked:
+            policy.blocked.discard(player.int)
+            self._prune(owner.int, policy)
+            return False
+        policy.blocked.add(player.int)
+        return True
+
+    def toggle_all_block(self, player: UUID) -> bool:
+        """Returns True if ``player`` now blocks all requests."""
+        policy = self._get_or_create(player.int)
+        policy.all_block = not policy.all_block
+        self._prune(player.int, policy)
+        return policy.all_block
+
+    def toggle_auto_accept(self, player: UUID) -> bool:
+        """Returns True if ``player`` now auto-accepts all requests."""
+        policy = self._get_or_create(player.int)
+        policy.auto_accept = not policy.auto_accept
+        self._prune(player.int, policy)
+        return policy.auto_accept
+
+    def _lookup(self, player: int) -> Optional[PlayerPolicy]:
+        return self._players.get(player)
+
+    def _get_or_create(self, player: int) -> PlayerPolicy:
+        policy = self._lookup(player)
+        if policy is None:
+            policy = self._players[player] = PlayerPolicy()
+        return policy
+
+    def _prune(self, player: int, policy: PlayerPolicy) -> None:
+        if policy.is_default():
+            self._players.pop(player, None)
@@ -0,0 +1,241 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+MODES = ("cpu", "sample", "memory")
+# Seconds between stack samples in ``sample`` mode
+SAMPLE_INTERVAL = 0.001
+# GIL switch interval while sampling. The sampler can only look at the
+# server thread once that thread gives up the GIL, which it otherwise does
+# every 5 ms, after most handlers have already returned.
+SAMPLE_SWITCH_INTERVAL = 0.00005
+MAX_STACK_DEPTH = 64
+
+
+class HandlerStats:
+    """Calls and time of one command handler or task while profiling."""
+
+    __slots__ = ("calls", "total_ms", "max_ms", "allocated", "peak")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        # Net bytes still allocated after the calls, and the largest peak during one (memory mode)
+        self.allocated = 0
+        self.peak = 0
+
+
+class Profiler:
+    """
+    Profiles command handlers and scheduled tasks for a limited time.
+
+    ``cpu`` runs a ``cProfile`` profiler per handler, so every handler gets
+    its own call graph. ``sample`` records the server thread's stack every
+    millisecond from a background thread while a handler runs; its overhead
+    does not grow with the number of calls inside a handler, and comparing
+    the samples taken inside handlers with all samples gives the plugin's
+    share of the server thread. ``memory`` traces allocations with
+    ``tracemalloc`` and reports what each handler left allocated.
+
+    The plugin imports this module and creates a profiler when a run
+    begins, and drops the profiler when the run ends.
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.active = False
+        self.mode: Optional[str] = None
+        self.deadline = 0.0
+        self._started = 0.0
+        self._stats: Dict[str, HandlerStats] = {}
+        self._profiles: Dict[str, object] = {}
+        # Sampling
+        self._current: Optional[str] = None
+        self._thread_id = 0
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._samples: Counter = Counter()
+        self._total_samples = 0
+        self._switch_interval = 0.0
+        # Memory: whether this profiler started tracemalloc, or found it running
+        self._started_tracing = False
+
+    def start(self, mode: str, seconds: float) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode {mode!r}")
+        self.mode = mode
+        self._stats = {}
+        self._profiles = {}
+        self._samples = Counter()
+        self._total_samples = 0
+        self._started = time.monotonic()
+        self.deadline = self._started + seconds
+        if mode == "memory":
+            import tracemalloc
+
+            # Tracing started by someone else is used as it is and left running.
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start(10)
+        elif mode == "sample":
+            # Handlers run on the thread that starts the profiler.
+            self._thread_id = threading.get_ident()
+            self._stop.clear()
+            self._switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(SAMPLE_SWITCH_INTERVAL)
+            self._sampler = threading.Thread(target=self._sample_loop, name="tpa-profiler", daemon=True)
+            self._sampler.start()
+        self.active = True
+
+    def stop(self) -> str:
+        """Stop profiling and write the results. Returns the directory they were written to."""
+        self.active = False
+        try:
+            return self._write_results()
+        finally:
+            # Even if writing failed, leave no sampler, switch interval or tracing behind.
+            if self.mode == "sample":
+                self._stop_sampler()
+            elif self.mode == "memory" and self._started_tracing:
+                import tracemalloc
+
+                tracemalloc.stop()
+                self._started_tracing = False
+            self.mode = None
+
+    def _stop_sampler(self) -> None:
+        if self._sampler is None:
+            return
+        self._stop.set()
+        self._sampler.join()
+        self._sampler = None
+        sys.setswitchinterval(self._switch_interval)
+
+    def _write_results(self) -> str:
+        if self.mode == "sample":
+            self._stop_sampler()
+        path = _new_dir(os.path.join(self.output_dir, time.strftime(f"profile-%Y%m%d-%H%M%S-{self.mode}")))
+        summary = self._summary_lines()
+
+        if self.mode == "cpu":
+            import io
+            import pstats
+
+            for label, profile in self._profiles.items():
+                file_name = _file_name(label)
+                profile.dump_stats(os.path.join(path, file_name + ".prof"))
+                stream = io.StringIO()
+                pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(15)
+                summary += ["", f"== {label} ==", stream.getvalue().strip()]
+        elif self.mode == "sample":
+            with open(os.path.join(path, "samples.folded"), "w") as f:
+                for (label, stack), count in self._samples.most_common():
+                    f.write(";".join((label,) + stack) + f" {count}\n")
+            inside = sum(self._samples.values())
+            share = inside / self._total_samples if self._total_samples else 0.0
+            summary += ["", f"Samples inside handlers: {inside} of {self._total_samples} ({share:.2%} of the time)"]
+        elif self.mode == "memory":
+            import tracemalloc
+
+            snapshot = tracemalloc.take_snapshot()
+            snapshot.dump(os.path.join(path, "allocations.snapshot"))
+            summary += ["", "Top allocations still held:"]
+            summary += [str(stat) for stat in snapshot.statistics("lineno")[:25]]
+
+        with open(os.path.join(path, "summary.txt"), "w") as f:
+            f.write("\n".join(summary) + "\n")
+        return path
+
+    def run(self, label: str, func: Callable, *args):
+        """Call ``func`` as the handler ``label`` and record it."""
+        stats = self._stats.get(label)
+        if stats is None:
+            stats = self._stats[label] = HandlerStats()
+        mode = self.mode
+        start = time.perf_counter()
+        try:
+            if mode == "cpu":
+                profile = self._profiles.get(label)
+                if profile is None:
+                    import cProfile
+
+                    profile = self._profiles[label] = cProfile.Profile()
+                return profile.runcall(func, *args)
+            if mode == "memory":
+                import tracemalloc
+
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                try:
+                    return func(*args)
+                finally:
+                    current, peak = tracemalloc.get_traced_memory()
+                    stats.allocated += current - before
+                    stats.peak = max(stats.peak, peak - before)
+            previous = self._current
+            self._current = label
+            try:
+                return func(*args)
+            finally:
+                self._current = previous
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stats.calls += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+
+    def _summary_lines(self) -> List[str]:
+        elapsed = time.monotonic() - self._started
+        lines = [f"Mode: {self.mode}, {elapsed:.1f} s", "", "handler: calls, total ms, mean ms, max ms"]
+        if self.mode == "memory":
+            lines[-1] += ", net allocated bytes, max peak bytes"
+        for label, stats in sorted(self._stats.items(), key=lambda item: -item[1].total_ms):
+            if not stats.calls:
+                continue  # Still running, like the handler that stopped the profiler
+            line = (
+                f"{label}: {stats.calls}, {stats.total_ms:.3f}, {stats.total_ms / stats.calls:.3f}, {stats.max_ms:.3f}"
+            )
+            if self.mode == "memory":
+                line += f", {stats.allocated}, {stats.peak}"
+            lines.append(line)
+        return lines
+
+    def _sample_loop(self) -> None:
+        frames = sys._current_frames
+        run_code = Profiler.run.__code__
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            self._total_samples += 1
+            label = self._current
+            if label is None:
+                continue
+            frame = frames().get(self._thread_id)
+            stack: List[str] = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                if code is run_code:
+                    break  # Leave out the server and plugin frames the handler was called from
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.reverse()
+            self._samples[(label, tuple(stack))] += 1
+
+
+def _new_dir(path: str) -> str:
+    """Create the directory ``path``, or ``path-2``, ``path-3``... if it exists. Returns the one created."""
+    created = path
+    n = 1
+    while True:
+        try:
+            os.makedirs(created)
+            return created
+        except FileExistsError:
+            n += 1
+            created = f"{path}-{n}"
+
+
+def _file_name(label: str) -> str:
+    return label.strip("/").replace(" ", "-") or "handler"
@@ -0,0 +1,55 @@
+import time
+from typing import Callable, Dict, List
+from uuid import UUID
+
+
+class RateLimiter:
+    """
+    Token bucket per player.
+
+    Each player may spend up to ``burst`` tokens at once; tokens come back at
+    ``per_minute`` per minute. A ``per_minute`` of 0 disables the limiter.
+    """
+
+    def __init__(self, burst: int, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.configure(burst, per_minute)
+        self.clock = clock
+        # player_uuid -> [tokens, last refill time]
+        self._buckets: Dict[UUID, List[float]] = {}
+
+    def configure(self, burst: int, per_minute: float) -> None:
+        """Change the limits. Existing buckets keep their tokens."""
+        self.burst = max(burst, 1)
+        self.rate = per_minute / 60.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def try_acquire(self, player: UUID) -> float:
+        """Take a token for ``player``. Returns 0 on success, otherwise the seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+
+        now = self.clock()
+        bucket = self._buckets.get(player)
+        if bucket is None:
+            self._buckets[player] = [self.burst - 1.0, now]
+            return 0.0
+
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1.0:
+            bucket[0] = tokens - 1.0
+            return 0.0
+        bucket[0] = tokens
+        return (1.0 - tokens) / self.rate
+
+    def forget(self, player: UUID) -> None:
+        """
+        Drop the bucket of a player who left. A bucket that has not refilled
+        yet is kept, so leaving and rejoining does not reset the limit.
+        """
+        bucket = self._buckets.get(player)
+        if bucket is not None and bucket[0] + (self.clock() - bucket[1]) * self.rate >= self.burst:
+            del self._buckets[player]
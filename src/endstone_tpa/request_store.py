@@ -0,0 +1,210 @@
+import time
+from enum import Enum
+from typing import Callable, Collection, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from .expiry import ExpiryQueue
+
+
+class RequestType(Enum):
+    TPA = "tpa"
+    TPTHERE = "tpthere"
+
+
+class RequestState(Enum):
+    PENDING = "pending"
+    ACCEPTED = "accepted"
+    DENIED = "denied"
+    EXPIRED = "expired"
+    # Withdrawn by the requester, replaced by a newer request between the
+    # same players, dropped to make room for newer ones, or a player left.
+    CANCELLED = "cancelled"
+    # Never became pending; ``RequestHandle.send_result`` says why.
+    REJECTED = "rejected"
+
+
+class Request:
+    """
+    One pending request. Players are stored as their UUID integers and the
+    deadline is on the store's monotonic clock. ``batch`` marks requests
+    sent to several players by one command.
+    """
+
+    __slots__ = ("target", "requester", "deadline", "type", "batch")
+
+    def __init__(self, target: int, requester: int, deadline: float, request_type: RequestType, batch: bool = False):
+        self.target = target
+        self.requester = requester
+        self.deadline = deadline
+        self.type = request_type
+        self.batch = batch
+
+    def __lt__(self, other: "Request") -> bool:
+        return self.deadline < other.deadline
+
+    @property
+    def target_uuid(self) -> UUID:
+        return UUID(int=self.target)
+
+    @property
+    def requester_uuid(self) -> UUID:
+        return UUID(int=self.requester)
+
+
+_EMPTY: Dict[int, Request] = {}
+
+
+class RequestStore:
+    """
+    Pending TPA requests indexed both by target and by requester.
+
+    A requester may have at most ``max_outgoing`` pending requests at once,
+    plus at most ``max_batch`` sent to several players by one command, so a
+    batch does not stop the requester from sending single requests. Sending
+    another request of the same kind to a target that already has one from
+    the same requester replaces it and does not count against the limit. A
+    target holds at most ``max_incoming`` requests; adding one more drops
+    the oldest.
+    """
+
+    def __init__(
+        self,
+        max_outgoing: int = 5,
+        max_incoming: int = 10,
+        max_batch: int = 100,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_outgoing = max_outgoing
+        self.max_incoming = max_incoming
+        self.max_batch = max_batch
+        self.clock = clock
+        # target_uuid.int -> {requester_uuid.int: Request}
+        self._incoming: Dict[int, Dict[int, Request]] = {}
+        # requester_uuid.int -> {target_uuid.int: Request}
+        self._outgoing: Dict[int, Dict[int, Request]] = {}
+        # requester_uuid.int -> how many of their outgoing requests are batch requests
+        self._batch_counts: Dict[int, int] = {}
+        self._expiry = ExpiryQueue()
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, target: UUID, requester: UUID) -> Optional[Request]:
+        return self._incoming.get(target.int, _EMPTY).get(requester.int)
+
+    def incoming(self, target: UUID) -> Collection[Request]:
+        """Requests sent to ``target``, oldest first. Do not keep the result across changes."""
+        return self._incoming.get(target.int, _EMPTY).values()
+
+    def outgoing(self, requester: UUID) -> Collection[Request]:
+        """Requests sent by ``requester``, oldest first. Do not keep the result across changes."""
+        return self._outgoing.get(requester.int, _EMPTY).values()
+
+    def can_add(self, target: UUID, requester: UUID, batch: bool = False) -> bool:
+        """
+        Whether ``requester`` is within its outgoing limit for single or
+        ``batch`` requests if it sends one to ``target``.
+        """
+        outgoing = self._outgoing.get(requester.int, _EMPTY)
+        existing = outgoing.get(target.int)
+        if existing is not None and existing.batch == batch:
+            return True
+        batch_count = self._batch_counts.get(requester.int, 0)
+        if batch:
+            return batch_count < self.max_batch
+        return len(outgoing) - batch_count < self.max_outgoing
+
+    def is_expired(self, request: Request) -> bool:
+        return request.deadline < self.clock()
+
+    def add(
+        self, target: UUID, requester: UUID, request_type: RequestType, timeout: float, batch: bool = False
+    ) -> Optional[Request]:
+        """
+        Store a request, replacing any earlier one between the same players.
+        Callers check ``can_add`` first. Returns the request that was dropped
+        to make room at ``target``, if any.
+        """
+        target_id = target.int
+        requester_id = requester.int
+        # An earlier request between the same players is replaced.
+        self._pop(target_id, requester_id)
+
+        evicted = None
+        requests = self._incoming.get(target_id)
+        if requests is not None and len(requests) >= self.max_incoming:
+            # Dicts keep insertion order, so the first requester is the oldest.
+            evicted = self._pop(target_id, next(iter(requests)))
+            requests = self._incoming.get(target_id)
+
+        request = Request(target_id, requester_id, self.clock() + timeout, request_type, batch)
+        if requests is None:
+            requests = self._incoming[target_id] = {}
+        requests[requester_id] = request
+        outgoing = self._outgoing.get(requester_id)
+        if outgoing is None:
+            outgoing = self._outgoing[requester_id] = {}
+        outgoing[target_id] = request
+        if batch:
+            self._batch_counts[requester_id] = self._batch_counts.get(requester_id, 0) + 1
+        self._expiry.push(request)
+        self._count += 1
+        return evicted
+
+    def pop(self, target: UUID, requester: UUID) -> Optional[Request]:
+        """Remove and return the request from ``requester`` to ``target``, if any."""
+        return self._pop(target.int, requester.int)
+
+    def remove(self, request: Request) -> bool:
+        """Remove ``request`` if it is still pending."""
+        return self._pop(request.target, request.requester) is not None
+
+    def remove_player(self, player: UUID) -> Tuple[List[Request], List[Request]]:
+        """Remove every request to and from ``player``. Returns the removed (incoming, outgoing) requests."""
+        player_id = player.int
+        incoming = list(self._incoming.get(player_id, _EMPTY).values())
+        outgoing = list(self._outgoing.get(player_id, _EMPTY).values())
+        for request in incoming:
+            self._pop(player_id, request.requester)
+        for request in outgoing:
+            self._pop(request.target, player_id)
+        return incoming, outgoing
+
+    def pop_expired(self) -> List[Request]:
+        """Remove and return every request whose deadline has passed."""
+        expired = self._expiry.pop_expired(self.clock(), self._is_live)
+        for request in expired:
+            self._remove(request.target, request.requester)
+        return expired
+
+    def _pop(self, target: int, requester: int) -> Optional[Request]:
+        request = self._remove(target, requester)
+        if request is not None:
+            # Its heap entry stays behind and is skipped when it comes due.
+            self._expiry.discard()
+        return request
+
+    def _remove(self, target: int, requester: int) -> Optional[Request]:
+        requests = self._incoming.get(target)
+        if requests is None:
+            return None
+        request = requests.pop(requester, None)
+        if request is None:
+            return None
+
+        if not requests:
+            del self._incoming[target]
+        targets = self._outgoing[requester]
+        del targets[target]
+        if not targets:
+            del self._outgoing[requester]
+        if request.batch:
+            batch_count = self._batch_counts.pop(requester) - 1
+            if batch_count:
+                self._batch_counts[requester] = batch_count
+        self._count -= 1
+        return request
+
+    def _is_live(self, request: Request) -> bool:
+        return self._incoming.get(request.target, _EMPTY).get(request.requester) is request
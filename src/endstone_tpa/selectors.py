@@ -0,0 +1,153 @@
+import math
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from endstone import Player
+
+from .spatial import dimension_key
+
+# Arguments understood inside [...]; anything else makes the selector invalid.
+ARGUMENTS = ("r", "rm", "c", "dim")
+
+
+class Selector:
+    """
+    A parsed target selector such as ``@a[r=50]``.
+
+    ``@p`` is the nearest player and ``@r`` a random one; ``@a`` is
+    everyone, or with ``c`` the ``c`` nearest. ``r`` and ``rm`` keep players
+    within and beyond a distance of the sender; like ``@p`` and ``c``, they
+    limit the selection to the sender's dimension. ``dim`` keeps the
+    players in one dimension (``overworld``, ``nether`` or ``the_end``). The
+    sender is never selected.
+    """
+
+    __slots__ = ("kind", "radius", "min_radius", "count", "dimension")
+
+    def __init__(
+        self,
+        kind: str,
+        radius: Optional[float] = None,
+        min_radius: Optional[float] = None,
+        count: Optional[int] = None,
+        dimension: Optional[str] = None,
+    ):
+        self.kind = kind
+        self.radius = radius
+        self.min_radius = min_radius
+        self.count = count
+        self.dimension = dimension
+
+    @property
+    def single(self) -> bool:
+        """Whether the selector picks at most one player."""
+        if self.count is not None:
+            return self.count == 1
+        return self.kind != "a"
+
+    @classmethod
+    def parse(cls, text: str) -> Optional["Selector"]:
+        """Parse ``@p``, ``@r`` or ``@a`` with optional arguments. Returns None if ``text`` is not one of them."""
+        text = text.strip().lower()
+        if len(text) < 2 or text[0] != "@" or text[1] not in "apr":
+            return None
+        kind, rest = text[1], text[2:]
+        if not rest:
+            return cls(kind)
+        if rest[0] != "[" or rest[-1] != "]":
+            return None
+
+        arguments: Dict[str, str] = {}
+        for argument in rest[1:-1].split(","):
+            name, sep, value = argument.partition("=")
+            name, value = name.strip(), value.strip()
+            if not sep or name not in ARGUMENTS or name in arguments or not value:
+                return None
+            arguments[name] = value
+        try:
+            radius = float(arguments["r"]) if "r" in arguments else None
+            min_radius = float(arguments["rm"]) if "rm" in arguments else None
+            count = int(arguments["c"]) if "c" in arguments else None
+        except ValueError:
+            return None
+        for distance in (radius, min_radius):
+            if distance is not None and not (math.isfinite(distance) and distance >= 0):
+                return None
+        if count is not None and count <= 0:
+            return None
+        dimension = dimension_key(arguments["dim"]) if "dim" in arguments else None
+        return cls(kind, radius, min_radius, count, dimension)
+
+    def select(self, plugin, sender: Player) -> List[Player]:
+        """The players selected for ``sender``, nearest first where distance matters."""
+        players = plugin.players
+        positions = plugin.positions
+        origin = positions.get(sender.unique_id)
+        dimension = self.dimension
+        if self.kind == "p" or self.radius is not None or self.min_radius is not None:
+            # Distances only mean something within the sender's dimension.
+            if origin is None or dimension not in (None, origin.dimension):
+                return []
+            dimension = origin.dimension
+
+        if self.kind == "r":
+            if dimension is None and self.count in (None, 1):
+                player = players.random(exclude=sender.unique_id)
+                return [player] if player is not None else []
+            candidates = self._candidates(plugin, sender, origin, dimension)
+            return random.sample(candidates, min(self.count or 1, len(candidates)))
+
+        count = self.count or (1 if self.kind == "p" else None)
+        if count is None:
+            return self._candidates(plugin, sender, origin, dimension)
+        if origin is None or dimension not in (None, origin.dimension):
+            # No distances to pick the nearest by
+            return self._candidates(plugin, sender, origin, dimension)[:count]
+        if self.min_radius is None:
+            found = positions.nearest(
+                origin.dimension, origin.x, origin.y, origin.z, count, self.radius, exclude=sender.unique_id
+            )
+        else:
+            found = sorted(self._within(positions, sender, origin))[:count]
+        return _players(plugin, (unique_id for _, unique_id in found))
+
+    def _within(self, positions, sender: Player, origin) -> List[Tuple[float, UUID]]:
+        radius = self.radius if self.radius is not None else float("inf")
+        found = positions.within(origin.dimension, origin.x, origin.y, origin.z, radius, self.min_radius or 0.0)
+        return [item for item in found if item[1] != sender.unique_id]
+
+    def _candidates(self, plugin, sender: Player, origin, dimension: Optional[str]) -> List[Player]:
+        """Every other player matching the distance and dimension arguments, in no particular order."""
+        if self.radius is not None or self.min_radius is not None:
+            return _players(plugin, (unique_id for _, unique_id in self._within(plugin.positions, sender, origin)))
+        if dimension is not None:
+            unique_ids = plugin.positions.in_dimension(dimension)
+            return _players(plugin, (unique_id for unique_id in unique_ids if unique_id != sender.unique_id))
+        return [player for player in plugin.players if player.unique_id != sender.unique_id]
+
+
+def _players(plugin, unique_ids: Iterable[UUID]) -> List[Player]:
+    players = plugin.players
+    return [player for player in map(players.get, unique_ids) if player is not None]
+
+
+def split_targets(text: str) -> List[str]:
+    """Split a space or comma separated list of names and selectors, keeping selector arguments together."""
+    parts = []
+    current = []
+    depth = 0
+    for char in text:
+        if char == "[":
+            depth += 1
+        elif char == "]":
+            depth = max(depth - 1, 0)
+        elif depth == 0 and (char == "," or char.isspace()):
+            if current:
+                parts.append("".join(current))
+                current = []
+            continue
+        current.append(char)
+    if current:
+        parts.append("".join(current))
+    return parts
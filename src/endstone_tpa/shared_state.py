@@ -0,0 +1,67 @@
+from typing import Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from .request_store import Request, RequestType
+
+
+class RemotePlayer:
+    """A player online on another server."""
+
+    __slots__ = ("unique_id", "name", "server")
+
+    def __init__(self, unique_id: UUID, name: str, server: str):
+        self.unique_id = unique_id
+        self.name = name
+        self.server = server
+
+
+class SharedState:
+    """
+    State shared by several plugin instances on the same host.
+
+    This base class is the single-server backend: there are no other
+    servers, so nothing is routed and every call is a no-op.
+    ``sqlite_shared.SqliteSharedState`` is the shared implementation; other
+    transports would subclass this the same way.
+    """
+
+    server_name = ""
+
+    def start(self, players: Iterable) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def poll(self) -> None:
+        """Scheduled every few ticks: apply changes made by other servers."""
+
+    def player_joined(self, player) -> None:
+        pass
+
+    def player_left(self, player) -> None:
+        pass
+
+    def find(self, name: str) -> Optional[RemotePlayer]:
+        """Find a player on another server by name or unambiguous prefix."""
+        return None
+
+    def get(self, unique_id: UUID) -> Optional[RemotePlayer]:
+        return None
+
+    def send_request(self, sender, target: RemotePlayer, request_type: RequestType, timeout: float) -> None:
+        """Deliver a request to the server ``target`` is on."""
+
+    def notify(self, player: UUID, message: str, *args) -> bool:
+        """Send a translated message to ``player`` on another server. Returns False if they are not online anywhere."""
+        return False
+
+    def accept(self, player, request: Request) -> bool:
+        """Accept a request whose requester is on another server. Returns False if they are not online anywhere."""
+        return False
+
+    def log_change(self, kind: str, player: int, name: Optional[str], statements: List[Tuple[str, tuple]]) -> None:
+        """Publish a change to the settings of ``player`` to the other servers, with the ``statements`` that make it."""
+
+    def stats(self) -> dict:
+        return {}
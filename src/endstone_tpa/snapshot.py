@@ -0,0 +1,368 @@
+import bisect
+import mmap
+import os
+import struct
+import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from uuid import UUID
+
+from .policy import PlayerPolicy, PolicyStore
+
+MAGIC = b"TPAP"
+VERSION = 1
+# magic, format version, number of sections
+HEADER = struct.Struct("<4sHH")
+# section tag, payload length in bytes
+SECTION = struct.Struct("<4sQ")
+# Index into BLOCKED of each owner's first entry, plus one past the last owner's
+OFFSET = struct.Struct("<I")
+UUID_SIZE = 16
+
+# Section tags. Every section holding UUIDs stores them as raw big-endian
+# 16-byte values, so byte order equals numeric order and lookups can bisect
+# the file directly.
+OWNERS = b"OWNR"  # Players blocking someone, sorted
+OFFSETS = b"BIDX"  # len(OWNERS) + 1 OFFSET entries
+BLOCKED = b"BLKD"  # The players each owner blocks, sorted per owner
+ALL_BLOCKS = b"ALLB"  # Players blocking all requests, sorted
+AUTO_ACCEPT = b"AUTO"  # Players auto-accepting all requests, sorted
+
+
+def _to_bytes(player: int) -> bytes:
+    return player.to_bytes(UUID_SIZE, "big")
+
+
+def _from_bytes(data: bytes) -> int:
+    return int.from_bytes(data, "big")
+
+
+class _Records:
+    """A section of 16-byte records, indexable without copying it out of the mapping."""
+
+    __slots__ = ("_data", "_start", "_count")
+
+    def __init__(self, data, start: int, count: int):
+        self._data = data
+        self._start = start
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> bytes:
+        offset = self._start + i * UUID_SIZE
+        return self._data[offset : offset + UUID_SIZE]
+
+    def index(self, value: bytes) -> int:
+        """Position of ``value``, or -1."""
+        i = bisect.bisect_left(self, value)
+        return i if i < self._count and self[i] == value else -1
+
+    def slice(self, start: int, stop: int) -> bytes:
+        return self._data[self._start + start * UUID_SIZE : self._start + stop * UUID_SIZE]
+
+    def __iter__(self) -> Iterator[bytes]:
+        data = self._data
+        for offset in range(self._start, self._start + self._count * UUID_SIZE, UUID_SIZE):
+            yield data[offset : offset + UUID_SIZE]
+
+
+class Snapshot:
+    """
+    A policy snapshot file, memory-mapped.
+
+    Opening one reads the header and section table only; a player's
+    settings are found by bisecting the sorted sections, so nothing is
+    parsed for players that are never looked up.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        sections = self._read_sections()
+        empty = _Records(self._data, 0, 0)
+        self.owners = sections.get(OWNERS, empty)
+        self.blocked = sections.get(BLOCKED, empty)
+        self.all_blocks = sections.get(ALL_BLOCKS, empty)
+        self.auto_accept = sections.get(AUTO_ACCEPT, empty)
+        # Position of the OFFSETS payload
+        self._offsets = sections[OFFSETS]._start if OFFSETS in sections else None
+        if len(self.owners) and self._offsets is None:
+            raise ValueError(f"{path} has no offsets section")
+
+    def _read_sections(self) -> Dict[bytes, _Records]:
+        data = self._data
+        if len(data) < HEADER.size:
+            raise ValueError(f"{self.path} is not a TPA policy snapshot")
+        magic, version, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a TPA policy snapshot")
+        if version != VERSION:
+            raise ValueError(f"{self.path} has unsupported snapshot version {version}")
+
+        sections = {}
+        position = HEADER.size
+        for _ in range(count):
+            tag, length = SECTION.unpack_from(data, position)
+            position += SECTION.size
+            if position + length > len(data):
+                raise ValueError(f"{self.path} is truncated")
+            if tag in (OWNERS, OFFSETS, BLOCKED, ALL_BLOCKS, AUTO_ACCEPT):
+                sections[tag] = _Records(data, position, length // UUID_SIZE)
+            # Unknown sections are skipped so newer files stay readable.
+            position += length
+        return sections
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def _range(self, i: int) -> Tuple[int, int]:
+        start = OFFSET.unpack_from(self._data, self._offsets + i * OFFSET.size)[0]
+        stop = OFFSET.unpack_from(self._data, self._offsets + (i + 1) * OFFSET.size)[0]
+        return start, stop
+
+    def lookup(self, player: int) -> Optional[PlayerPolicy]:
+        """The settings of ``player``, or None if they have none."""
+        key = _to_bytes(player)
+        blocked = set()
+        i = self.owners.index(key)
+        if i >= 0:
+            start, stop = self._range(i)
+            blocked = {_from_bytes(self.blocked[j]) for j in range(start, stop)}
+        all_block = self.all_blocks.index(key) >= 0
+        auto_accept = self.auto_accept.index(key) >= 0
+        if not blocked and not all_block and not auto_accept:
+            return None
+        return PlayerPolicy(blocked, all_block, auto_accept)
+
+    def iter_blocks(self) -> Iterator[Tuple[bytes, bytes]]:
+        """Every owner with the raw, concatenated UUIDs they block."""
+        for i, owner in enumerate(self.owners):
+            start, stop = self._range(i)
+            yield owner, self.blocked.slice(start, stop)
+
+    def to_config(self) -> dict:
+        """The snapshot in the ``blocks``/``all_blocks``/``auto_accept`` format of config.json."""
+        blocks = {}
+        for owner, payload in self.iter_blocks():
+            blocks[str(UUID(bytes=owner))] = [
+                str(UUID(bytes=payload[i : i + UUID_SIZE])) for i in range(0, len(payload), UUID_SIZE)
+            ]
+        return {
+            "blocks": blocks,
+            "all_blocks": [str(UUID(bytes=player)) for player in self.all_blocks],
+            "auto_accept": [str(UUID(bytes=player)) for player in self.auto_accept],
+        }
+
+
+def write_snapshot(
+    path: str, blocks: List[Tuple[bytes, bytes]], all_blocks: List[bytes], auto_accept: List[bytes]
+) -> None:
+    """
+    Write a snapshot. ``blocks`` holds (owner, concatenated blocked UUIDs)
+    pairs sorted by owner, with each owner's UUIDs sorted; the flag lists
+    must be sorted too. The file is replaced atomically.
+    """
+    offsets = bytearray(OFFSET.size * (len(blocks) + 1))
+    total = 0
+    for i, (_, payload) in enumerate(blocks):
+        OFFSET.pack_into(offsets, i * OFFSET.size, total)
+        total += len(payload) // UUID_SIZE
+    OFFSET.pack_into(offsets, len(blocks) * OFFSET.size, total)
+
+    sections = (
+        (OWNERS, b"".join(owner for owner, _ in blocks)),
+        (OFFSETS, bytes(offsets)),
+        (BLOCKED, b"".join(payload for _, payload in blocks)),
+        (ALL_BLOCKS, b"".join(all_blocks)),
+        (AUTO_ACCEPT, b"".join(auto_accept)),
+    )
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(sections)))
+        for tag, payload in sections:
+            f.write(SECTION.pack(tag, len(payload)))
+            f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_config_snapshot(path: str, config: dict) -> int:
+    """Write the policy sections of config.json as a snapshot. Returns the number of players with settings."""
+    source = PolicyStore.from_config(config)
+    blocks = []
+    all_blocks = []
+    auto_accept = []
+    for player, policy in source._players.items():
+        key = _to_bytes(player)
+        if policy.blocked:
+            blocks.append((key, b"".join(sorted(map(_to_bytes, policy.blocked)))))
+        if policy.all_block:
+            all_blocks.append(key)
+        if policy.auto_accept:
+            auto_accept.append(key)
+    blocks.sort()
+    write_snapshot(path, blocks, sorted(all_blocks), sorted(auto_accept))
+    return len(source)
+
+
+class SnapshotPolicyStore(PolicyStore):
+    """
+    Policy store backed by a memory-mapped snapshot file.
+
+    Only players that were looked up or changed are held in memory, on top
+    of the snapshot. ``save`` writes a new snapshot on a background thread:
+    owners nobody changed are copied over as raw bytes, so a save costs
+    about the same however few settings changed, and nothing is turned into
+    strings or UUID objects.
+
+    The new snapshot is written next to the current one and only moved
+    over it on the server thread, after the current one is unmapped:
+    Windows refuses to replace a file that is mapped.
+    """
+
+    def __init__(self, path: str, logger):
+        super().__init__()
+        self.path = path
+        self._logger = logger
+        self._snapshot = Snapshot(path)
+        # Players changed since the last save, and those in the save in progress
+        self._dirty: Set[int] = set()
+        self._saving: Set[int] = set()
+        self._executor = None
+        self._pending = None
+
+        self.save_count = 0
+        self.last_save_ms = 0.0
+
+    def load_player(self, player: UUID) -> None:
+        self._lookup(player.int)
+
+    def unload_player(self, player: UUID) -> None:
+        if player.int not in self._dirty and player.int not in self._saving:
+            self._players.pop(player.int, None)
+
+    def toggle_block(self, owner: UUID, player: UUID) -> bool:
+        self._dirty.add(owner.int)
+        return super().toggle_block(owner, player)
+
+    def toggle_all_block(self, player: UUID) -> bool:
+        self._dirty.add(player.int)
+        return super().toggle_all_block(player)
+
+    def toggle_auto_accept(self, player: UUID) -> bool:
+        self._dirty.add(player.int)
+        return super().toggle_auto_accept(player)
+
+    def to_config(self) -> dict:
+        """Export every setting in the config.json format."""
+        config = self._snapshot.to_config()
+        changed = {str(UUID(int=player)): self._players[player] for player in self._dirty | self._saving}
+        for player, policy in changed.items():
+            config["blocks"].pop(player, None)
+            if policy.blocked:
+                config["blocks"][player] = [str(UUID(int=v)) for v in policy.blocked]
+        for key, attribute in (("all_blocks", "all_block"), ("auto_accept", "auto_accept")):
+            players = [player for player in config[key] if player not in changed]
+            players.extend(player for player, policy in changed.items() if getattr(policy, attribute))
+            config[key] = players
+        return config
+
+    def save(self) -> None:
+        """Start writing a new snapshot if anything changed and no write is in progress."""
+        if self._pending is not None:
+            if not self._pending.done():
+                return
+            self._collect()
+        if not self._dirty:
+            return
+
+        # Copied here, on the server thread, so the worker never sees a
+        # setting while a command is changing it.
+        changes = self._changes(self._dirty)
+        self._saving, self._dirty = self._dirty, set()
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tpa-snapshot")
+        self._pending = self._executor.submit(self._write, self._snapshot, changes)
+
+    def close(self) -> None:
+        if self._pending is not None:
+            self._pending.exception()
+            self._collect()
+        if self._dirty:
+            changes = self._changes(self._dirty)
+            self._saving, self._dirty = self._dirty, set()
+            self._swap(self._write(self._snapshot, changes))
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._snapshot.close()
+
+    def _changes(self, players: Set[int]) -> Dict[bytes, Tuple[bytes, bool, bool]]:
+        changes = {}
+        for player in players:
+            policy = self._players.get(player) or PlayerPolicy()
+            blocked = b"".join(sorted(map(_to_bytes, policy.blocked)))
+            changes[_to_bytes(player)] = (blocked, policy.all_block, policy.auto_accept)
+        return changes
+
+    def _write(self, snapshot: Snapshot, changes: Dict[bytes, Tuple[bytes, bool, bool]]) -> str:
+        """Write ``snapshot`` with ``changes`` applied to a new file. Returns its path."""
+        start = time.perf_counter()
+        blocks = [(owner, payload) for owner, payload in snapshot.iter_blocks() if owner not in changes]
+        blocks.extend((owner, change[0]) for owner, change in changes.items() if change[0])
+        blocks.sort()
+        flags = []
+        for records, index in ((snapshot.all_blocks, 1), (snapshot.auto_accept, 2)):
+            players = [player for player in records if player not in changes]
+            players.extend(player for player, change in changes.items() if change[index])
+            players.sort()
+            flags.append(players)
+        new_path = self.path + ".new"
+        write_snapshot(new_path, blocks, flags[0], flags[1])
+
+        self.save_count += 1
+        self.last_save_ms = (time.perf_counter() - start) * 1000
+        return new_path
+
+    def _collect(self) -> None:
+        error = self._pending.exception()
+        if error is None:
+            try:
+                self._swap(self._pending.result())
+            except OSError as e:
+                error = e
+        if error is not None:
+            self._logger.error(f"Failed to save {self.path}: {error}")
+            # Keep the changes so the next save retries them.
+            self._dirty |= self._saving
+            self._saving = set()
+        self._pending = None
+
+    def _swap(self, new_path: str) -> None:
+        self._snapshot.close()
+        try:
+            os.replace(new_path, self.path)
+        finally:
+            # The new snapshot, or the old one again if it could not be replaced
+            self._snapshot = Snapshot(self.path)
+        self._saving = set()
+
+    def _lookup(self, player: int) -> Optional[PlayerPolicy]:
+        policy = self._players.get(player)
+        if policy is None:
+            # Players without any settings are kept too, so repeated requests
+            # to them do not search the snapshot again.
+            policy = self._players[player] = self._snapshot.lookup(player) or PlayerPolicy()
+        return policy
+
+    def _prune(self, player: int, policy: PlayerPolicy) -> None:
+        # Cleared players must stay in memory until the next save, or the
+        # snapshot would bring their old settings back.
+        pass
@@ -0,0 +1,194 @@
+import math
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from uuid import UUID
+
+Cell = Tuple[int, int]
+
+
+def dimension_key(name: str) -> str:
+    """Normalise a dimension name ("Overworld", "minecraft:the_end", "end", ...) for comparison."""
+    key = name.lower().removeprefix("minecraft:").replace("_", "").replace(" ", "")
+    return "theend" if key == "end" else key
+
+
+class Position:
+    """Where an online player was last seen."""
+
+    __slots__ = ("dimension", "x", "y", "z", "cell")
+
+    def __init__(self, dimension: str, x: float, y: float, z: float, cell: Cell):
+        self.dimension = dimension
+        self.x = x
+        self.y = y
+        self.z = z
+        self.cell = cell
+
+
+class SpatialIndex:
+    """
+    Online player positions in a uniform grid of ``cell_size`` by
+    ``cell_size`` block columns, one grid per dimension.
+
+    Kept up to date from join, quit, move and teleport events; a move
+    within the same cell only overwrites the coordinates. Radius queries
+    visit the cells overlapping the query, and nearest-player queries
+    search outwards ring by ring, so neither scans every online player.
+    Both fall back to walking the occupied cells when that is cheaper, for
+    example for a huge radius on a sparsely populated map.
+    """
+
+    def __init__(self, cell_size: int = 32):
+        self.cell_size = cell_size
+        self._positions: Dict[UUID, Position] = {}
+        # dimension -> cell -> players in it
+        self._grids: Dict[str, Dict[Cell, Set[UUID]]] = {}
+        self._counts: Dict[str, int] = {}
+        # Dimension name as reported by the server -> dimension_key() of it
+        self._keys: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def get(self, unique_id: UUID) -> Optional[Position]:
+        return self._positions.get(unique_id)
+
+    def update(self, unique_id: UUID, location) -> None:
+        """Record ``location`` (an endstone Location) as the position of the player."""
+        x, y, z = location.x, location.y, location.z
+        size = self.cell_size
+        cell = (int(x // size), int(z // size))
+        name = location.dimension.name
+        dimension = self._keys.get(name)
+        if dimension is None:
+            dimension = self._keys[name] = dimension_key(name)
+
+        position = self._positions.get(unique_id)
+        if position is not None:
+            if dimension != position.dimension:
+                self.remove(unique_id)
+            elif cell == position.cell:
+                position.x, position.y, position.z = x, y, z
+                return
+            else:
+                grid = self._grids[dimension]
+                grid[position.cell].discard(unique_id)
+                self._drop_cell_if_empty(dimension, position.cell)
+                grid.setdefault(cell, set()).add(unique_id)
+                position.cell = cell
+                position.x, position.y, position.z = x, y, z
+                return
+
+        self._positions[unique_id] = Position(dimension, x, y, z, cell)
+        self._grids.setdefault(dimension, {}).setdefault(cell, set()).add(unique_id)
+        self._counts[dimension] = self._counts.get(dimension, 0) + 1
+
+    def remove(self, unique_id: UUID) -> None:
+        position = self._positions.pop(unique_id, None)
+        if position is None:
+            return
+        dimension = position.dimension
+        self._grids[dimension][position.cell].discard(unique_id)
+        self._drop_cell_if_empty(dimension, position.cell)
+        self._counts[dimension] -= 1
+
+    def _drop_cell_if_empty(self, dimension: str, cell: Cell) -> None:
+        grid = self._grids[dimension]
+        if not grid[cell]:
+            del grid[cell]
+
+    def in_dimension(self, dimension: str) -> Iterator[UUID]:
+        for members in self._grids.get(dimension, {}).values():
+            yield from members
+
+    def within(
+        self, dimension: str, x: float, y: float, z: float, radius: float, min_radius: float = 0.0
+    ) -> List[Tuple[float, UUID]]:
+        """Players at a distance between ``min_radius`` and ``radius`` of a point, as (squared distance, UUID) pairs."""
+        grid = self._grids.get(dimension)
+        if not grid:
+            return []
+        if not math.isfinite(radius):
+            # No cell range to compute; every occupied cell is in reach.
+            return self._collect(grid.values(), x, y, z, radius * radius, min_radius * min_radius)
+        size = self.cell_size
+        x0, x1 = int((x - radius) // size), int((x + radius) // size)
+        z0, z1 = int((z - radius) // size), int((z + radius) // size)
+        if (x1 - x0 + 1) * (z1 - z0 + 1) <= len(grid):
+            cells = (grid.get((cx, cz)) for cx in range(x0, x1 + 1) for cz in range(z0, z1 + 1))
+        else:
+            cells = (members for (cx, cz), members in grid.items() if x0 <= cx <= x1 and z0 <= cz <= z1)
+        return self._collect(cells, x, y, z, radius * radius, min_radius * min_radius)
+
+    def nearest(
+        self,
+        dimension: str,
+        x: float,
+        y: float,
+        z: float,
+        count: int = 1,
+        radius: Optional[float] = None,
+        exclude: Optional[UUID] = None,
+    ) -> List[Tuple[float, UUID]]:
+        """The ``count`` players closest to a point, nearest first, as (squared distance, UUID) pairs."""
+        grid = self._grids.get(dimension)
+        if not grid or count <= 0:
+            return []
+        limit_sq = float("inf") if radius is None else radius * radius
+        available = self._counts[dimension]
+        excluded = self._positions.get(exclude) if exclude is not None else None
+        if excluded is not None and excluded.dimension == dimension:
+            available -= 1
+        wanted = min(count, available)
+        if wanted <= 0:
+            return []
+        size = self.cell_size
+        cx, cz = int(x // size), int(z // size)
+        found: List[Tuple[float, UUID]] = []
+        visited = 0
+        ring = 0
+        while True:
+            cells = self._ring(grid, cx, cz, ring)
+            visited += 8 * ring or 1
+            found.extend(item for item in self._collect(cells, x, y, z, limit_sq, 0.0) if item[1] != exclude)
+            # Anything in the next ring is at least ``ring * size`` blocks away.
+            bound = ring * size
+            if len(found) >= wanted:
+                found.sort()
+                if found[wanted - 1][0] <= bound * bound:
+                    return found[:wanted]
+            if bound * bound > limit_sq:
+                break
+            if visited + 8 * (ring + 1) > len(grid):
+                # Searching further out would visit more empty cells than there are occupied ones.
+                found = [item for item in self._collect(grid.values(), x, y, z, limit_sq, 0.0) if item[1] != exclude]
+                break
+            ring += 1
+        found.sort()
+        return found[:wanted]
+
+    @staticmethod
+    def _ring(grid: Dict[Cell, Set[UUID]], cx: int, cz: int, ring: int) -> Iterator[Optional[Set[UUID]]]:
+        """The cells at a Chebyshev distance of exactly ``ring`` from (cx, cz)."""
+        if ring == 0:
+            yield grid.get((cx, cz))
+            return
+        for dx in range(-ring, ring + 1):
+            yield grid.get((cx + dx, cz - ring))
+            yield grid.get((cx + dx, cz + ring))
+        for dz in range(-ring + 1, ring):
+            yield grid.get((cx - ring, cz + dz))
+            yield grid.get((cx + ring, cz + dz))
+
+    def _collect(self, cells, x: float, y: float, z: float, max_sq: float, min_sq: float) -> List[Tuple[float, UUID]]:
+        positions = self._positions
+        result = []
+        for members in cells:
+            if not members:
+                continue
+            for unique_id in members:
+                position = positions[unique_id]
+                dx, dy, dz = position.x - x, position.y - y, position.z - z
+                distance_sq = dx * dx + dy * dy + dz * dz
+                if min_sq <= distance_sq <= max_sq:
+                    result.append((distance_sq, unique_id))
+        return result
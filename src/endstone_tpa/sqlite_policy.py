@@ -0,0 +1,150 @@
+import sqlite3
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from .policy import PlayerPolicy, PolicyStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    owner BLOB NOT NULL,
+    blocked BLOB NOT NULL,
+    PRIMARY KEY (owner, blocked)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS all_blocks (player BLOB PRIMARY KEY) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS auto_accept (player BLOB PRIMARY KEY) WITHOUT ROWID;
+"""
+
+LOAD_PLAYER = """
+SELECT 0, blocked FROM blocks WHERE owner = ?1
+UNION ALL SELECT 1, NULL FROM all_blocks WHERE player = ?1
+UNION ALL SELECT 2, NULL FROM auto_accept WHERE player = ?1
+"""
+
+
+def _to_blob(player: int) -> bytes:
+    return player.to_bytes(16, "big")
+
+
+def _from_blob(blob: bytes) -> int:
+    return int.from_bytes(blob, "big")
+
+
+class SqlitePolicyStore(PolicyStore):
+    """
+    Policy store backed by an SQLite database in WAL mode.
+
+    Only the settings of online players, and of players recently looked up,
+    are kept in memory. A player's row set is read when they join and dropped
+    when they quit; anything else goes through a bounded LRU cache.
+    """
+
+    def __init__(self, path: str, cache_size: int = 1024):
+        super().__init__()
+        self.path = path
+        self.cache_size = cache_size
+        # player_uuid.int -> PlayerPolicy, least recently used first
+        self._players: Dict[int, PlayerPolicy] = OrderedDict()
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def load_player(self, player: UUID) -> None:
+        self._lookup(player.int)
+
+    def unload_player(self, player: UUID) -> None:
+        self._players.pop(player.int, None)
+
+    def invalidate(self, player: int) -> None:
+        """Forget the cached settings of ``player`` so the next lookup reads them again."""
+        self._players.pop(player, None)
+
+    def import_config(self, config: dict) -> int:
+        """Copy the ``blocks``/``all_blocks``/``auto_accept`` sections of config.json into the database."""
+        source = PolicyStore.from_config(config)
+        with self._conn:
+            for player, policy in source._players.items():
+                blob = _to_blob(player)
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO blocks (owner, blocked) VALUES (?, ?)",
+                    [(blob, _to_blob(v)) for v in policy.blocked],
+                )
+                if policy.all_block:
+                    self._conn.execute("INSERT OR IGNORE INTO all_blocks (player) VALUES (?)", (blob,))
+                if policy.auto_accept:
+                    self._conn.execute("INSERT OR IGNORE INTO auto_accept (player) VALUES (?)", (blob,))
+        self._players.clear()
+        return len(source)
+
+    def to_config(self) -> dict:
+        """Export the whole database in the config.json format."""
+        blocks = {}
+        for owner, blocked in self._conn.execute("SELECT owner, blocked FROM blocks"):
+            blocks.setdefault(str(UUID(bytes=owner)), []).append(str(UUID(bytes=blocked)))
+        all_blocks = [str(UUID(bytes=row[0])) for row in self._conn.execute("SELECT player FROM all_blocks")]
+        auto_accept = [str(UUID(bytes=row[0])) for row in self._conn.execute("SELECT player FROM auto_accept")]
+        return {"blocks": blocks, "all_blocks": all_blocks, "auto_accept": auto_accept}
+
+    def toggle_block(self, owner: UUID, player: UUID) -> bool:
+        blocked = super().toggle_block(owner, player)
+        statement = (
+            "INSERT OR IGNORE INTO blocks (owner, blocked) VALUES (?, ?)"
+            if blocked
+            else "DELETE FROM blocks WHERE owner = ? AND blocked = ?"
+        )
+        self._write(owner.int, [(statement, (_to_blob(owner.int), _to_blob(player.int)))])
+        return blocked
+
+    def toggle_all_block(self, player: UUID) -> bool:
+        enabled = super().toggle_all_block(player)
+        self._set_flag("all_blocks", player, enabled)
+        return enabled
+
+    def toggle_auto_accept(self, player: UUID) -> bool:
+        enabled = super().toggle_auto_accept(player)
+        self._set_flag("auto_accept", player, enabled)
+        return enabled
+
+    def _set_flag(self, table: str, player: UUID, enabled: bool) -> None:
+        statement = (
+            f"INSERT OR IGNORE INTO {table} (player) VALUES (?)"
+            if enabled
+            else f"DELETE FROM {table} WHERE player = ?"
+        )
+        self._write(player.int, [(statement, (_to_blob(player.int),))])
+
+    def _write(self, player: int, statements: List[Tuple[str, tuple]]) -> None:
+        """Apply a change to the settings of ``player``."""
+        with self._conn:
+            for statement, params in statements:
+                self._conn.execute(statement, params)
+
+    def _lookup(self, player: int) -> Optional[PlayerPolicy]:
+        policy = self._players.get(player)
+        if policy is not None:
+            self._players.move_to_end(player)
+            return policy
+
+        # Players without any settings are cached too, so repeated requests to
+        # them do not hit the database.
+        policy = PlayerPolicy()
+        for kind, blocked in self._conn.execute(LOAD_PLAYER, (_to_blob(player),)):
+            if kind == 0:
+                policy.blocked.add(_from_blob(blocked))
+            elif kind == 1:
+                policy.all_block = True
+            else:
+                policy.auto_accept = True
+
+        self._players[player] = policy
+        if len(self._players) > self.cache_size:
+            self._players.popitem(last=False)
+        return policy
+
+    def _prune(self, player: int, policy: PlayerPolicy) -> None:
+        # Cleared players stay cached as negative entries.
+        pass
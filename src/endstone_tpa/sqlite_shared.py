@@ -0,0 +1,400 @@
+import json
+import sqlite3
+import time
+from collections import deque
+from functools import partial
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from .players import PlayerIndex
+from .policy import PlayerPolicy
+from .request_store import Request, RequestType
+from .shared_state import RemotePlayer, SharedState
+from .sqlite_policy import SqlitePolicyStore, _from_blob, _to_blob
+from .utils import SendResult, result_message, send_request
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    origin TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    player BLOB NOT NULL,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS presence (
+    player BLOB PRIMARY KEY,
+    name TEXT NOT NULL,
+    server TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS mailbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    server TEXT NOT NULL,
+    created REAL NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS mailbox_server ON mailbox (server, id);
+"""
+
+INSERT_CHANGE = "INSERT INTO changes (created, origin, kind, player, name) VALUES (?, ?, ?, ?, ?)"
+# Logs every presence row of a server as a quit, before the rows are deleted.
+LOG_SERVER_QUITS = (
+    "INSERT INTO changes (created, origin, kind, player, name) "
+    "SELECT ?, server, 'quit', player, name FROM presence WHERE server = ?"
+)
+INSERT_MESSAGE = "INSERT INTO mailbox (server, created, kind, payload) VALUES (?, ?, ?, ?)"
+
+# Change log rows and undelivered messages older than this are deleted.
+RETENTION_SECONDS = 3600
+# How long a player transferred to this server is expected to arrive.
+ARRIVAL_SECONDS = 120
+
+
+class SharedPolicyStore(SqlitePolicyStore):
+    """
+    Policy store on the shared database. Changes update the local cache
+    right away and are written, with a change log row, in the background.
+
+    Until its write is committed, a changed player's settings are also kept
+    in an overlay that lookups read instead of the database, so a change
+    survives the player being evicted from the cache or rejoining first.
+    """
+
+    def __init__(self, state: "SqliteSharedState", path: str, cache_size: int = 1024):
+        super().__init__(path, cache_size)
+        self.state = state
+        # player_uuid.int -> (number of the player's last write, settings as of that write)
+        self._unsaved: Dict[int, Tuple[int, PlayerPolicy]] = {}
+
+    def written(self, write: int) -> None:
+        """Drop the overlay entries whose last write is ``write`` or older, now that it is committed."""
+        if self._unsaved:
+            for player in [player for player, (last, _) in self._unsaved.items() if last <= write]:
+                del self._unsaved[player]
+
+    def _write(self, player: int, statements: List[Tuple[str, tuple]]) -> None:
+        write = self.state.log_change("policy", player, None, statements)
+        policy = self._players[player]
+        self._unsaved[player] = (write, PlayerPolicy(set(policy.blocked), policy.all_block, policy.auto_accept))
+
+    def _lookup(self, player: int) -> Optional[PlayerPolicy]:
+        if player not in self._players:
+            unsaved = self._unsaved.get(player)
+            if unsaved is not None:
+                policy = unsaved[1]
+                self._players[player] = PlayerPolicy(set(policy.blocked), policy.all_block, policy.auto_accept)
+                if len(self._players) > self.cache_size:
+                    self._players.popitem(last=False)
+        return super()._lookup(player)
+
+
+class SqliteSharedState(SharedState):
+    """
+    Shared state in one SQLite database in WAL mode that every instance opens.
+
+    Block and auto-accept settings live in the same tables as ``sqlite``
+    storage. Every change also appends a row to a change log. Each instance
+    polls ``PRAGMA data_version``, which only moves when another connection
+    has committed, and reads the log only then: settings that changed
+    elsewhere are dropped from the local cache, and joins and quits keep a
+    local index of players on other servers. Requests to those players are
+    routed through a per-server mailbox table.
+
+    Reads go to the local caches or to the WAL, where they never wait for a
+    writer. Every write runs on a background thread with its own connection,
+    so a server waiting for another server's write lock never stalls a tick.
+    """
+
+    def __init__(self, plugin, path: str, server_name: str, servers: Optional[Dict[str, str]] = None):
+        self.plugin = plugin
+        self.path = path
+        self.server_name = server_name
+        # server name -> "host:port" players are transferred to
+        self.servers = servers or {}
+        self.policy = SharedPolicyStore(self, path, plugin.plugin_config.get("cache-size", 1024))
+        self._conn = self.policy._conn
+        self._conn.executescript(SCHEMA)
+
+        self.remote = PlayerIndex()
+        # arriving player_uuid.int -> (requester, target, request type, deadline)
+        self._arrivals: Dict[int, Tuple[UUID, UUID, RequestType, float]] = {}
+        self._data_version = None
+        self._last_change = 0
+        self._last_message = 0
+        self._next_prune = 0.0
+        self._executor = None
+        self._writer = None
+        # Writes are numbered in the order they are submitted. The worker
+        # thread only sets ``_committed`` and appends to ``_write_errors``;
+        # the server thread acts on both in ``poll``.
+        self._submitted = 0
+        self._committed = 0
+        self._write_errors: Deque[str] = deque()
+
+        self.polls = 0
+        self.changes_applied = 0
+        self.messages_received = 0
+        self.messages_sent = 0
+
+    # Lifecycle
+
+    def start(self, players: Iterable) -> None:
+        """Take over this server's presence rows and read the current state of the others."""
+        row = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM changes").fetchone()
+        self._last_change = row[0]
+        # Messages left from an earlier run of this server are stale.
+        row = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM mailbox WHERE server = ?", (self.server_name,))
+        self._last_message = row.fetchone()[0]
+        for player, name, server in self._conn.execute(
+            "SELECT player, name, server FROM presence WHERE server != ?", (self.server_name,)
+        ):
+            self.remote.add(RemotePlayer(UUID(bytes=player), name, server))
+
+        # Rows left behind if this server stopped without closing.
+        statements = self._clear_presence_statements()
+        for player in players:
+            statements.extend(self._presence_statements(player, True))
+        self._submit(statements)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._submit(self._clear_presence_statements())
+            self._executor.submit(self._close_writer)
+            self._executor.shutdown()
+            self._executor = None
+            self._report_writes()
+        self.policy.close()
+
+    # Changes made here
+
+    def player_joined(self, player) -> None:
+        self._submit(self._presence_statements(player, True))
+        arrival = self._arrivals.pop(player.unique_id.int, None)
+        if arrival is not None and arrival[3] > time.monotonic():
+            requester, target, request_type, _ = arrival
+            # Give the client a moment to spawn before moving it again.
+            teleport = partial(self.plugin.teleports.submit, requester, target, request_type)
+            self.plugin.server.scheduler.run_task(self.plugin, teleport, delay=20)
+
+    def player_left(self, player) -> None:
+        self._submit(self._presence_statements(player, False))
+
+    def log_change(self, kind: str, player: int, name: Optional[str], statements: List[Tuple[str, tuple]]) -> int:
+        """Returns the number of the write, which ``SharedPolicyStore.written`` is called with once it commits."""
+        change = (INSERT_CHANGE, (time.time(), self.server_name, kind, _to_blob(player), name))
+        return self._submit(statements + [change])
+
+    def _clear_presence_statements(self) -> List[Tuple[str, tuple]]:
+        return [
+            (LOG_SERVER_QUITS, (time.time(), self.server_name)),
+            ("DELETE FROM presence WHERE server = ?", (self.server_name,)),
+        ]
+
+    def _presence_statements(self, player, online: bool) -> List[Tuple[str, tuple]]:
+        blob = _to_blob(player.unique_id.int)
+        if online:
+            statement = ("INSERT OR REPLACE INTO presence (player, name, server) VALUES (?, ?, ?)", (blob, player.name, self.server_name))
+        else:
+            statement = ("DELETE FROM presence WHERE player = ? AND server = ?", (blob, self.server_name))
+        change = (INSERT_CHANGE, (time.time(), self.server_name, "join" if online else "quit", blob, player.name))
+        return [statement, change]
+
+    # Changes made elsewhere
+
+    def poll(self) -> None:
+        self.polls += 1
+        self._report_writes()
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        self._data_version = version
+
+        for change_id, origin, kind, player, name in self._conn.execute(
+            "SELECT id, origin, kind, player, name FROM changes WHERE id > ? ORDER BY id", (self._last_change,)
+        ).fetchall():
+            self._last_change = change_id
+            if origin == self.server_name:
+                continue
+            self.changes_applied += 1
+            player_id = _from_blob(player)
+            if kind == "policy":
+                self.policy.invalidate(player_id)
+            elif kind == "join":
+                self.remote.add(RemotePlayer(UUID(int=player_id), name, origin))
+            elif kind == "quit":
+                remote = self.remote.get(UUID(int=player_id))
+                if remote is not None and remote.server == origin:
+                    self.remote.remove(remote)
+
+        messages = self._conn.execute(
+            "SELECT id, kind, payload FROM mailbox WHERE server = ? AND id > ? ORDER BY id",
+            (self.server_name, self._last_message),
+        ).fetchall()
+        for message_id, kind, payload in messages:
+            self._last_message = message_id
+            self.messages_received += 1
+            self._receive(kind, json.loads(payload))
+        if messages:
+            self._submit([("DELETE FROM mailbox WHERE server = ? AND id <= ?", (self.server_name, self._last_message))])
+
+        now = time.monotonic()
+        if now >= self._next_prune:
+            self._next_prune = now + 600
+            cutoff = time.time() - RETENTION_SECONDS
+            self._submit([
+                ("DELETE FROM changes WHERE created < ?", (cutoff,)),
+                ("DELETE FROM mailbox WHERE created < ?", (cutoff,)),
+            ])
+
+    def find(self, name: str) -> Optional[RemotePlayer]:
+        return self.remote.find(name)
+
+    def get(self, unique_id: UUID) -> Optional[RemotePlayer]:
+        return self.remote.get(unique_id)
+
+    # Routing
+
+    def send_request(self, sender, target: RemotePlayer, request_type: RequestType, timeout: float) -> None:
+        self._post(target.server, "request", {
+            "target": str(target.unique_id),
+            "target_name": target.name,
+            "requester": str(sender.unique_id),
+            "requester_name": sender.name,
+            "type": request_type.value,
+            "timeout": timeout,
+            "server": self.server_name,
+        })
+
+    def notify(self, player: UUID, message: str, *args) -> bool:
+        remote = self.remote.get(player)
+        if remote is None:
+            return False
+        self._post(remote.server, "notice", {"player": str(player), "message": message, "args": list(args)})
+        return True
+
+    def accept(self, player, request: Request) -> bool:
+        requester = self.remote.get(request.requester_uuid)
+        if requester is None:
+            return False
+
+        plugin = self.plugin
+        if request.type is RequestType.TPA:
+            # The requester comes here and is teleported once they join.
+            self._arrivals[requester.unique_id.int] = (
+                requester.unique_id, player.unique_id, request.type, time.monotonic() + ARRIVAL_SECONDS
+            )
+            self._post(requester.server, "transfer", {
+                "player": str(requester.unique_id),
+                "server": self.server_name,
+                "message": "tpa.remote_accepted",
+                "args": [player.name, self.server_name],
+            })
+            plugin._(player, "tpa.remote_arriving", requester.name, requester.server)
+        else:
+            # The accepting player goes to the requester's server.
+            self._post(requester.server, "arrival", {
+                "player": str(player.unique_id),
+                "requester": str(requester.unique_id),
+                "target": str(player.unique_id),
+                "type": request.type.value,
+            })
+            self.notify(requester.unique_id, "tpa.remote_accepted", player.name, self.server_name)
+            self.transfer(player, requester.server)
+        return True
+
+    def transfer(self, player, server: str) -> None:
+        address = self.servers.get(server)
+        if not address:
+            self.plugin._(player, "tpa.join_server", server)
+            return
+        host, _, port = address.rpartition(":")
+        self.plugin._(player, "tpa.transferring", server)
+        player.transfer(host, int(port))
+
+    def _receive(self, kind: str, payload: dict) -> None:
+        plugin = self.plugin
+        if kind == "request":
+            self._receive_request(payload)
+        elif kind == "notice":
+            player = plugin.players.get(UUID(payload["player"]))
+            if player:
+                plugin._(player, payload["message"], *payload["args"])
+        elif kind == "transfer":
+            player = plugin.players.get(UUID(payload["player"]))
+            if player:
+                plugin._(player, payload["message"], *payload["args"])
+                self.transfer(player, payload["server"])
+        elif kind == "arrival":
+            self._arrivals[UUID(payload["player"]).int] = (
+                UUID(payload["requester"]), UUID(payload["target"]), RequestType(payload["type"]),
+                time.monotonic() + ARRIVAL_SECONDS,
+            )
+        else:
+            plugin.logger.warning(f"Ignoring unknown shared message kind {kind!r}.")
+
+    def _receive_request(self, payload: dict) -> None:
+        plugin = self.plugin
+        requester = self.remote.get(UUID(payload["requester"]))
+        if requester is None:
+            requester = RemotePlayer(UUID(payload["requester"]), payload["requester_name"], payload["server"])
+        target = plugin.players.get(UUID(payload["target"]))
+        if target is None:
+            self.notify(requester.unique_id, "tpa.target_left", payload["target_name"])
+            return
+        result = send_request(plugin, requester, target, RequestType(payload["type"]), payload["timeout"])
+        # The sender was already told the request is on its way.
+        message = result_message(plugin, target, result) if result is not SendResult.SENT else None
+        if message is not None:
+            self.notify(requester.unique_id, *message)
+
+    # Background writes
+
+    def _post(self, server: str, kind: str, payload: dict) -> None:
+        self.messages_sent += 1
+        self._submit([(INSERT_MESSAGE, (server, time.time(), kind, json.dumps(payload)))])
+
+    def _submit(self, statements: List[Tuple[str, tuple]]) -> int:
+        """Queue ``statements`` to be written in one transaction. Returns the number of the write."""
+        if self._executor is None:
+            # Imported here so loading the plugin does not pay for it.
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tpa-shared")
+        self._submitted += 1
+        self._executor.submit(self._write, self._submitted, statements)
+        return self._submitted
+
+    def _write(self, write: int, statements: List[Tuple[str, tuple]]) -> None:
+        # Runs on the worker thread, which owns the writer connection.
+        try:
+            if self._writer is None:
+                self._writer = sqlite3.connect(self.path, timeout=5.0)
+                self._writer.execute("PRAGMA synchronous=NORMAL")
+            with self._writer:
+                for statement, params in statements:
+                    self._writer.execute(statement, params)
+        except sqlite3.Error as e:
+            self._write_errors.append(f"Failed to write shared TPA state to {self.path}: {e}")
+        finally:
+            self._committed = write
+
+    def _report_writes(self) -> None:
+        """Log the errors of finished writes and retire their overlay entries. Runs on the server thread."""
+        while self._write_errors:
+            self.plugin.logger.error(self._write_errors.popleft())
+        self.policy.written(self._committed)
+
+    def _close_writer(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def stats(self) -> dict:
+        return {
+            "shared_remote_players": len(self.remote),
+            "shared_polls": self.polls,
+            "shared_changes_applied": self.changes_applied,
+            "shared_messages_sent": self.messages_sent,
+            "shared_messages_received": self.messages_received,
+        }
@@ -0,0 +1,93 @@
+from collections import deque
+from typing import Deque
+from uuid import UUID
+
+from .policy import PolicyDecision
+from .request_store import RequestType
+
+
+class TeleportJob:
+    """An accepted request waiting to be carried out."""
+
+    __slots__ = ("requester", "target", "request_type", "auto", "quiet")
+
+    def __init__(self, requester: UUID, target: UUID, request_type: RequestType, auto: bool, quiet: bool = False):
+        self.requester = requester
+        self.target = target
+        self.request_type = request_type
+        # Accepted through the target's auto-accept setting rather than by hand
+        self.auto = auto
+        # Part of a bulk accept; the target already got a summary
+        self.quiet = quiet
+
+
+class TeleportDispatcher:
+    """
+    Runs at most ``per_tick`` teleports per server tick.
+
+    A teleport runs right away while the current tick still has budget and
+    nothing is queued; otherwise it waits for a later tick and both players
+    are told. Queued jobs are checked again when they run, since either
+    player may have left or the target may have blocked the requester by
+    then. A ``per_tick`` of 0 runs every teleport immediately.
+    """
+
+    def __init__(self, plugin, per_tick: int = 5):
+        self.plugin = plugin
+        self.per_tick = per_tick
+        self._queue: Deque[TeleportJob] = deque()
+        self._used = 0
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def submit(
+        self, requester: UUID, target: UUID, request_type: RequestType, auto: bool = False, quiet: bool = False
+    ) -> None:
+        job = TeleportJob(requester, target, request_type, auto, quiet)
+        if self.per_tick <= 0 or (not self._queue and self._used < self.per_tick):
+            self._used += 1
+            self._run(job)
+            return
+
+        self._queue.append(job)
+        position = len(self._queue)
+        for player_uuid in (requester,) if quiet else (requester, target):
+            player = self.plugin.players.get(player_uuid)
+            if player:
+                self.plugin._(player, "tpa.teleport_queued", position)
+
+    def tick(self) -> None:
+        """Scheduled every tick: run queued teleports up to the per-tick budget."""
+        self._used = 0
+        queue = self._queue
+        while queue and self._used < self.per_tick:
+            self._used += 1
+            self._run(queue.popleft())
+
+    def _run(self, job: TeleportJob) -> None:
+        plugin = self.plugin
+        requester = plugin.players.get(job.requester)
+        target = plugin.players.get(job.target)
+        if not requester or not target:
+            for player in (requester, target):
+                if player:
+                    plugin._(player, "tpa.teleport_cancelled")
+            return
+
+        decision = plugin.tpa_policy.check(job.requester, job.target)
+        if decision is PolicyDecision.BLOCKED or (job.auto and decision is not PolicyDecision.AUTO_ACCEPT):
+            plugin._(requester, "tpa.teleport_cancelled")
+            plugin._(target, "tpa.teleport_cancelled")
+            return
+
+        if job.request_type is RequestType.TPA:
+            requester.teleport(target.location)
+            plugin._(requester, "tpa.sender_accepted", target.name)
+            if not job.quiet:
+                plugin._(target, "tpa.request_accepted", requester.name)
+        elif job.request_type is RequestType.TPTHERE:
+            target.teleport(requester.location)
+            if not job.quiet:
+                plugin._(target, "tpthere.sender_accepted", requester.name)
+            plugin._(requester, "tpthere.request_accepted", target.name)
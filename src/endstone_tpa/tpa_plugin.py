@@ -1,29 +1,57 @@
 import json
 import os
 import time
-from typing import Dict, Tuple
-from uuid import UUID
 
 from endstone import Player
 from endstone.command import Command, CommandSender
+from endstone.event import (
+    EventPriority,
+    PlayerJoinEvent,
+    PlayerMoveEvent,
+    PlayerQuitEvent,
+    PlayerTeleportEvent,
+    event_handler,
+)
 from endstone.plugin import Plugin
 
-from .commands import preloaded_commands, preloaded_handlers
+from .api import TpaApi
+from .commands import COMMANDS, get_handler
+from .forms import RequestForms
+from .i18n import TranslationCatalog
+from .persistence import ConfigWriter
+from .players import PlayerIndex
+from .ratelimit import RateLimiter
+from .policy import PolicyStore
+from .request_store import RequestState, RequestStore
+from .shared_state import SharedState
+from .spatial import SpatialIndex
+from .teleport import TeleportDispatcher
+from .watcher import FileWatcher
+
+POLICY_KEYS = ("blocks", "all_blocks", "auto_accept")
+# Commands that are timed but never profiled. /tpaprofile stop ends the
+# profile it would be recorded in.
+UNPROFILED_COMMANDS = ("tpaprofile",)
+# Settings that only take effect after a restart
+RESTART_KEYS = ("storage", "cache-size", "shared-db-path", "server-name")
+
+
+class DisabledMetrics:
+    """Stands in for ``Metrics`` until metrics are first enabled, so metrics.py is not imported before then."""
+
+    enabled = False
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        pass
 
 
 class TpaPlugin(Plugin):
     prefix = "TpaPlugin"
     api_version = "0.10"
     load = "POSTWORLD"
-    # target_uuid -> {requester_uuid: (timestamp, type)}
-    tpa_requests: Dict[UUID, Dict[UUID, Tuple[float, str]]] = {}
-    # player_uuid -> [blocked_player_uuid]
-    tpa_blocks: Dict[UUID, list[UUID]] = {}
-    # list of player_uuid
-    tpa_all_blocks: list[UUID] = []
-    # list of player_uuid
-    tpa_auto_accept: list[UUID] = []
-    translations: Dict[str, Dict[str, str]] = {}
+    tpa_requests: RequestStore
+    tpa_policy: PolicyStore
+    catalog: TranslationCatalog
 
     def _(self, sender: CommandSender, message: str, *args, return_string: bool = False) -> str | None:
         if isinstance(sender, Player):
@@ -31,15 +59,7 @@ class TpaPlugin(Plugin):
         else:
             locale = self.server.language.locale
 
-        translation = self.translations.get(message, {}).get(
-            locale, self.translations.get(message, {}).get("en_US")
-        )
-        text_to_translate = translation if translation else message
-
-        if args:
-            formatted_message = text_to_translate.format(*args)
-        else:
-            formatted_message = text_to_translate
+        formatted_message = self.catalog.render(locale, message, args)
 
         if return_string:
             return formatted_message
@@ -47,7 +67,7 @@ class TpaPlugin(Plugin):
             sender.send_message(formatted_message)
             return None
 
-    commands = preloaded_commands
+    commands = COMMANDS
 
     permissions = {
         "tpa.command.*": {"description": "Allows users to use all TPA commands.", "default": True},
@@ -59,30 +79,62 @@ class TpaPlugin(Plugin):
         "tpa.command.tpablock": {"description": "Allows users to use the /tpablock command.", "default": True},
         "tpa.command.tpaallblock": {"description": "Allows users to use the /tpaallblock command.", "default": True},
         "tpa.command.tpaautoaccept": {"description": "Allows users to use the /tpaautoaccept command.", "default": True},
+        "tpa.command.tpastats": {"description": "Allows users to use the /tpastats command.", "default": "op"},
+        "tpa.command.tpareload": {"description": "Allows users to use the /tpareload command.", "default": "op"},
+        "tpa.command.tpaprofile": {"description": "Allows users to use the /tpaprofile command.", "default": "op"},
+        "tpa.command.tpatrace": {"description": "Allows users to use the /tpatrace command.", "default": "op"},
     }
 
     def on_load(self) -> None:
         self.logger.info("TpaPlugin loaded.")
         self.load_config()
+        self.tpa_requests = RequestStore(
+            self.plugin_config.get("max-outgoing-requests", 5),
+            self.plugin_config.get("max-pending-per-target", 10),
+            self.plugin_config.get("max-batch-requests", 100),
+        )
+        self.rate_limiter = RateLimiter(
+            self.plugin_config.get("rate-limit-burst", 3),
+            self.plugin_config.get("rate-limit-per-minute", 6),
+        )
+        self.metrics = DisabledMetrics()
+        # Only set while profiling or tracing. Like the storage backends,
+        # profiling.py and tracing.py are imported when first used.
+        self.profiler = None
+        self.tracer = None
+        self._enable_metrics(self.plugin_config.get("metrics-enabled", False))
         lang_dir = os.path.join(os.path.dirname(__file__), "lang")
         if not os.path.exists(lang_dir):
             self.logger.warning(f"Language directory not found at {lang_dir}")
-            return
-
-        for file_name in os.listdir(lang_dir):
-            if file_name.endswith(".json"):
-                locale = file_name[:-5]
-                with open(os.path.join(lang_dir, file_name), "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    for key, value in data.items():
-                        if key not in self.translations:
-                            self.translations[key] = {}
-                        self.translations[key][locale] = value
+        self.catalog = TranslationCatalog(lang_dir)
+        self.watcher = FileWatcher([self.config_writer.path, lang_dir])
+        for locale in self.catalog.locales:
+            self.watcher.watch(self.catalog.path(locale))
+        # Locale files added since startup that could not be read
+        self._invalid_lang_files: set[str] = set()
 
     def load_config(self):
         config_path = os.path.join(self.data_folder, "config.json")
         default_config = {
             "request-timeout": 60,
+            "max-outgoing-requests": 5,
+            "max-pending-per-target": 10,
+            "max-pending-requests": 10000,
+            "max-batch-requests": 100,
+            "rate-limit-burst": 3,
+            "rate-limit-per-minute": 6,
+            "teleports-per-tick": 5,
+            "save-interval": 100,
+            "reload-check-interval": 40,
+            "storage": "json",
+            "cache-size": 1024,
+            "shared-db-path": "",
+            "server-name": "",
+            "shared-servers": {},
+            "shared-poll-interval": 2,
+            "metrics-enabled": False,
+            "metrics-dump-format": "json",
+            "metrics-dump-interval": 0,
             "blocks": {},
             "all_blocks": [],
             "auto_accept": [],
@@ -96,42 +148,418 @@ class TpaPlugin(Plugin):
         else:
             with open(config_path, 'r') as f:
                 self.plugin_config = json.load(f)
-        
-        self.tpa_blocks = {UUID(k): [UUID(v) for v in val] for k, val in self.plugin_config.get("blocks", {}).items()}
-        self.tpa_all_blocks = [UUID(v) for v in self.plugin_config.get("all_blocks", [])]
-        self.tpa_auto_accept = [UUID(v) for v in self.plugin_config.get("auto_accept", [])]
+
+        self.storage = self.plugin_config.get("storage", "json")
+        self.shared = SharedState()
+        if self.storage == "shared" and not self.plugin_config.get("shared-db-path"):
+            self.logger.error("storage is set to shared but shared-db-path is empty; using json storage instead.")
+            self.storage = "json"
+        snapshot_path = os.path.join(self.data_folder, "tpa-policy.bin")
+        imported = False
+        if self.storage == "sqlite":
+            self.tpa_policy = self._open_sqlite_policy()
+        elif self.storage == "shared":
+            self.shared = self._open_shared_state()
+            self.tpa_policy = self.shared.policy
+        elif self.storage == "snapshot":
+            self.tpa_policy = self._open_snapshot_policy(snapshot_path)
+        else:
+            imported = os.path.exists(snapshot_path) and self._import_snapshot(snapshot_path)
+            self.tpa_policy = PolicyStore.from_config(self.plugin_config)
+        self.config_writer = ConfigWriter(config_path, self._config_snapshot, self.logger)
+        if imported:
+            # Save config.json before retiring the snapshot it was converted from.
+            self.config_writer.mark_dirty()
+            self.config_writer.flush()
+            os.replace(snapshot_path, snapshot_path + ".imported")
+        # Policy sections as last read from or written to config.json
+        self._policy_baseline = {key: self.plugin_config.get(key, {} if key == "blocks" else []) for key in POLICY_KEYS}
+
+    def _open_sqlite_policy(self) -> PolicyStore:
+        from .sqlite_policy import SqlitePolicyStore
+
+        db_path = os.path.join(self.data_folder, "tpa.db")
+        migrate = not os.path.exists(db_path)
+        store = SqlitePolicyStore(db_path, self.plugin_config.get("cache-size", 1024))
+        if migrate:
+            # One-shot import of the settings kept in config.json so far. The
+            # JSON sections are left untouched so switching back still works.
+            count = store.import_config(self.plugin_config)
+            if count:
+                self.logger.info(f"Migrated TPA settings of {count} players from config.json to {db_path}.")
+        return store
+
+    def _open_snapshot_policy(self, path: str) -> PolicyStore:
+        from .snapshot import SnapshotPolicyStore, write_config_snapshot
+
+        if not os.path.exists(path):
+            # Like with sqlite, the JSON sections are left in config.json.
+            count = write_config_snapshot(path, self.plugin_config)
+            if count:
+                self.logger.info(f"Converted TPA settings of {count} players from config.json to {path}.")
+        return SnapshotPolicyStore(path, self.logger)
+
+    def _import_snapshot(self, path: str) -> bool:
+        """Convert the snapshot left by ``snapshot`` storage back into config.json, after switching to ``json``."""
+        from .snapshot import Snapshot
+
+        try:
+            snapshot = Snapshot(path)
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Failed to read {path}: {e}")
+            return False
+        self.plugin_config.update(snapshot.to_config())
+        snapshot.close()
+        self.logger.info(f"Converted TPA settings from {path} to config.json.")
+        return True
+
+    def _open_shared_state(self) -> SharedState:
+        from .sqlite_shared import SqliteSharedState
+
+        db_path = self.plugin_config["shared-db-path"]
+        server_name = self.plugin_config.get("server-name") or str(self.server.port)
+        migrate = not os.path.exists(db_path)
+        shared = SqliteSharedState(self, db_path, server_name, self.plugin_config.get("shared-servers", {}))
+        if migrate:
+            # Whichever server creates the database seeds it with its settings.
+            count = shared.policy.import_config(self.plugin_config)
+            if count:
+                self.logger.info(f"Migrated TPA settings of {count} players from config.json to {db_path}.")
+        return shared
+
+    def save_policy(self):
+        """Schedule config.json to be rewritten with the current policy state."""
+        if self.storage == "json":
+            self.config_writer.mark_dirty()
+
+    def _config_snapshot(self) -> dict:
+        if self.storage == "json":
+            self._policy_baseline = self.tpa_policy.to_config()
+            self.plugin_config.update(self._policy_baseline)
+        return dict(self.plugin_config)
+
+    def check_for_changes(self) -> list[str]:
+        """
+        Reload config.json and language files that changed on disk since the
+        last check. Scheduled every ``reload-check-interval`` ticks and run by
+        /tpareload. Returns the names of the files reloaded.
+        """
+        reloaded = []
+        # While a save is running, config.json is left for a later check,
+        # when the stamp of that save is known.
+        skip = () if self.config_writer.settle() else (self.config_writer.path,)
+        for path in self.watcher.changed(skip):
+            if path == self.config_writer.path:
+                if self.watcher.stamp(path) == self.config_writer.written_stamp:
+                    continue  # Our own save
+                if self.reload_plugin_config():
+                    reloaded.append("config.json")
+            elif path == self.catalog.lang_dir:
+                reloaded.extend(self._rescan_languages())
+            else:
+                locale = os.path.basename(path)[:-5]
+                if self.catalog.path(locale) is None:
+                    # A file skipped as invalid was edited; read it again.
+                    reloaded.extend(self._rescan_languages())
+                    continue
+                try:
+                    self.catalog.reload(locale)
+                except (OSError, ValueError) as e:
+                    self.logger.error(f"Failed to reload {path}: {e}")
+                    continue
+                reloaded.append(os.path.basename(path))
+        if reloaded:
+            self.logger.info(f"Reloaded {', '.join(reloaded)}.")
+        return reloaded
+
+    def _rescan_languages(self) -> list[str]:
+        """
+        Start or stop watching locale files added to or removed from the
+        language directory. Added files that cannot be read are logged and
+        left out, but still watched so fixing them picks them up.
+        """
+        old = set(self.catalog.locales)
+        errors = self.catalog.rescan()
+        new = set(self.catalog.locales)
+        for locale in new - old:
+            self.watcher.watch(self.catalog.path(locale))
+        for locale in old - new:
+            self.watcher.unwatch(os.path.join(self.catalog.lang_dir, locale + ".json"))
+        valid = {self.catalog.path(locale) for locale in new}
+        for path in self._invalid_lang_files - errors.keys() - valid:
+            self.watcher.unwatch(path)
+        for path, error in errors.items():
+            self.logger.error(f"Skipped {path}: {error}")
+            self.watcher.watch(path)
+        self._invalid_lang_files = set(errors)
+        return [locale + ".json" for locale in sorted(old ^ new)]
+
+    def reload_plugin_config(self) -> bool:
+        """
+        Apply config.json as it is on disk. Pending requests are kept. Block
+        and auto-accept settings are diffed against the last saved version,
+        so only what was edited in the file changes and settings changed in
+        game since the last save are kept.
+        """
+        try:
+            with open(self.config_writer.path, "r") as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Failed to reload {self.config_writer.path}: {e}")
+            return False
+
+        for key in RESTART_KEYS:
+            if config.get(key) != self.plugin_config.get(key):
+                self.logger.warning(f"{key} changed in config.json; restart the server to apply it.")
+
+        if self.storage == "json":
+            new_policy = {key: config.get(key, {} if key == "blocks" else []) for key in POLICY_KEYS}
+            changes = self.tpa_policy.apply_config_diff(self._policy_baseline, new_policy)
+            self._policy_baseline = new_policy
+            if changes:
+                self.logger.info(f"Applied {changes} block and auto-accept changes from config.json.")
+            # The policy sections of plugin_config are refreshed from memory on every save.
+
+        self.plugin_config = config
+        self._apply_settings()
+        return True
+
+    def _apply_settings(self) -> None:
+        """Push the current settings to the running components."""
+        config = self.plugin_config
+        self.tpa_requests.max_outgoing = config.get("max-outgoing-requests", 5)
+        self.tpa_requests.max_incoming = config.get("max-pending-per-target", 10)
+        self.tpa_requests.max_batch = config.get("max-batch-requests", 100)
+        self.rate_limiter.configure(config.get("rate-limit-burst", 3), config.get("rate-limit-per-minute", 6))
+        self._enable_metrics(config.get("metrics-enabled", False))
+        self.teleports.per_tick = config.get("teleports-per-tick", 5)
+        if self.storage == "shared":
+            self.shared.servers = config.get("shared-servers", {})
+        self._schedule_tasks()
+
+    def _schedule_tasks(self) -> None:
+        config = self.plugin_config
+        self._schedule("save", self.save_config_changes, config.get("save-interval", 100))
+        self._schedule("reload-check", self.check_for_changes, config.get("reload-check-interval", 40))
+        if self.storage == "shared":
+            self._schedule("shared-poll", self.shared.poll, config.get("shared-poll-interval", 2))
+        dump_interval = config.get("metrics-dump-interval", 0) if self.metrics.enabled else 0
+        self._schedule("metrics-dump", self.dump_metrics, dump_interval)
+
+    def _schedule(self, name: str, task, interval: int) -> None:
+        """Run ``task`` every ``interval`` ticks, rescheduling it if the interval changed. 0 stops it."""
+        scheduled = self._tasks.get(name)
+        if scheduled is not None:
+            if scheduled[1] == interval:
+                return
+            scheduled[0].cancel()
+            del self._tasks[name]
+        if interval > 0:
+            self._tasks[name] = (self.server.scheduler.run_task(self, task, delay=interval, period=interval), interval)
 
     def on_enable(self) -> None:
         self.logger.info("TPA plugin enabled.")
-        self.handlers = preloaded_handlers
+        self.players = PlayerIndex()
+        self.positions = SpatialIndex()
+        for player in self.server.online_players:
+            self.players.add(player)
+            self.positions.update(player.unique_id, player.location)
+        self.teleports = TeleportDispatcher(self, self.plugin_config.get("teleports-per-tick", 5))
+        self.forms = RequestForms(self)
+        self.api = TpaApi(self)
+        self.shared.start(self.players)
         self.register_events(self)
         self.server.scheduler.run_task(self, self.cleanup_expired_requests, delay=20, period=20)
+        self.server.scheduler.run_task(self, self.teleports.tick, delay=1, period=1)
+        # name -> (task, interval) for the tasks whose interval is configurable
+        self._tasks = {}
+        self._schedule_tasks()
+
+    def _enable_metrics(self, enabled: bool) -> None:
+        if enabled and isinstance(self.metrics, DisabledMetrics):
+            from .metrics import Metrics
+
+            self.metrics = Metrics()
+        # Disabling keeps what was recorded so far.
+        self.metrics.enabled = enabled
+        self._update_instrumentation()
+
+    def _update_instrumentation(self) -> None:
+        # Checked first by every instrumented entry point, so timing,
+        # profiling and tracing cost nothing while all are off.
+        self.instrumented = self.metrics.enabled or self.profiler is not None or self.tracer is not None
+
+    def _run_instrumented(self, name: str, is_task: bool, func, *args):
+        """Run a command handler or task under the profiler and/or metrics."""
+        start = time.perf_counter()
+        try:
+            if self.profiler is not None and (is_task or name not in UNPROFILED_COMMANDS):
+                return self.profiler.run(f"task {name}" if is_task else f"/{name}", func, *args)
+            return func(*args)
+        finally:
+            if self.metrics.enabled:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if is_task:
+                    self.metrics.observe_task(name, elapsed_ms)
+                else:
+                    self.metrics.observe_command(name, elapsed_ms)
+
+    def start_profiling(self, mode: str, seconds: int) -> None:
+        from .profiling import Profiler
+
+        profiler = Profiler(self.data_folder)
+        profiler.start(mode, seconds)
+        self.profiler = profiler
+        self._update_instrumentation()
+        self._schedule("profile-check", self._check_profiling, 20)
+
+    def stop_profiling(self) -> str:
+        """Stop profiling and return the directory the results were written to."""
+        self._schedule("profile-check", self._check_profiling, 0)
+        profiler, self.profiler = self.profiler, None
+        try:
+            return profiler.stop()
+        finally:
+            self._update_instrumentation()
+
+    def _check_profiling(self) -> None:
+        if self.profiler is not None and time.monotonic() >= self.profiler.deadline:
+            path = self.stop_profiling()
+            self.logger.info(f"Profiling finished; results written to {path}.")
+
+    def start_tracing(self) -> str:
+        """Start recording a trace. Returns the path of the trace file."""
+        from .tracing import TraceRecorder
+
+        settings = {key: value for key, value in self.plugin_config.items() if key not in POLICY_KEYS}
+        tracer = TraceRecorder(self.data_folder)
+        path = tracer.start(list(self.players), settings, self.tpa_policy)
+        self.tracer = tracer
+        self._update_instrumentation()
+        self._schedule("trace-tick", tracer.tick, 1)
+        return path
+
+    def stop_tracing(self) -> str:
+        """Stop recording and return the path of the trace file."""
+        tracer, self.tracer = self.tracer, None
+        self._schedule("trace-tick", tracer.tick, 0)
+        try:
+            return tracer.stop()
+        finally:
+            self._update_instrumentation()
 
     def cleanup_expired_requests(self):
-        current_time = time.time()
-        timeout = self.plugin_config.get("request-timeout", 60)
-        # Iterate over a copy of the items to allow modification during iteration
-        for target_uuid, requests in list(self.tpa_requests.items()):
-            for requester_uuid, (timestamp, _) in list(requests.items()):
-                if current_time - timestamp > timeout:
-                    # Remove the specific expired request
-                    requests.pop(requester_uuid)
-                    
-                    # Notify players if they are online
-                    target = self.server.get_player(target_uuid)
-                    requester = self.server.get_player(requester_uuid)
-                    if target and requester:
-                        self._(requester, "tpa.requester_expired", target.name)
-
-            # If a target has no more pending requests, remove the entry
-            if not requests:
-                self.tpa_requests.pop(target_uuid)
+        if not self.instrumented:
+            self._cleanup_expired_requests()
+            return
+        self._run_instrumented("cleanup", True, self._cleanup_expired_requests)
+
+    def _cleanup_expired_requests(self):
+        expired = self.tpa_requests.pop_expired()
+        for request in expired:
+            # Notify players if they are online
+            target = self.players.get(request.target_uuid)
+            requester = self.players.get(request.requester_uuid)
+            if target and requester:
+                self._(requester, "tpa.requester_expired", target.name)
+            elif target:
+                self.shared.notify(request.requester_uuid, "tpa.requester_expired", target.name)
+
+        if expired:
+            self.metrics.incr("expired", len(expired))
+            self.api.emit_all(expired, RequestState.EXPIRED)
+
+    def save_config_changes(self):
+        if not self.instrumented:
+            self._save_changes()
+            return
+        self._run_instrumented("config_save", True, self._save_changes)
+
+    def _save_changes(self):
+        self.config_writer.tick()
+        self.tpa_policy.save()
+
+    def metrics_gauges(self) -> dict:
+        writer = self.config_writer.stats()
+        return {
+            "pending_requests": len(self.tpa_requests),
+            "queued_teleports": len(self.teleports),
+            "online_players": len(self.players),
+            "cached_policies": len(self.tpa_policy),
+            "config_flushes": writer["flush_count"],
+            "config_flush_last_ms": writer["last_flush_ms"],
+            "config_flush_max_ms": writer["max_flush_ms"],
+            **self.shared.stats(),
+        }
+
+    def dump_metrics(self):
+        fmt = self.plugin_config.get("metrics-dump-format", "json")
+        file_name = "metrics.prom" if fmt == "prometheus" else "metrics.json"
+        self.metrics.dump(os.path.join(self.data_folder, file_name), self.metrics_gauges(), fmt)
+
+    @event_handler
+    def on_player_join(self, event: PlayerJoinEvent):
+        self.players.add(event.player)
+        self.positions.update(event.player.unique_id, event.player.location)
+        self.tpa_policy.load_player(event.player.unique_id)
+        self.shared.player_joined(event.player)
+        if self.tracer is not None:
+            self.tracer.join(event.player)
+
+    @event_handler(priority=EventPriority.MONITOR, ignore_cancelled=True)
+    def on_player_move(self, event: PlayerMoveEvent):
+        self.positions.update(event.player.unique_id, event.to_location)
+
+    @event_handler(priority=EventPriority.MONITOR, ignore_cancelled=True)
+    def on_player_teleport(self, event: PlayerTeleportEvent):
+        self.positions.update(event.player.unique_id, event.to_location)
+
+    @event_handler
+    def on_player_quit(self, event: PlayerQuitEvent):
+        player = event.player
+        self.players.remove(player)
+        self.positions.remove(player.unique_id)
+        incoming, outgoing = self.tpa_requests.remove_player(player.unique_id)
+        for request in incoming:
+            requester = self.players.get(request.requester_uuid)
+            if requester:
+                self._(requester, "tpa.target_left", player.name)
+            else:
+                self.shared.notify(request.requester_uuid, "tpa.target_left", player.name)
+        for request in outgoing:
+            target = self.players.get(request.target_uuid)
+            if target:
+                self._(target, "tpa.requester_left", player.name)
+        if incoming or outgoing:
+            self.metrics.incr("purged", len(incoming) + len(outgoing))
+            self.api.emit_all(incoming + outgoing, RequestState.CANCELLED)
+
+        self.tpa_policy.unload_player(player.unique_id)
+        self.rate_limiter.forget(player.unique_id)
+        self.shared.player_left(player)
+        if self.tracer is not None:
+            self.tracer.quit(player)
 
     def on_disable(self) -> None:
+        if self.profiler is not None:
+            self.logger.info(f"Profiling stopped; results written to {self.stop_profiling()}.")
+        if self.tracer is not None:
+            self.logger.info(f"Tracing stopped; trace written to {self.stop_tracing()}.")
+        self.api.close()
+        self.config_writer.close()
+        if self.storage == "shared":
+            # Also closes the policy store, which shares its connection.
+            self.shared.close()
+        else:
+            self.tpa_policy.close()
         self.logger.info("TPA plugin disabled.")
 
     def on_command(self, sender: CommandSender, command: Command, args: list[str]) -> bool:
-        if command.name in self.handlers:
-            handler = self.handlers[command.name]
+        handler = get_handler(command.name)
+        if handler is None:
+            return False
+        if not self.instrumented:
             return handler(self, sender, args)
-        return False
+        if self.tracer is not None:
+            self.tracer.command(sender, command.name, args)
+        return self._run_instrumented(command.name, False, handler, self, sender, args)
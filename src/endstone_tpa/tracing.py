@@ -0,0 +1,196 @@
+import json
+import os
+import time
+from typing import IO, Dict, Iterator, List, Optional, Set
+from uuid import UUID
+
+from endstone import Player
+
+from .policy import PlayerPolicy
+
+VERSION = 1
+# Idle ticks are written as one line per this many ticks.
+TICK_GROUP = 20
+# Player id of the console and other senders that are not players
+CONSOLE = "-"
+# json.dumps() builds a new encoder for every call with non-default options.
+_encode_args = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+class TraceRecorder:
+    """
+    Records what drives the plugin to a line-oriented trace file, so the
+    traffic of a live server can be replayed with ``benchmarks/replay.py``.
+
+    Every line is one event, with tab-separated fields that start with its
+    kind and the milliseconds since the recording started::
+
+        J  ms  id  locale  dimension  x  y  z  name     player joined
+        P  ms  id  all-block  auto-accept  blocked-ids  settings of a player who joined
+        Q  ms  id                                       player left
+        C  ms  id  command  args  [dimension  x  y  z]  command, args as a JSON list
+        F  ms  id  requester-id  button  requester-name request form answered
+        T  ms  ticks                                    server ticks since the last T line
+
+    Players are numbered in the order they first appear and keep their
+    number when they rejoin. The first time a player with block or
+    auto-accept settings joins, a P line follows with those settings;
+    ``blocked-ids`` is a comma-separated list of player numbers. Later
+    changes are replayed from the commands that made them. Commands from
+    players carry where the player stood. Lines starting with ``#`` hold
+    the format version and the plugin settings in force. Player movement
+    between commands is not recorded.
+
+    The plugin only keeps a recorder, and imports this module, while a
+    trace is being recorded.
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.active = False
+        self.path: Optional[str] = None
+        self.lines = 0
+        self._file: Optional[IO[str]] = None
+        self._started = 0.0
+        self._ids: Dict[UUID, int] = {}
+        self._last_id = 0
+        self._policies = None
+        # Players whose P line was written, or who had no settings when first seen
+        self._described: Set[int] = set()
+        self._ticks = 0
+
+    def start(self, players: List[Player], settings: dict, policies) -> str:
+        """
+        Start a new trace with the ``players`` online, the plugin
+        ``settings`` and the ``policies`` PolicyStore. Returns its path.
+        """
+        self._policies = policies
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, time.strftime("trace-%Y%m%d-%H%M%S"))
+        self.path = base + ".log"
+        n = 1
+        while True:
+            try:
+                # Traces started within the same second get numbered names.
+                self._file = open(self.path, "x", encoding="utf-8")
+                break
+            except FileExistsError:
+                n += 1
+                self.path = f"{base}-{n}.log"
+        self._started = time.monotonic()
+        self._ids = {}
+        self._last_id = 0
+        self._described = set()
+        self._ticks = 0
+        self.lines = 0
+        self._file.write(f"# tpa-trace {VERSION} {time.strftime('%Y-%m-%dT%H:%M:%S')}\n")
+        self._file.write(f"# config {json.dumps(settings, separators=(',', ':'))}\n")
+        self.active = True
+        for player in players:
+            self.join(player)
+        return self.path
+
+    def stop(self) -> str:
+        """Finish the trace. Returns its path."""
+        self.active = False
+        self._write_ticks()
+        self._file.close()
+        self._file = None
+        self._ids = {}
+        self._described = set()
+        self._policies = None
+        return self.path
+
+    def join(self, player: Player) -> None:
+        player_id = self._id(player.unique_id)
+        self._write("J", player_id, player.locale, _position(player.location), player.name)
+        if player_id not in self._described:
+            self._described.add(player_id)
+            policy = self._policies.get(player.unique_id)
+            if policy is not None and not policy.is_default():
+                self._write_policy(player_id, policy)
+
+    def quit(self, player: Player) -> None:
+        player_id = self._ids.get(player.unique_id)
+        if player_id is not None:
+            self._write("Q", player_id)
+
+    def command(self, sender, name: str, args: List[str]) -> None:
+        if isinstance(sender, Player):
+            self._write("C", self._id(sender.unique_id), name, _encode_args(args), _position(sender.location))
+        else:
+            self._write("C", CONSOLE, name, _encode_args(args))
+
+    def form(self, player: Player, requester_uuid: UUID, requester_name: str, button: int) -> None:
+        self._write("F", self._id(player.unique_id), self._id(requester_uuid), button, requester_name)
+
+    def tick(self) -> None:
+        """Scheduled every tick while recording."""
+        self._ticks += 1
+        if self._ticks >= TICK_GROUP:
+            self._write_ticks()
+            # Also bounds what a crash would lose.
+            self._file.flush()
+
+    def _write_policy(self, player_id: int, policy: PlayerPolicy) -> None:
+        blocked = ",".join(str(self._id(UUID(int=blocked))) for blocked in sorted(policy.blocked))
+        self._write("P", player_id, int(policy.all_block), int(policy.auto_accept), blocked)
+
+    def _id(self, unique_id: UUID) -> int:
+        player_id = self._ids.get(unique_id)
+        if player_id is None:
+            self._last_id += 1
+            player_id = self._ids[unique_id] = self._last_id
+        return player_id
+
+    def _write(self, kind: str, *fields) -> None:
+        self._write_ticks()
+        self._write_line(kind, fields)
+
+    def _write_ticks(self) -> None:
+        if self._ticks:
+            ticks, self._ticks = self._ticks, 0
+            self._write_line("T", (ticks,))
+
+    def _write_line(self, kind: str, fields) -> None:
+        elapsed_ms = int((time.monotonic() - self._started) * 1000)
+        self._file.write("\t".join((kind, str(elapsed_ms), *map(str, fields))) + "\n")
+        self.lines += 1
+
+
+def _position(location) -> str:
+    return f"{location.dimension.name}\t{location.x:.1f}\t{location.y:.1f}\t{location.z:.1f}"
+
+
+class TraceEvent:
+    """One line of a trace, as read by ``read_trace``."""
+
+    __slots__ = ("kind", "ms", "fields", "line")
+
+    def __init__(self, kind: str, ms: int, fields: List[str], line: int):
+        self.kind = kind
+        self.ms = ms
+        self.fields = fields
+        self.line = line
+
+
+def read_trace(path: str, header: Optional[dict] = None) -> Iterator[TraceEvent]:
+    """
+    Yield the events of a trace file in order. If given, ``header`` is
+    filled in with the ``version`` and ``config`` of the trace as they are read.
+    """
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            if line.startswith("#"):
+                if header is not None:
+                    name, _, value = line[1:].strip().partition(" ")
+                    if name == "tpa-trace":
+                        header["version"] = int(value.split()[0])
+                    elif name == "config":
+                        header["config"] = json.loads(value)
+                continue
+            kind, ms, *fields = line.split("\t")
+            yield TraceEvent(kind, int(ms), fields, number)
@@ -1,38 +1,133 @@
-import random
-import time
+from enum import Enum
+from typing import Dict, List, Tuple
+from uuid import UUID
+
 from endstone import Player
-from endstone.form import MessageForm
 
-def get_target_player(sender: Player, name_or_selector: str) -> Player | None:
+from .policy import PolicyDecision
+from .request_store import Request, RequestState, RequestType
+from .selectors import Selector, split_targets
+from .shared_state import RemotePlayer
+
+def get_target_player(plugin, sender: Player, name_or_selector: str) -> Player | None:
     """
-    Gets a single player target from a name or a target selector (@r).
-    Selectors @s and @p are disallowed as they can resolve to the sender.
+    Gets a single player target from a name, an unambiguous name prefix or a
+    target selector that picks one player (@p, @r, @a[c=1], with optional
+    arguments; see ``selectors.Selector``). Selectors never pick the sender,
+    and @s is disallowed.
     """
-    server = sender.server
-
     if not name_or_selector.startswith("@"):
-        return server.get_player(name_or_selector)
-
-    selector = name_or_selector.lower()
+        return plugin.players.find(name_or_selector)
 
-    if selector == "@s" or selector == "@p":
-        # Disallowed for TPA commands as they can resolve to the sender.
+    selector = Selector.parse(name_or_selector)
+    if selector is None or not selector.single:
+        # @s, @e, @a, or an invalid selector.
+        # The command handler will issue the "player not found" message.
         return None
+    players = selector.select(plugin, sender)
+    return players[0] if players else None
 
-    # Exclude self from potential targets for @r
-    online_players = [p for p in server.online_players if p.unique_id != sender.unique_id]
+class SendResult(Enum):
+    SENT = "sent"
+    SELF = "self"
+    BLOCKED = "blocked"
+    ALL_BLOCKED = "all_blocked"
+    AUTO_ACCEPTED = "auto_accepted"
+    TOO_MANY_OUTGOING = "too_many_outgoing"
+    SERVER_BUSY = "server_busy"
+    # Auto-accepted, but the requester on another server is no longer online anywhere
+    REQUESTER_LEFT = "requester_left"
 
-    if not online_players:
-        return None
 
-    if selector == "@r":
-        return random.choice(online_players)
+def get_target_players(plugin, sender: Player, names: str) -> Tuple[List[Player], List[str]]:
+    """
+    Gets every player named in a space or comma separated list of names,
+    name prefixes and selectors (@a, @p, @r, with optional arguments such as
+    @a[r=50]). The sender and duplicates are left out. Returns the players
+    and the names that matched nobody; a selector that matches nobody counts
+    as found.
+    """
+    players: Dict[UUID, Player] = {}
+    missing = []
+    for name in split_targets(names):
+        if name.startswith("@"):
+            selector = Selector.parse(name)
+            if selector is None:
+                missing.append(name)
+                continue
+            for player in selector.select(plugin, sender):
+                players.setdefault(player.unique_id, player)
+            continue
+        player = plugin.players.find(name)
+        if player is None:
+            missing.append(name)
+        elif player.unique_id != sender.unique_id:
+            players.setdefault(player.unique_id, player)
+    return list(players.values()), missing
 
-    # For other selectors like @a, @e, or invalid ones, return None
-    # The command handler will issue the "player not found" message.
-    return None
 
-def handle_tpa_request(plugin, sender: Player, target: Player, request_type: str):
+def send_request(
+    plugin,
+    sender: Player | RemotePlayer,
+    target: Player,
+    request_type: RequestType,
+    timeout: float,
+    batch: bool = False,
+) -> SendResult:
+    """
+    Checks and stores one request and sends the target its prompt. Only
+    the target is notified; the caller tells the sender how it went. The
+    sender may be on another server. ``batch`` requests count towards
+    ``max-batch-requests`` instead of ``max-outgoing-requests``.
+    """
+    if sender == target:
+        return SendResult.SELF
+
+    decision = plugin.tpa_policy.check(sender.unique_id, target.unique_id)
+
+    if decision is PolicyDecision.BLOCKED:
+        return SendResult.BLOCKED
+
+    if decision is PolicyDecision.ALL_BLOCKED:
+        return SendResult.ALL_BLOCKED
+
+    if decision is PolicyDecision.AUTO_ACCEPT:
+        request = Request(target.unique_id.int, sender.unique_id.int, 0.0, request_type)
+        if isinstance(sender, RemotePlayer):
+            if not plugin.shared.accept(target, request):
+                plugin.api.emit(request, RequestState.CANCELLED)
+                return SendResult.REQUESTER_LEFT
+        else:
+            plugin.teleports.submit(sender.unique_id, target.unique_id, request_type, auto=True)
+        plugin.metrics.incr("auto_accepted")
+        plugin.api.emit(request, RequestState.ACCEPTED)
+        return SendResult.AUTO_ACCEPTED
+
+    requests = plugin.tpa_requests
+    if not requests.can_add(target.unique_id, sender.unique_id, batch):
+        return SendResult.TOO_MANY_OUTGOING
+
+    replaced = requests.get(target.unique_id, sender.unique_id)
+    if replaced is None and len(requests) >= plugin.plugin_config.get("max-pending-requests", 10000):
+        return SendResult.SERVER_BUSY
+
+    evicted_request = requests.add(target.unique_id, sender.unique_id, request_type, timeout, batch)
+    if replaced is not None:
+        plugin.api.emit(replaced, RequestState.CANCELLED)
+    if evicted_request is not None:
+        evicted = plugin.players.get(evicted_request.requester_uuid)
+        if evicted:
+            plugin._(evicted, "tpa.request_dropped", target.name)
+        else:
+            plugin.shared.notify(evicted_request.requester_uuid, "tpa.request_dropped", target.name)
+        plugin.api.emit(evicted_request, RequestState.CANCELLED)
+    plugin.metrics.incr("sent")
+    plugin.api.emit(requests.get(target.unique_id, sender.unique_id), RequestState.PENDING)
+    plugin.forms.send(target, sender, request_type, timeout)
+    return SendResult.SENT
+
+
+def handle_tpa_request(plugin, sender: Player, target: Player, request_type: RequestType):
     """
     Handles the logic for sending a TPA request (/tpa or /tpthere).
     """
@@ -40,49 +135,175 @@ def handle_tpa_request(plugin, sender: Player, target: Player, request_type: str
         plugin._(sender, "tpa.cannot_request_self")
         return
 
-    if sender.unique_id in plugin.tpa_blocks.get(target.unique_id, []):
-        plugin._(sender, "tpa.target_blocking_you", target.name)
+    wait = plugin.rate_limiter.try_acquire(sender.unique_id)
+    if wait:
+        plugin._(sender, "tpa.rate_limited", int(wait) + 1)
         return
 
-    if target.unique_id in plugin.tpa_all_blocks:
+    timeout = plugin.plugin_config.get("request-timeout", 60)
+    result = send_request(plugin, sender, target, request_type, timeout)
+    message = result_message(plugin, target, result)
+    if message is not None:
+        plugin._(sender, *message)
+
+
+def result_message(plugin, target: Player, result: SendResult) -> tuple | None:
+    """
+    The message key and arguments that tell the sender how a request went.
+    """
+    if result is SendResult.SENT:
+        return "tpa.request_sent", target.name
+    if result is SendResult.BLOCKED:
+        return "tpa.target_blocking_you", target.name
+    if result is SendResult.ALL_BLOCKED:
+        return "tpa.target_blocking_all", target.name
+    if result is SendResult.TOO_MANY_OUTGOING:
+        return "tpa.too_many_outgoing", plugin.tpa_requests.max_outgoing
+    if result is SendResult.SERVER_BUSY:
+        return ("tpa.server_busy",)
+    return None
+
+
+def handle_remote_request(plugin, sender: Player, target: RemotePlayer, request_type: RequestType):
+    """
+    Sends a request to a player on another server. That server stores it
+    and runs the checks that depend on its own state; the sender hears back
+    from it only if the request could not be delivered.
+    """
+    wait = plugin.rate_limiter.try_acquire(sender.unique_id)
+    if wait:
+        plugin._(sender, "tpa.rate_limited", int(wait) + 1)
+        return
+
+    # Settings are shared, so blocks can be reported right away.
+    decision = plugin.tpa_policy.check(sender.unique_id, target.unique_id)
+    if decision is PolicyDecision.BLOCKED:
+        plugin._(sender, "tpa.target_blocking_you", target.name)
+        return
+    if decision is PolicyDecision.ALL_BLOCKED:
         plugin._(sender, "tpa.target_blocking_all", target.name)
         return
 
-    if target.unique_id in plugin.tpa_auto_accept:
-        if request_type == "tpa":
-            sender.teleport(target.location)
-            plugin._(sender, "tpa.sender_accepted", target.name)
-            plugin._(target, "tpa.request_accepted", sender.name)
-        elif request_type == "tpthere":
-            target.teleport(sender.location)
-            plugin._(target, "tpthere.sender_accepted", sender.name)
-            plugin._(sender, "tpthere.request_accepted", target.name)
+    plugin.shared.send_request(sender, target, request_type, plugin.plugin_config.get("request-timeout", 60))
+    plugin.metrics.incr("sent")
+    plugin._(sender, "tpa.request_sent_remote", target.name, target.server)
+
+
+def handle_tpa_requests(plugin, sender: Player, targets: List[Player], request_type: RequestType):
+    """
+    Sends one request to each of ``targets`` as a single command: the batch
+    takes one rate-limit token and the sender gets one summary instead of a
+    message per target. The requests count towards ``max-batch-requests``
+    rather than ``max-outgoing-requests``, so an event host can ask
+    everyone at once and still send single requests.
+    """
+    wait = plugin.rate_limiter.try_acquire(sender.unique_id)
+    if wait:
+        plugin._(sender, "tpa.rate_limited", int(wait) + 1)
         return
 
-    if target.unique_id not in plugin.tpa_requests:
-        plugin.tpa_requests[target.unique_id] = {}
-    plugin.tpa_requests[target.unique_id][sender.unique_id] = (time.time(), request_type)
-    plugin._(sender, "tpa.request_sent", target.name)
-
-    def on_form_submit(target_player: Player, data: int):
-        if data == 0:  # Accept
-            plugin.server.dispatch_command(target_player, f'tpaccept "{sender.name}"')
-        else:  # Deny
-            plugin.server.dispatch_command(target_player, f'tpdeny "{sender.name}"')
-
-    content_key = f"tpa.form.content.{request_type}"
-    fallback_content_key = f"{request_type}.request_received"
-
-    form = MessageForm(
-        title=plugin._(target, "tpa.form.title", return_string=True),
-        content=plugin._(target, content_key, sender.name, return_string=True),
-        button1=plugin._(target, "tpa.form.accept", return_string=True),
-        button2=plugin._(target, "tpa.form.deny", return_string=True),
-    )
-    
-    plugin._(target, fallback_content_key, sender.name)
     timeout = plugin.plugin_config.get("request-timeout", 60)
-    plugin._(target, "tpa.request_helper", sender.name, timeout)
-    
-    form.on_submit = on_form_submit
-    target.send_form(form)
+    sent = []
+    auto_accepted = []
+    blocked = []
+    limited = []
+    for target in targets:
+        result = send_request(plugin, sender, target, request_type, timeout, batch=True)
+        if result is SendResult.SENT:
+            sent.append(target.name)
+        elif result is SendResult.AUTO_ACCEPTED:
+            auto_accepted.append(target.name)
+        elif result is SendResult.BLOCKED or result is SendResult.ALL_BLOCKED:
+            blocked.append(target.name)
+        elif result is SendResult.TOO_MANY_OUTGOING or result is SendResult.SERVER_BUSY:
+            limited.append(target.name)
+
+    if sent:
+        plugin._(sender, "tpa.batch_sent", len(sent), ", ".join(sent))
+    if auto_accepted:
+        plugin._(sender, "tpa.batch_auto_accepted", len(auto_accepted), ", ".join(auto_accepted))
+    if blocked:
+        plugin._(sender, "tpa.batch_blocked", len(blocked), ", ".join(blocked))
+    if limited:
+        plugin._(sender, "tpa.batch_limited", len(limited), ", ".join(limited))
+
+
+def accept_request(plugin, player: Player, request: Request, quiet: bool = False) -> bool:
+    """
+    Accepts a pending request sent to ``player`` and queues the teleport.
+    With ``quiet`` only the requester is told; bulk accepts send ``player``
+    a summary instead. Returns whether a teleport was queued.
+    """
+    plugin.tpa_requests.remove(request)
+    requester = plugin.players.get(request.requester_uuid)
+
+    if plugin.tpa_requests.is_expired(request):
+        if not quiet:
+            plugin._(player, "tpa.request_expired")
+        if requester:
+            plugin._(requester, "tpa.requester_expired", player.name)
+        else:
+            plugin.shared.notify(request.requester_uuid, "tpa.requester_expired", player.name)
+        plugin.api.emit(request, RequestState.EXPIRED)
+        return False
+
+    if not requester:
+        if plugin.shared.accept(player, request):
+            plugin.metrics.incr("accepted")
+            plugin.api.emit(request, RequestState.ACCEPTED)
+            return True
+        if not quiet:
+            plugin._(player, "tpa.requester_not_online")
+        plugin.api.emit(request, RequestState.CANCELLED)
+        return False
+
+    plugin.metrics.incr("accepted")
+    plugin.teleports.submit(requester.unique_id, player.unique_id, request.type, quiet=quiet)
+    plugin.api.emit(request, RequestState.ACCEPTED)
+    return True
+
+
+def deny_request(plugin, player: Player, request: Request, requester_name: str | None = None, quiet: bool = False):
+    """
+    Denies a pending request sent to ``player``. With ``quiet`` only the
+    requester is told.
+    """
+    plugin.tpa_requests.remove(request)
+    plugin.metrics.incr("denied")
+    plugin.api.emit(request, RequestState.DENIED)
+    requester = plugin.players.get(request.requester_uuid) or plugin.shared.get(request.requester_uuid)
+
+    if not quiet:
+        # Determine the requester's name for the message
+        if requester_name is None and requester is not None:
+            requester_name = requester.name
+        elif requester_name is None:
+            requester_name = "Someone" # Fallback
+
+        plugin._(player, "tpa.request_denied", requester_name)
+    if isinstance(requester, RemotePlayer):
+        plugin.shared.notify(requester.unique_id, "tpa.sender_denied", player.name)
+    elif requester:
+        plugin._(requester, "tpa.sender_denied", player.name)
+
+
+def accept_all_requests(plugin, player: Player):
+    """
+    Accepts every pending request sent to ``player`` and sends one summary.
+    """
+    # Copied, since accepting removes the requests from the store.
+    pending = list(plugin.tpa_requests.incoming(player.unique_id))
+    accepted = sum(accept_request(plugin, player, request, quiet=True) for request in pending)
+    plugin._(player, "tpa.accepted_all", accepted)
+    if accepted < len(pending):
+        plugin._(player, "tpa.accepted_all_skipped", len(pending) - accepted)
+
+
+def deny_all_requests(plugin, player: Player):
+    """
+    Denies every pending request sent to ``player`` and sends one summary.
+    """
+    pending = list(plugin.tpa_requests.incoming(player.unique_id))
+    for request in pending:
+        deny_request(plugin, player, request, quiet=True)
+    plugin._(player, "tpa.denied_all", len(pending))
@@ -0,0 +1,48 @@
+import os
+from typing import Container, Dict, Iterable, List, Optional, Tuple
+
+# (modification time in ns, size), or None when the file does not exist
+Stamp = Optional[Tuple[int, int]]
+
+
+def file_stamp(path: str) -> Stamp:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class FileWatcher:
+    """
+    Notices changes to a set of files by comparing their modification time
+    and size. A check costs one ``stat`` per file and reads nothing.
+    Watching a directory notices files being added to or removed from it.
+    """
+
+    def __init__(self, paths: Iterable[str] = ()):
+        self._stamps: Dict[str, Stamp] = {}
+        for path in paths:
+            self.watch(path)
+
+    def watch(self, path: str) -> None:
+        self._stamps[path] = file_stamp(path)
+
+    def unwatch(self, path: str) -> None:
+        self._stamps.pop(path, None)
+
+    def stamp(self, path: str) -> Stamp:
+        """The stamp seen by the last check."""
+        return self._stamps.get(path)
+
+    def changed(self, skip: Container[str] = ()) -> List[str]:
+        """Paths that changed since the last check. Paths in ``skip`` are not checked this time."""
+        changed = []
+        for path, stamp in self._stamps.items():
+            if path in skip:
+                continue
+            current = file_stamp(path)
+            if current != stamp:
+                self._stamps[path] = current
+                changed.append(path)
+        return changed
@@ -0,0 +1,43 @@
+import threading
+from types import SimpleNamespace
+
+from endstone_tpa.api import RequestHandle
+from endstone_tpa.request_store import RequestState, RequestType
+
+
+class Logger:
+    def error(self, message):
+        raise AssertionError(message)
+
+
+def test_callbacks_added_from_other_threads_run_once():
+    for _ in range(50):
+        handle = RequestHandle(SimpleNamespace(), SimpleNamespace(), RequestType.TPA)
+        calls = []
+        start = threading.Barrier(5)
+
+        def add():
+            start.wait()
+            for _ in range(20):
+                handle.add_done_callback(calls.append)
+
+        threads = [threading.Thread(target=add) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        handle._resolve(RequestState.ACCEPTED, Logger())
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 80
+        assert handle._callbacks is None
+
+
+def test_callback_added_after_resolving_runs_right_away():
+    handle = RequestHandle(SimpleNamespace(), SimpleNamespace(), RequestType.TPA)
+    handle._resolve(RequestState.DENIED, Logger())
+    states = []
+
+    handle.add_done_callback(lambda h: states.append(h.state))
+
+    assert states == [RequestState.DENIED]
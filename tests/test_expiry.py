@@ -0,0 +1,84 @@
+from endstone_tpa.expiry import ExpiryQueue
+
+
+class Item:
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.live = True
+
+    def __lt__(self, other):
+        return self.deadline < other.deadline
+
+
+def is_live(item):
+    return item.live
+
+
+def test_pops_due_items_in_deadline_order():
+    queue = ExpiryQueue()
+    items = [Item(deadline) for deadline in (5, 1, 3, 2, 4)]
+    for item in items:
+        queue.push(item)
+
+    expired = queue.pop_expired(3.5, is_live)
+
+    assert [item.deadline for item in expired] == [1, 2, 3]
+    assert len(queue) == 2
+    assert [item.deadline for item in queue.pop_expired(10, is_live)] == [4, 5]
+    assert len(queue) == 0
+
+
+def test_deadline_is_exclusive():
+    queue = ExpiryQueue()
+    queue.push(Item(2))
+    assert queue.pop_expired(2, is_live) == []
+    assert len(queue.pop_expired(2.001, is_live)) == 1
+
+
+def test_discarded_items_are_skipped_when_due():
+    queue = ExpiryQueue()
+    items = [Item(deadline) for deadline in range(5)]
+    for item in items:
+        queue.push(item)
+    items[1].live = False
+    queue.discard()
+    items[3].live = False
+    queue.discard()
+
+    assert len(queue) == 3
+    assert [item.deadline for item in queue.pop_expired(10, is_live)] == [0, 2, 4]
+    assert len(queue) == 0
+    assert queue._stale == 0
+
+
+def test_compacts_once_stale_items_dominate():
+    queue = ExpiryQueue()
+    count = ExpiryQueue.COMPACT_MIN_STALE * 2
+    items = [Item(1000 + deadline) for deadline in range(count)]
+    for item in items:
+        queue.push(item)
+    # Stale entries that never come due are only dropped by compaction.
+    for item in items[: ExpiryQueue.COMPACT_MIN_STALE + 10]:
+        item.live = False
+        queue.discard()
+
+    assert queue.pop_expired(0, is_live) == []
+
+    assert queue._stale == 0
+    assert len(queue._heap) == count - ExpiryQueue.COMPACT_MIN_STALE - 10
+    assert len(queue) == len(queue._heap)
+    assert queue.pop_expired(5000, is_live) == items[ExpiryQueue.COMPACT_MIN_STALE + 10 :]
+
+
+def test_few_stale_items_are_left_in_place():
+    queue = ExpiryQueue()
+    items = [Item(1000 + deadline) for deadline in range(10)]
+    for item in items:
+        queue.push(item)
+    items[0].live = False
+    queue.discard()
+
+    queue.pop_expired(0, is_live)
+
+    assert len(queue._heap) == 10
+    assert len(queue) == 9
@@ -0,0 +1,68 @@
+import json
+import os
+
+import pytest
+
+from endstone_tpa import i18n
+from endstone_tpa.i18n import TranslationCatalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    with open(os.path.join(tmp_path, "en_US.json"), "w", encoding="utf-8") as f:
+        json.dump({"greeting": "Hello {0}", "plain": "Plain {{text}}", "bye": "Bye"}, f)
+    with open(os.path.join(tmp_path, "ko_KR.json"), "w", encoding="utf-8") as f:
+        json.dump({"greeting": "{0}님 안녕하세요"}, f)
+    return TranslationCatalog(str(tmp_path))
+
+
+def test_render_falls_back_to_en_us(catalog):
+    assert catalog.render("ko_KR", "greeting", ("Steve",)) == "Steve님 안녕하세요"
+    assert catalog.render("ko_KR", "bye", ()) == "Bye"
+    assert catalog.render("fr_FR", "greeting", ("Steve",)) == "Hello Steve"
+    assert catalog.render("en_US", "plain", ("x",)) == "Plain {text}"
+
+
+def test_unknown_keys_are_shown_as_is(catalog):
+    assert catalog.render("en_US", "no such key {0}", ("x",)) == "no such key x"
+    assert catalog.render("fr_FR", "no such key", ()) == "no such key"
+
+
+def test_unknown_keys_do_not_grow_the_tables(catalog, monkeypatch):
+    monkeypatch.setattr(i18n, "MAX_UNKNOWN", 4)
+    sizes = {locale: len(catalog.table(locale)) for locale in ("en_US", "ko_KR", "fr_FR")}
+
+    for n in range(100):
+        for locale in sizes:
+            assert catalog.render(locale, f"message {n}", ()) == f"message {n}"
+
+    assert {locale: len(catalog.table(locale)) for locale in sizes} == sizes
+    assert len(catalog._unknown) == 4
+
+
+def test_rescan_skips_files_that_cannot_be_read(catalog, tmp_path):
+    with open(os.path.join(tmp_path, "fr_FR.json"), "w", encoding="utf-8") as f:
+        json.dump({"greeting": "Bonjour {0}"}, f)
+    with open(os.path.join(tmp_path, "de_DE.json"), "w", encoding="utf-8") as f:
+        f.write('{"greeting": ')
+
+    errors = catalog.rescan()
+
+    assert list(errors) == [os.path.join(tmp_path, "de_DE.json")]
+    assert sorted(catalog.locales) == ["en_US", "fr_FR", "ko_KR"]
+    assert catalog.render("fr_FR", "greeting", ("Steve",)) == "Bonjour Steve"
+    assert catalog.render("de_DE", "greeting", ("Steve",)) == "Hello Steve"
+
+
+def test_failed_reload_keeps_the_old_entries(catalog, tmp_path):
+    assert catalog.render("ko_KR", "bye", ()) == "Bye"
+    for name in ("en_US.json", "ko_KR.json"):
+        with open(os.path.join(tmp_path, name), "w", encoding="utf-8") as f:
+            f.write("{")
+
+    for locale in ("ko_KR", "en_US"):
+        with pytest.raises(ValueError):
+            catalog.reload(locale)
+
+    assert catalog.render("ko_KR", "greeting", ("Steve",)) == "Steve님 안녕하세요"
+    assert catalog.render("en_US", "bye", ()) == "Bye"
@@ -0,0 +1,43 @@
+import json
+import os
+import threading
+
+from endstone_tpa.persistence import ConfigWriter
+from endstone_tpa.watcher import FileWatcher
+
+
+class Logger:
+    def error(self, message):
+        raise AssertionError(message)
+
+
+def test_own_saves_are_told_from_outside_edits(tmp_path):
+    path = os.path.join(tmp_path, "config.json")
+    data = {"n": 0}
+    writer = ConfigWriter(path, lambda: dict(data), Logger())
+    watcher = FileWatcher([path])
+    gate = threading.Event()
+
+    writer.mark_dirty()
+    writer.tick()
+    # Holds back every write queued after it.
+    writer._executor.submit(gate.wait)
+    writer._pending.exception()
+    # The save is on disk, but its stamp is only taken over on the server thread.
+    assert writer.written_stamp is None
+    assert writer.settle()
+    assert watcher.changed() == [path]
+    assert watcher.stamp(path) == writer.written_stamp
+
+    data["n"] = 1
+    writer.mark_dirty()
+    writer.tick()
+    # The watcher leaves the file alone until the running save is collected.
+    assert not writer.settle()
+    assert watcher.changed([path]) == []
+    gate.set()
+    writer.close()
+    assert watcher.changed() == [path]
+    assert watcher.stamp(path) == writer.written_stamp
+    with open(path) as f:
+        assert json.load(f) == {"n": 1}
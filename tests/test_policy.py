@@ -0,0 +1,79 @@
+from uuid import UUID
+
+from endstone_tpa.policy import PolicyDecision, PolicyStore
+
+A = UUID(int=1)
+B = UUID(int=2)
+C = UUID(int=3)
+
+
+def test_check():
+    store = PolicyStore()
+    assert store.check(A, B) is PolicyDecision.ALLOW
+
+    store.toggle_block(B, A)
+    assert store.check(A, B) is PolicyDecision.BLOCKED
+    assert store.check(C, B) is PolicyDecision.ALLOW
+
+    store.toggle_auto_accept(B)
+    assert store.check(C, B) is PolicyDecision.AUTO_ACCEPT
+    # A block wins over auto-accept.
+    assert store.check(A, B) is PolicyDecision.BLOCKED
+
+    store.toggle_all_block(B)
+    assert store.check(C, B) is PolicyDecision.ALL_BLOCKED
+    assert store.check(A, B) is PolicyDecision.BLOCKED
+
+
+def test_toggles_return_the_new_state_and_prune_defaults():
+    store = PolicyStore()
+
+    assert store.toggle_block(A, B) is True
+    assert store.is_blocked(A, B)
+    assert store.toggle_block(A, B) is False
+    assert not store.is_blocked(A, B)
+    assert len(store) == 0
+
+    assert store.toggle_all_block(A) is True
+    assert store.toggle_auto_accept(A) is True
+    assert len(store) == 1
+    assert store.toggle_all_block(A) is False
+    assert store.toggle_auto_accept(A) is False
+    assert len(store) == 0
+    assert store.get(A) is None
+
+
+def test_config_round_trip():
+    config = {
+        "blocks": {str(A): [str(B), str(C)], str(C): []},
+        "all_blocks": [str(B)],
+        "auto_accept": [str(A), str(C)],
+    }
+
+    store = PolicyStore.from_config(config)
+
+    assert store.check(B, A) is PolicyDecision.BLOCKED
+    assert store.check(A, B) is PolicyDecision.ALL_BLOCKED
+    assert store.check(A, C) is PolicyDecision.AUTO_ACCEPT
+    result = store.to_config()
+    assert {owner: sorted(blocked) for owner, blocked in result["blocks"].items()} == {str(A): sorted([str(B), str(C)])}
+    assert result["all_blocks"] == [str(B)]
+    assert sorted(result["auto_accept"]) == sorted([str(A), str(C)])
+    assert PolicyStore.from_config(result).to_config() == result
+
+
+def test_apply_config_diff_keeps_unsaved_changes():
+    old = {"blocks": {str(A): [str(B)]}, "all_blocks": [], "auto_accept": [str(A)]}
+    store = PolicyStore.from_config(old)
+    # Changed in game and not saved yet
+    store.toggle_all_block(C)
+
+    new = {"blocks": {str(A): [str(C)]}, "all_blocks": [str(B)], "auto_accept": []}
+    assert store.apply_config_diff(old, new) == 4
+
+    assert not store.is_blocked(A, B)
+    assert store.is_blocked(A, C)
+    assert store.check(A, B) is PolicyDecision.ALL_BLOCKED
+    assert store.check(B, C) is PolicyDecision.ALL_BLOCKED
+    assert store.check(B, A) is PolicyDecision.ALLOW
+    assert store.apply_config_diff(new, new) == 0
@@ -0,0 +1,45 @@
+import os
+import sys
+import tracemalloc
+
+from endstone_tpa.profiling import Profiler
+
+
+def test_runs_in_the_same_second_get_their_own_folder(tmp_path):
+    profiler = Profiler(str(tmp_path))
+    paths = []
+    for _ in range(3):
+        profiler.start("cpu", 30)
+        profiler.run("/tpa", sum, [1, 2])
+        paths.append(profiler.stop())
+
+    assert len(set(paths)) == 3
+    for path in paths:
+        assert os.path.exists(os.path.join(path, "summary.txt"))
+
+
+def test_memory_profile_leaves_outside_tracing_running(tmp_path):
+    profiler = Profiler(str(tmp_path))
+    tracemalloc.start()
+    try:
+        profiler.start("memory", 30)
+        profiler.run("/tpa", list, range(100))
+        profiler.stop()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+    profiler.start("memory", 30)
+    profiler.stop()
+    assert not tracemalloc.is_tracing()
+
+
+def test_sample_profile_restores_the_switch_interval(tmp_path):
+    interval = sys.getswitchinterval()
+    profiler = Profiler(str(tmp_path))
+    profiler.start("sample", 30)
+    assert sys.getswitchinterval() < interval
+    profiler.run("/tpa", sum, range(1000))
+    profiler.stop()
+
+    assert sys.getswitchinterval() == interval
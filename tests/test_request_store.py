@@ -0,0 +1,165 @@
+from uuid import UUID
+
+import pytest
+
+from endstone_tpa.request_store import Request, RequestStore, RequestType
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def player(n):
+    return UUID(int=n)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def store(clock):
+    return RequestStore(max_outgoing=2, max_incoming=3, max_batch=3, clock=clock)
+
+
+def test_indexes_by_target_and_requester(store):
+    store.add(player(1), player(10), RequestType.TPA, 60)
+    store.add(player(2), player(10), RequestType.TPTHERE, 60)
+    store.add(player(1), player(11), RequestType.TPA, 60)
+
+    assert len(store) == 3
+    assert [r.requester for r in store.incoming(player(1))] == [10, 11]
+    assert [r.target for r in store.outgoing(player(10))] == [1, 2]
+    assert store.get(player(2), player(10)).type is RequestType.TPTHERE
+    assert store.get(player(2), player(11)) is None
+
+
+def test_can_add_enforces_outgoing_limit(store):
+    store.add(player(1), player(10), RequestType.TPA, 60)
+    store.add(player(2), player(10), RequestType.TPA, 60)
+
+    assert not store.can_add(player(3), player(10))
+    # Re-sending to a target replaces the earlier request, so it is allowed.
+    assert store.can_add(player(1), player(10))
+    assert store.can_add(player(3), player(11))
+
+
+def test_batch_requests_have_their_own_limit(store):
+    for target in (1, 2, 3):
+        assert store.can_add(player(target), player(10), batch=True)
+        store.add(player(target), player(10), RequestType.TPTHERE, 60, batch=True)
+
+    assert not store.can_add(player(4), player(10), batch=True)
+    assert store.can_add(player(3), player(10), batch=True)
+    # The batch does not use up the single-request limit.
+    assert store.can_add(player(4), player(10))
+    store.add(player(4), player(10), RequestType.TPA, 60)
+    store.add(player(5), player(10), RequestType.TPA, 60)
+    assert not store.can_add(player(6), player(10))
+    # Turning a batch request into a single one needs room for a single one.
+    assert not store.can_add(player(1), player(10))
+
+    store.pop(player(1), player(10))
+    assert store.can_add(player(6), player(10), batch=True)
+    store.remove_player(player(10))
+    assert store._batch_counts == {}
+
+
+def test_resending_replaces_the_request(store, clock):
+    first = store.add(player(1), player(10), RequestType.TPA, 60)
+    old = store.get(player(1), player(10))
+    clock.now = 5
+    store.add(player(1), player(10), RequestType.TPTHERE, 60)
+
+    assert first is None
+    assert len(store) == 1
+    new = store.get(player(1), player(10))
+    assert new is not old
+    assert new.type is RequestType.TPTHERE
+    assert new.deadline == 65
+    # The replaced request must not expire later.
+    clock.now = 61
+    assert store.pop_expired() == []
+    clock.now = 66
+    assert store.pop_expired() == [new]
+
+
+def test_full_target_evicts_its_oldest_request(store):
+    for requester in (10, 11, 12):
+        store.add(player(1), player(requester), RequestType.TPA, 60)
+
+    evicted = store.add(player(1), player(13), RequestType.TPA, 60)
+
+    assert evicted.requester == 10
+    assert [r.requester for r in store.incoming(player(1))] == [11, 12, 13]
+    assert list(store.outgoing(player(10))) == []
+    assert len(store) == 3
+
+
+def test_remove_player_removes_both_directions(store):
+    store.add(player(1), player(10), RequestType.TPA, 60)
+    store.add(player(10), player(2), RequestType.TPA, 60)
+    store.add(player(3), player(10), RequestType.TPA, 60)
+    store.add(player(3), player(2), RequestType.TPA, 60)
+
+    incoming, outgoing = store.remove_player(player(10))
+
+    assert [r.requester for r in incoming] == [2]
+    assert sorted(r.target for r in outgoing) == [1, 3]
+    assert len(store) == 1
+    assert list(store.outgoing(player(10))) == []
+    assert list(store.incoming(player(10))) == []
+    assert [r.target for r in store.outgoing(player(2))] == [3]
+
+
+def test_pop_expired_skips_removed_requests(store, clock):
+    store.add(player(1), player(10), RequestType.TPA, 10)
+    store.add(player(2), player(10), RequestType.TPA, 20)
+    clock.now = 5
+    store.add(player(3), player(11), RequestType.TPA, 10)
+    assert store.pop(player(2), player(10)) is not None
+    assert store.pop(player(2), player(10)) is None
+
+    clock.now = 12
+    assert [r.target for r in store.pop_expired()] == [1]
+    clock.now = 30
+    assert [r.target for r in store.pop_expired()] == [3]
+    assert len(store) == 0
+    assert list(store.outgoing(player(10))) == []
+
+
+def test_is_expired_uses_the_store_clock(store, clock):
+    store.add(player(1), player(10), RequestType.TPA, 10)
+    request = store.get(player(1), player(10))
+    assert not store.is_expired(request)
+    clock.now = 10.5
+    assert store.is_expired(request)
+    assert store.remove(request)
+    assert not store.remove(request)
+
+
+def test_request_is_a_compact_record():
+    request = Request(player(1).int, player(2).int, 30.0, RequestType.TPA)
+
+    assert not hasattr(request, "__dict__")
+    with pytest.raises(AttributeError):
+        request.extra = 1
+    assert request.target_uuid == player(1)
+    assert request.requester_uuid == player(2)
+    later = Request(1, 2, 31.0, RequestType.TPA)
+    assert request < later
+    assert not later < request
+
+
+def test_indexes_share_one_record(store):
+    store.add(player(1), player(10), RequestType.TPA, 60)
+
+    request = store.get(player(1), player(10))
+    assert next(iter(store.incoming(player(1)))) is request
+    assert next(iter(store.outgoing(player(10)))) is request
+    assert store._expiry._heap == [request]
@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+from uuid import UUID
+
+import pytest
+
+from endstone_tpa.players import PlayerIndex
+from endstone_tpa.selectors import Selector
+from endstone_tpa.spatial import SpatialIndex
+
+OVERWORLD = SimpleNamespace(name="Overworld")
+NETHER = SimpleNamespace(name="Nether")
+
+
+def location(x, z, dimension=OVERWORLD):
+    return SimpleNamespace(x=float(x), y=64.0, z=float(z), dimension=dimension)
+
+
+@pytest.fixture
+def plugin():
+    """Players 0 to 4 at x = 0, 10, 50, 200 and 1000 in the overworld, and player 5 in the nether."""
+    plugin = SimpleNamespace(players=PlayerIndex(), positions=SpatialIndex())
+    places = [location(0, 0), location(10, 0), location(50, 0), location(200, 0), location(1000, 0), location(5, 0, NETHER)]
+    for i, place in enumerate(places):
+        player = SimpleNamespace(unique_id=UUID(int=i + 1), name=f"P{i}")
+        plugin.players.add(player)
+        plugin.positions.update(player.unique_id, place)
+    return plugin
+
+
+def names(players):
+    return [player.name for player in players]
+
+
+def select(plugin, text, sender=0):
+    return names(Selector.parse(text).select(plugin, plugin.players.get(UUID(int=sender + 1))))
+
+
+@pytest.mark.parametrize("text", ["@p[rm=inf]", "@a[r=1e400]", "@a[r=nan]", "@a[rm=-1]", "@a[c=0]", "@a[x=1]", "@s"])
+def test_parse_rejects_invalid_selectors(text):
+    assert Selector.parse(text) is None
+
+
+def test_min_radius_without_radius(plugin):
+    assert select(plugin, "@p[rm=100]") == ["P3"]
+    assert sorted(select(plugin, "@a[rm=100]")) == ["P3", "P4"]
+
+
+def test_radius_and_count(plugin):
+    assert sorted(select(plugin, "@a[r=60]")) == ["P1", "P2"]
+    assert select(plugin, "@a[c=2]") == ["P1", "P2"]
+    assert select(plugin, "@p") == ["P1"]
+
+
+def test_dimension(plugin):
+    assert select(plugin, "@a[dim=nether]") == ["P5"]
+    assert select(plugin, "@p[dim=nether]") == []
+
+
+def test_within_infinite_radius():
+    index = SpatialIndex()
+    for i in range(3):
+        index.update(UUID(int=i + 1), location(i * 1000, 0))
+    found = index.within("overworld", 0.0, 64.0, 0.0, float("inf"), 500.0)
+    assert sorted(unique_id.int for _, unique_id in found) == [2, 3]
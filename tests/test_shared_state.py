@@ -0,0 +1,126 @@
+import os
+import threading
+from types import SimpleNamespace
+from uuid import UUID
+
+import pytest
+
+from endstone_tpa.policy import PolicyDecision, PolicyStore
+from endstone_tpa.request_store import RequestState, RequestType
+from endstone_tpa.shared_state import RemotePlayer, SharedState
+from endstone_tpa.sqlite_shared import SqliteSharedState
+from endstone_tpa.utils import SendResult, send_request
+
+A = UUID(int=1)
+B = UUID(int=2)
+C = UUID(int=3)
+
+
+class Logger:
+    def __init__(self):
+        self.errors = []
+
+    def error(self, message):
+        self.errors.append((message, threading.current_thread()))
+
+    def warning(self, message):
+        pass
+
+
+@pytest.fixture
+def state(tmp_path):
+    plugin = SimpleNamespace(plugin_config={"cache-size": 1}, logger=Logger())
+    state = SqliteSharedState(plugin, os.path.join(tmp_path, "shared.db"), "lobby")
+    yield state
+    state.close()
+
+
+def wait_for_writes(state):
+    state._executor.submit(lambda: None).result()
+
+
+def test_unsaved_toggle_survives_eviction_and_rejoin(state):
+    policy = state.policy
+    state._submit([])
+    gate = threading.Event()
+    # Holds back every write queued after it.
+    state._executor.submit(gate.wait)
+
+    assert policy.toggle_all_block(A) is True
+    policy.toggle_block(A, B)
+    policy.check(C, B)  # Evicts A from the one-entry cache
+    policy.unload_player(A)
+    policy.load_player(A)
+
+    assert policy.check(C, A) is PolicyDecision.ALL_BLOCKED
+    assert policy.is_blocked(A, B)
+
+    gate.set()
+    wait_for_writes(state)
+    state.poll()
+    assert policy._unsaved == {}
+    policy.invalidate(A.int)
+    assert policy.check(B, A) is PolicyDecision.BLOCKED
+    assert policy.check(C, A) is PolicyDecision.ALL_BLOCKED
+
+
+def test_overlay_keeps_the_latest_change(state):
+    policy = state.policy
+    state._submit([])
+    gate = threading.Event()
+    state._executor.submit(gate.wait)
+
+    policy.toggle_all_block(A)
+    first = state._submitted
+    policy.toggle_auto_accept(A)
+    # Only the first write is done; the overlay still holds both changes.
+    policy.written(first)
+
+    policy.invalidate(A.int)
+    assert policy.check(B, A) is PolicyDecision.ALL_BLOCKED
+    assert policy.get(A).auto_accept
+    gate.set()
+
+
+def test_write_errors_are_logged_on_the_server_thread(state):
+    logger = state.plugin.logger
+    state._submit([("INSERT INTO no_such_table VALUES (1)", ())])
+    wait_for_writes(state)
+    assert logger.errors == []
+
+    state.poll()
+
+    assert len(logger.errors) == 1
+    message, thread = logger.errors[0]
+    assert "no_such_table" in message
+    assert thread is threading.current_thread()
+
+
+class RecordingApi:
+    def __init__(self):
+        self.events = []
+
+    def emit(self, request, state):
+        self.events.append(state)
+
+
+@pytest.mark.parametrize("delivered", [True, False])
+def test_remote_auto_accept_reports_delivery(delivered):
+    policy = PolicyStore()
+    policy.toggle_auto_accept(B)
+    shared = SharedState()
+    shared.accept = lambda player, request: delivered
+    plugin = SimpleNamespace(
+        tpa_policy=policy, shared=shared, api=RecordingApi(), metrics=SimpleNamespace(incr=lambda *args: None)
+    )
+    requester = RemotePlayer(A, "Alice", "survival")
+    target = SimpleNamespace(unique_id=B, name="Bob")
+
+    result = send_request(plugin, requester, target, RequestType.TPA, 60)
+
+    if delivered:
+        assert result is SendResult.AUTO_ACCEPTED
+        assert plugin.api.events == [RequestState.ACCEPTED]
+    else:
+        assert result is SendResult.REQUESTER_LEFT
+        assert plugin.api.events == [RequestState.CANCELLED]
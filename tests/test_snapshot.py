@@ -0,0 +1,164 @@
+import os
+from uuid import UUID
+
+import pytest
+
+from endstone_tpa import snapshot as snapshot_module
+from endstone_tpa.policy import PolicyDecision
+from endstone_tpa.snapshot import Snapshot, SnapshotPolicyStore, write_config_snapshot
+
+A = UUID(int=1)
+B = UUID(int=2)
+C = UUID(int=3)
+D = UUID(int=2**127 + 4)
+
+CONFIG = {
+    "blocks": {str(A): [str(D), str(B)], str(D): [str(A)]},
+    "all_blocks": [str(C)],
+    "auto_accept": [str(D), str(B)],
+}
+
+
+class Logger:
+    def __init__(self):
+        self.errors = []
+
+    def error(self, message):
+        self.errors.append(message)
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = os.path.join(tmp_path, "policy.tpap")
+    write_config_snapshot(path, CONFIG)
+    return path
+
+
+def normalized(config):
+    return {
+        "blocks": {owner: sorted(blocked) for owner, blocked in config["blocks"].items() if blocked},
+        "all_blocks": sorted(config["all_blocks"]),
+        "auto_accept": sorted(config["auto_accept"]),
+    }
+
+
+def test_round_trip(path):
+    snapshot = Snapshot(path)
+    try:
+        assert snapshot.lookup(A.int).blocked == {B.int, D.int}
+        assert snapshot.lookup(C.int).all_block
+        assert snapshot.lookup(D.int).auto_accept
+        assert snapshot.lookup(D.int).blocked == {A.int}
+        assert not snapshot.lookup(B.int).blocked
+        assert snapshot.lookup(UUID(int=5).int) is None
+        assert normalized(snapshot.to_config()) == normalized(CONFIG)
+    finally:
+        snapshot.close()
+
+
+def test_config_converts_back_and_forth(path, tmp_path):
+    snapshot = Snapshot(path)
+    try:
+        config = snapshot.to_config()
+    finally:
+        snapshot.close()
+    copy = os.path.join(tmp_path, "copy.tpap")
+
+    assert write_config_snapshot(copy, config) == 4
+    with open(path, "rb") as f, open(copy, "rb") as g:
+        assert f.read() == g.read()
+
+
+def test_empty_snapshot(tmp_path):
+    path = os.path.join(tmp_path, "empty.tpap")
+    assert write_config_snapshot(path, {}) == 0
+    snapshot = Snapshot(path)
+    try:
+        assert snapshot.lookup(A.int) is None
+        assert snapshot.to_config() == {"blocks": {}, "all_blocks": [], "auto_accept": []}
+    finally:
+        snapshot.close()
+
+
+@pytest.mark.parametrize(
+    "damage, message",
+    [
+        (lambda data: data[:-5], "truncated"),
+        (lambda data: b"JSON" + data[4:], "not a TPA policy snapshot"),
+        (lambda data: data[:3], "not a TPA policy snapshot"),
+        (lambda data: b"", "not a TPA policy snapshot"),
+        (lambda data: data[:4] + b"\x09\x00" + data[6:], "unsupported snapshot version 9"),
+    ],
+)
+def test_damaged_files_are_rejected(path, damage, message):
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(damage(data))
+
+    with pytest.raises(ValueError, match=message):
+        Snapshot(path)
+
+
+def test_changes_are_merged_over_the_mapped_file(path):
+    store = SnapshotPolicyStore(path, Logger())
+    store.toggle_block(A, B)  # Unblocks B
+    store.toggle_block(B, C)
+    store.toggle_all_block(C)  # Clears C's only setting
+    store.toggle_auto_accept(A)
+
+    expected = {
+        "blocks": {str(A): [str(D)], str(B): [str(C)], str(D): [str(A)]},
+        "all_blocks": [],
+        "auto_accept": sorted([str(A), str(B), str(D)]),
+    }
+    assert normalized(store.to_config()) == expected
+
+    store.save()
+    # More changes while the new file is being written
+    store.toggle_block(D, A)
+    store.close()
+
+    assert not os.path.exists(path + ".new")
+    reopened = SnapshotPolicyStore(path, Logger())
+    try:
+        assert reopened.check(B, A) is PolicyDecision.AUTO_ACCEPT
+        assert reopened.check(D, A) is PolicyDecision.BLOCKED
+        assert reopened.check(A, D) is PolicyDecision.AUTO_ACCEPT
+        assert reopened.check(C, B) is PolicyDecision.BLOCKED
+        assert reopened.check(A, C) is PolicyDecision.ALLOW
+        expected["blocks"].pop(str(D))
+        assert normalized(reopened.to_config()) == expected
+    finally:
+        reopened.close()
+
+
+def test_failed_swap_keeps_the_changes(path, monkeypatch):
+    logger = Logger()
+    store = SnapshotPolicyStore(path, logger)
+    store.toggle_all_block(A)
+
+    replace = os.replace
+
+    def refuse(src, dst):
+        if dst == path:
+            raise PermissionError("file in use")
+        replace(src, dst)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(snapshot_module.os, "replace", refuse)
+        store.save()
+        store._pending.exception()
+        store._collect()
+
+    assert len(logger.errors) == 1
+    assert store._dirty == {A.int}
+    # The old file is mapped again and still answers lookups.
+    assert store.check(B, D) is PolicyDecision.AUTO_ACCEPT
+    store.close()
+
+    reopened = Snapshot(path)
+    try:
+        assert reopened.lookup(A.int).all_block
+    finally:
+        reopened.close()
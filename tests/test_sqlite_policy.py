@@ -0,0 +1,90 @@
+import os
+from uuid import UUID
+
+import pytest
+
+from endstone_tpa.policy import PolicyDecision
+from endstone_tpa.sqlite_policy import SqlitePolicyStore
+
+A = UUID(int=1)
+B = UUID(int=2)
+C = UUID(int=3)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return os.path.join(tmp_path, "tpa.db")
+
+
+@pytest.fixture
+def store(db_path):
+    store = SqlitePolicyStore(db_path, cache_size=2)
+    yield store
+    store.close()
+
+
+def test_toggles_are_written_to_the_database(store, db_path):
+    store.toggle_block(A, B)
+    store.toggle_all_block(B)
+    store.toggle_auto_accept(C)
+    store.toggle_auto_accept(A)
+    store.toggle_auto_accept(A)
+
+    reopened = SqlitePolicyStore(db_path)
+    try:
+        assert reopened.check(B, A) is PolicyDecision.BLOCKED
+        assert reopened.check(A, B) is PolicyDecision.ALL_BLOCKED
+        assert reopened.check(A, C) is PolicyDecision.AUTO_ACCEPT
+        assert reopened.check(C, A) is PolicyDecision.ALLOW
+    finally:
+        reopened.close()
+
+
+def test_lru_evicts_the_least_recently_used_player(store):
+    store.load_player(A)
+    store.load_player(B)
+    store.check(C, A)  # A becomes the most recently used
+    store.load_player(C)
+
+    assert list(store._players) == [A.int, C.int]
+    assert len(store) == 2
+
+
+def test_evicted_player_is_read_back_from_the_database(store):
+    store.toggle_block(A, B)
+    store.toggle_auto_accept(A)
+    store.load_player(B)
+    store.load_player(C)
+    assert A.int not in store._players
+
+    assert store.check(B, A) is PolicyDecision.BLOCKED
+    assert store.check(C, A) is PolicyDecision.AUTO_ACCEPT
+    assert A.int in store._players
+
+
+def test_unload_and_invalidate_drop_cached_settings(store):
+    store.toggle_all_block(A)
+    store.unload_player(A)
+    assert len(store) == 0
+    assert store.check(B, A) is PolicyDecision.ALL_BLOCKED
+
+    # Another process changed the row; invalidate makes the next lookup see it.
+    with store._conn:
+        store._conn.execute("DELETE FROM all_blocks")
+    assert store.check(B, A) is PolicyDecision.ALL_BLOCKED
+    store.invalidate(A.int)
+    assert store.check(B, A) is PolicyDecision.ALLOW
+
+
+def test_import_and_export_config(store):
+    config = {"blocks": {str(A): [str(B), str(C)]}, "all_blocks": [str(B)], "auto_accept": [str(C)]}
+
+    assert store.import_config(config) == 3
+    # Importing again leaves the rows as they are.
+    assert store.import_config(config) == 3
+
+    result = store.to_config()
+    assert {owner: sorted(blocked) for owner, blocked in result["blocks"].items()} == {str(A): sorted([str(B), str(C)])}
+    assert result["all_blocks"] == [str(B)]
+    assert result["auto_accept"] == [str(C)]
+    assert store.check(C, A) is PolicyDecision.BLOCKED